@@ -0,0 +1,310 @@
+"""
+RizSimulator Animation Compiler
+动画编译器 - 将固件 LightControl.cpp 的灯效逐像素预计算为帧表，按参数缓存，所有播放同一动画的设备共享；
+AnimationPlayer 每帧对整个设备群做批量渲染
+"""
+
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from constants import (
+    LED_COUNT, INNER_RING_COUNT,
+    COLOR_TENNIS, COLOR_DEEP_BLUE, COLOR_PALE_BLUE, COLOR_CHERRY_RED,
+    COLOR_NEON_GREEN, COLOR_RANDOM_OUTER, COLOR_WINDOW_WAIT, COLOR_WINDOW_GOOD,
+    RGB_DISPLAY_TIME, INIT_CLEAR_HOLD, RANDOM_WIPE_STEP,
+    CLOSING_BLINK_ON, CLOSING_BLINK_OFF, CLOSING_BLINK_COUNT,
+    ANIMATION_CACHE_SIZE,
+)
+
+# 开机动画绿色主题，每颗LED从6个颜色区间中随机取色: ((R区间), (G区间), (B区间))，上界不含
+INIT_COLOR_RANGES = (
+    ((120, 150), (190, 220), (0, 10)),   # Brat Green
+    ((140, 170), (210, 240), (0, 5)),    # Yellow-Green
+    ((180, 210), (230, 255), (0, 5)),    # Neon Yellow-Green
+    ((100, 130), (150, 190), (0, 10)),   # Dark Brat Green
+    ((110, 140), (170, 200), (0, 10)),   # Olive Green
+    ((100, 140), (200, 255), (0, 10)),   # Vibrant Green
+)
+
+# _PROGRESS[k, i] = i <= k，即逐颗点亮的第k帧中已点亮的像素
+_PROGRESS = np.tri(INNER_RING_COUNT, dtype=bool)
+
+
+@dataclass(frozen=True, eq=False)
+class AnimationTable:
+    """预计算的动画帧表（只读，可被多个设备共享）"""
+    times: np.ndarray       # (F,) 每帧开始时间，相对动画开始 (秒)
+    frames: np.ndarray      # (F, 48, 3) uint8
+    brightness: np.ndarray  # (F,) float32
+    led_on: np.ndarray      # (F,) bool
+    duration: float         # 动画总时长 (秒)，math.inf 表示停在最后一帧不结束
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def frame_index(self, elapsed: float) -> int:
+        """elapsed 时刻应显示的帧序号（elapsed >= duration 时返回 -1 表示结束）"""
+        if elapsed >= self.duration:
+            return -1
+        return max(0, int(np.searchsorted(self.times, elapsed, side='right')) - 1)
+
+    def next_frame_time(self, elapsed: float) -> float:
+        """elapsed 之后下一次换帧（或结束）的相对时间"""
+        index = int(np.searchsorted(self.times, elapsed, side='right'))
+        return float(self.times[index]) if index < len(self.times) else self.duration
+
+
+def _build_table(times_ms, frames, duration_ms: float) -> AnimationTable:
+    """组装并冻结帧表（时间以固件的毫秒给出）"""
+    times = np.asarray(times_ms, dtype=np.float64) / 1000
+    frames = np.ascontiguousarray(frames, dtype=np.uint8).reshape(len(times), LED_COUNT, 3)
+    brightness = np.ones(len(times), dtype=np.float32)
+    led_on = frames.reshape(len(times), -1).any(axis=1)
+    for array in (times, frames, brightness, led_on):
+        array.flags.writeable = False
+    return AnimationTable(times, frames, brightness, led_on, duration_ms / 1000)
+
+
+def _dual_color(color: Tuple[int, int, int]) -> Tuple[int, int, int]:
+    """固件 emit(dual_led=true) 的外圈颜色 (B, R, G)"""
+    r, g, b = color
+    return (b, r, g)
+
+
+def _wipe_frames(inner, outer) -> np.ndarray:
+    """emit 逐颗点亮: 第k帧点亮内圈 [0, k] 与外圈 [24, 24+k]（outer 为 None 时外圈不亮）"""
+    frames = np.zeros((INNER_RING_COUNT, LED_COUNT, 3), dtype=np.uint8)
+    frames[:, :INNER_RING_COUNT][_PROGRESS] = inner
+    if outer is not None:
+        frames[:, INNER_RING_COUNT:][_PROGRESS] = outer
+    return frames
+
+
+def _compile_init(variant: int) -> AnimationTable:
+    """init_lighting - 内圈第i颗与镜像第47-i颗取同一随机绿色，逐颗点亮后全灭500ms"""
+    rng = np.random.default_rng(variant)
+    ranges = np.asarray(INIT_COLOR_RANGES)
+    choice = rng.integers(0, len(INIT_COLOR_RANGES), INNER_RING_COUNT)
+    colors = rng.integers(ranges[choice, :, 0], ranges[choice, :, 1])
+
+    frames = np.zeros((INNER_RING_COUNT + 1, LED_COUNT, 3), dtype=np.uint8)
+    lit = np.where(_PROGRESS[..., None], colors[None], 0)
+    frames[:INNER_RING_COUNT, :INNER_RING_COUNT] = lit
+    frames[:INNER_RING_COUNT, INNER_RING_COUNT:] = lit[:, ::-1]
+
+    step = RGB_DISPLAY_TIME // LED_COUNT
+    times = np.arange(INNER_RING_COUNT + 1) * step
+    return _build_table(times, frames, times[-1] + INIT_CLEAR_HOLD)
+
+
+def _compile_connected() -> AnimationTable:
+    """connectedWipe - Tennis绿只点亮内圈，逐颗点亮后保持1秒"""
+    step = RGB_DISPLAY_TIME // INNER_RING_COUNT
+    times = np.arange(INNER_RING_COUNT) * step
+    return _build_table(times, _wipe_frames(COLOR_TENNIS, None),
+                        INNER_RING_COUNT * step + RGB_DISPLAY_TIME)
+
+
+def _compile_random() -> AnimationTable:
+    """randomWipe - 内圈霓虹绿、外圈灰色每5ms点亮一颗，之后常亮"""
+    times = np.arange(INNER_RING_COUNT) * RANDOM_WIPE_STEP
+    return _build_table(times, _wipe_frames(COLOR_NEON_GREEN, COLOR_RANDOM_OUTER), math.inf)
+
+
+def _compile_opening() -> AnimationTable:
+    """opening_light - 深蓝/淡蓝/深蓝三轮逐颗点亮（双色外圈），之后熄灭"""
+    step = RGB_DISPLAY_TIME // INNER_RING_COUNT
+    passes = []
+    previous = np.zeros((LED_COUNT, 3), dtype=np.uint8)
+    for color in (COLOR_DEEP_BLUE, COLOR_PALE_BLUE, COLOR_DEEP_BLUE):
+        frames = np.repeat(previous[None], INNER_RING_COUNT, axis=0)
+        frames[:, :INNER_RING_COUNT][_PROGRESS] = color
+        frames[:, INNER_RING_COUNT:][_PROGRESS] = _dual_color(color)
+        passes.append(frames)
+        previous = frames[-1]
+    frames = np.concatenate(passes)
+    times = np.arange(len(frames)) * step
+    return _build_table(times, frames, len(frames) * step)
+
+
+def _compile_closing() -> AnimationTable:
+    """closing_light - 樱桃红（双色外圈）闪烁三次，之后熄灭"""
+    on = np.zeros((LED_COUNT, 3), dtype=np.uint8)
+    on[:INNER_RING_COUNT] = COLOR_CHERRY_RED
+    on[INNER_RING_COUNT:] = _dual_color(COLOR_CHERRY_RED)
+    off = np.zeros_like(on)
+
+    period = CLOSING_BLINK_ON + CLOSING_BLINK_OFF
+    times = [t for i in range(CLOSING_BLINK_COUNT)
+             for t in (i * period, i * period + CLOSING_BLINK_ON)]
+    frames = [on, off] * CLOSING_BLINK_COUNT
+    return _build_table(times, frames, CLOSING_BLINK_COUNT * period)
+
+
+def _compile_rest(blink_break: int) -> AnimationTable:
+    """restWipe - Tennis绿（双色外圈）全亮，每 blink_break/24 ms 同时熄灭内外圈各一颗"""
+    each = blink_break // INNER_RING_COUNT
+    full = np.zeros((LED_COUNT, 3), dtype=np.uint8)
+    full[:INNER_RING_COUNT] = COLOR_TENNIS
+    full[INNER_RING_COUNT:] = _dual_color(COLOR_TENNIS)
+
+    frames = np.repeat(full[None], INNER_RING_COUNT, axis=0)
+    off = _PROGRESS[:-1]  # 第k帧 (k>=1) 熄灭 [0, k)
+    frames[1:, :INNER_RING_COUNT][off] = 0
+    frames[1:, INNER_RING_COUNT:][off] = 0
+    times = np.arange(INNER_RING_COUNT) * each
+    return _build_table(times, frames, INNER_RING_COUNT * each)
+
+
+def _compile_timed(color: Tuple[int, int, int], duration: int) -> AnimationTable:
+    """timedWipe + updateTimedAnimation - 48颗全亮，内圈从0、外圈从47反向按时间比例逐颗熄灭"""
+    frames = np.repeat(np.full((1, LED_COUNT, 3), color, dtype=np.uint8), INNER_RING_COUNT, axis=0)
+    off = _PROGRESS[:-1]
+    frames[1:, :INNER_RING_COUNT][off] = 0
+    frames[1:, INNER_RING_COUNT:][off[:, ::-1]] = 0
+
+    # 固件 targetStep = elapsed * 24 / duration（整数毫秒），第k步在 ceil(k * duration / 24) ms 到达
+    steps = np.arange(INNER_RING_COUNT)
+    times = -(-steps * duration // INNER_RING_COUNT)
+    return _build_table(times, frames, duration)
+
+
+def _compile_window(total: int, good: int) -> AnimationTable:
+    """windowWipe + updateWindowAnimation - 与计时模式相同的双层对称熄灭，进入最佳窗口时橙色瞬间变绿
+
+    第24步全部熄灭后停在该帧，倒计时结束（熄灭、超时通知）由 DeviceManager 在传感器检测之后处理。
+    """
+    wait = total - good
+    steps = np.arange(INNER_RING_COUNT + 1)
+    step_times = -(-steps * total // INNER_RING_COUNT)
+    times = np.union1d(step_times, [wait])
+    step = np.searchsorted(step_times, times, side='right') - 1
+
+    color = np.where((times >= wait)[:, None], COLOR_WINDOW_GOOD, COLOR_WINDOW_WAIT)
+    lit = np.arange(INNER_RING_COUNT)[None, :] >= step[:, None]  # 内圈从0开始熄灭
+    frames = np.zeros((len(times), LED_COUNT, 3), dtype=np.uint8)
+    frames[:, :INNER_RING_COUNT] = np.where(lit[..., None], color[:, None], 0)
+    frames[:, INNER_RING_COUNT:] = np.where(lit[:, ::-1, None], color[:, None], 0)  # 外圈从47反向
+    return _build_table(times, frames, math.inf)
+
+
+_COMPILERS = {
+    "init": _compile_init,
+    "connected": _compile_connected,
+    "random": _compile_random,
+    "opening": _compile_opening,
+    "closing": _compile_closing,
+    "rest": _compile_rest,
+    "timed": _compile_timed,
+    "window": _compile_window,
+}
+
+
+@lru_cache(maxsize=ANIMATION_CACHE_SIZE)
+def compile_animation(animation_type: str, *params) -> AnimationTable:
+    """编译动画帧表（按参数LRU缓存，同参数返回同一张表）
+
+    参数: init(variant), rest(blink_break_ms), timed(color, duration_ms), window(total_ms, good_ms)，其余无参数
+    """
+    compiler = _COMPILERS.get(animation_type)
+    if compiler is None:
+        raise ValueError(f"未知动画类型: {animation_type}")
+    return compiler(*params)
+
+
+class AnimationPlayer:
+    """批量动画播放器
+
+    播放中的设备在 FleetState 的 anim_* 列中登记帧表编号、开始时间和当前帧。
+    render() 每帧按帧表分组，一次 searchsorted 求出整组的帧序号，再用花式索引把换帧设备的整帧拷贝到 leds 列。
+    render() 同时记下所有设备最早的下一次换帧时间，在此之前的调用直接返回（常亮或空闲时为O(1)）。
+    动画结束（熄灭、发送通知等）仍由 DeviceController 在调度器截止时间处理。
+    """
+
+    def __init__(self, fleet):
+        self.fleet = fleet
+        self._tables: List[Optional[AnimationTable]] = []
+        self._table_ids: Dict[int, int] = {}  # id(table) -> 帧表编号
+        self._free_ids: List[int] = []         # 已回收、可复用的编号
+        self._collect_at = ANIMATION_CACHE_SIZE  # 登记的帧表达到此数量且无空闲编号时回收
+        self._next_change = math.inf           # 最早的下一次换帧时间
+
+    def _table_id(self, table: AnimationTable) -> int:
+        """登记帧表并返回编号（播放期间持有帧表引用保证编号稳定，没有设备播放后编号可被回收复用）"""
+        table_id = self._table_ids.get(id(table))
+        if table_id is None:
+            if not self._free_ids and len(self._tables) >= self._collect_at:
+                self._collect()
+            if self._free_ids:
+                table_id = self._free_ids.pop()
+                self._tables[table_id] = table
+            else:
+                table_id = len(self._tables)
+                self._tables.append(table)
+            self._table_ids[id(table)] = table_id
+        return table_id
+
+    def _collect(self):
+        """回收没有设备在播放的帧表编号，释放对帧表的引用（LRU淘汰的帧表随之释放）"""
+        ids = self.fleet.anim_id[:self.fleet.size]
+        used = np.zeros(len(self._tables), dtype=bool)
+        used[ids[ids >= 0]] = True
+        for table_id in np.flatnonzero(~used).tolist():
+            table = self._tables[table_id]
+            if table is not None:
+                del self._table_ids[id(table)]
+                self._tables[table_id] = None
+                self._free_ids.append(table_id)
+        # 播放中的帧表很多时推迟下次回收，每次登记的均摊开销仍为O(1)
+        self._collect_at = max(ANIMATION_CACHE_SIZE, 2 * int(used.sum()))
+
+    def start(self, slot: int, table: AnimationTable, start_time: float, frame: int = -1):
+        """开始播放（frame 为调用方已显示的帧序号）"""
+        self.fleet.anim_id[slot] = self._table_id(table)
+        self.fleet.anim_start[slot] = start_time
+        self.fleet.anim_frame[slot] = frame
+        self._next_change = min(self._next_change, start_time)
+
+    def stop(self, slot: int):
+        """停止播放（不改动当前LED）"""
+        self.fleet.anim_id[slot] = -1
+        self.fleet.anim_frame[slot] = -1
+
+    def render(self, now: float) -> int:
+        """渲染所有播放中设备在 now 时刻的帧，返回换帧的设备数"""
+        if now < self._next_change:
+            return 0
+
+        fleet = self.fleet
+        ids = fleet.anim_id[:fleet.size]
+        playing = np.flatnonzero(ids >= 0)
+        self._next_change = math.inf
+        if len(playing) == 0:
+            return 0
+
+        playing_ids = ids[playing]
+        changed_count = 0
+        for table_id in np.unique(playing_ids).tolist():
+            table = self._tables[table_id]
+            slots = playing[playing_ids == table_id]
+            start = fleet.anim_start[slots]
+            index = np.maximum(np.searchsorted(table.times, now - start, side='right') - 1, 0)
+
+            # 本组最早的下一次换帧（已在最后一帧的设备不再换帧）
+            upcoming = index + 1 < len(table)
+            if upcoming.any():
+                next_change = (start[upcoming] + table.times[index[upcoming] + 1]).min()
+                self._next_change = min(self._next_change, float(next_change))
+
+            changed = index != fleet.anim_frame[slots]
+            if not changed.any():
+                continue
+            slots, index = slots[changed], index[changed]
+            fleet.anim_frame[slots] = index
+            fleet.load_frames(slots, table.frames[index], table.brightness[index], table.led_on[index])
+            changed_count += len(slots)
+        return changed_count
@@ -3,9 +3,12 @@ BLE Module
 蓝牙低功耗通信模块
 """
 
-from ble.ble_server import BLEGATTServer, BLEMessageParser
+from ble.ble_server import BLECommand, BLEGATTServer, BLEMessageParser
+from ble.ble_ingest import BLEIngestPipeline
 
 __all__ = [
+    "BLECommand",
     "BLEGATTServer",
     "BLEMessageParser",
+    "BLEIngestPipeline",
 ]
@@ -0,0 +1,149 @@
+"""
+BLE Ingest Pipeline
+BLE接收队列 - 写入先进入每个设备的有界队列，由一个共享的 asyncio 工作协程分批处理
+
+接收（submit / put）只追加到队列并记录到达时刻，不解码、不写日志、不改动设备状态；
+工作协程每批在所有有待处理写入的设备间轮转，每个设备每轮取一条，同一设备的写入按到达顺序处理。
+队列满时 submit 返回False（计入 dropped），put 等待工作协程腾出空间，其他线程用 put_threadsafe。
+设备管理器不是线程安全的，工作协程必须与推进仿真的代码运行在同一线程的事件循环中。
+"""
+
+import asyncio
+import concurrent.futures
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from constants import CHARACTERISTIC_MSG_UUID, INGEST_BATCH_SIZE, INGEST_QUEUE_LENGTH
+from logger import get_logger
+
+logger = get_logger("BLEIngest")
+
+# 队列项: (特征值UUID, 原始数据, 到达时刻 perf_counter_ns)
+_Write = Tuple[str, bytes, int]
+
+
+class BLEIngestPipeline:
+    """BLE写入接收队列（每个设备一个有界队列，共享一个工作协程）"""
+
+    def __init__(self, device_manager, queue_length: int = INGEST_QUEUE_LENGTH,
+                 batch_size: int = INGEST_BATCH_SIZE):
+        if queue_length < 1 or batch_size < 1:
+            raise ValueError(f"队列长度与批大小必须大于0: {queue_length}, {batch_size}")
+        self.servers = device_manager.ble_servers  # device_id -> BLEGATTServer（与设备管理器共享）
+        self.queue_length = queue_length
+        self.batch_size = batch_size
+        self.pending = 0    # 所有队列中待处理的写入数
+        self.processed = 0
+        self.dropped = 0    # 队列已满或设备已移除而丢弃的写入数
+        self._queues: Dict[int, Deque[_Write]] = {}
+        self._ready: Deque[int] = deque()  # 队列非空的设备（轮转顺序）
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()      # 每批处理后置位并替换，唤醒等待空间的 put
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ===== 接收 =====
+
+    def is_full(self, device_id: int) -> bool:
+        """设备队列已满（反压信号）"""
+        queue = self._queues.get(device_id)
+        return queue is not None and len(queue) >= self.queue_length
+
+    def backlog(self, device_id: int) -> int:
+        """设备待处理的写入数"""
+        queue = self._queues.get(device_id)
+        return len(queue) if queue is not None else 0
+
+    def submit(self, device_id: int, data: bytes, characteristic_uuid: str = CHARACTERISTIC_MSG_UUID) -> bool:
+        """追加一次写入（不等待），队列已满时丢弃并返回False；只能在事件循环线程中调用"""
+        queue = self._queues.get(device_id)
+        if queue is None:
+            queue = self._queues[device_id] = deque()
+        elif len(queue) >= self.queue_length:
+            self.dropped += 1
+            return False
+        if not queue:
+            self._ready.append(device_id)
+        queue.append((characteristic_uuid, data, time.perf_counter_ns()))
+        self.pending += 1
+        self._idle.clear()
+        self._wakeup.set()
+        return True
+
+    async def put(self, device_id: int, data: bytes, characteristic_uuid: str = CHARACTERISTIC_MSG_UUID):
+        """追加一次写入，队列已满时等待工作协程腾出空间"""
+        while self.is_full(device_id):
+            await self._space.wait()
+        self.submit(device_id, data, characteristic_uuid)
+
+    def put_threadsafe(self, device_id: int, data: bytes,
+                       characteristic_uuid: str = CHARACTERISTIC_MSG_UUID) -> concurrent.futures.Future:
+        """从其他线程（GUI、BLE协议栈）追加写入，返回的 Future 在写入入队后完成，生产者可据此阻塞"""
+        if self._loop is None:
+            raise RuntimeError("接收队列尚未启动")
+        return asyncio.run_coroutine_threadsafe(self.put(device_id, data, characteristic_uuid), self._loop)
+
+    # ===== 工作协程 =====
+
+    def start(self) -> asyncio.Task:
+        """在当前事件循环中启动工作协程"""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._task = self._loop.create_task(self._run(), name="BLEIngestWorker")
+        return self._task
+
+    async def join(self):
+        """等待所有队列处理完"""
+        await self._idle.wait()
+
+    async def close(self):
+        """处理完剩余写入后停止工作协程"""
+        if self._task is None:
+            return
+        await self.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info(f"接收队列停止: 处理 {self.processed} 次写入，丢弃 {self.dropped} 次")
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._ready:
+                self._process_batch()
+                space, self._space = self._space, asyncio.Event()
+                space.set()
+                await asyncio.sleep(0)  # 批间让出事件循环，接收与仿真帧不被长队列阻塞
+            self._idle.set()
+
+    def _process_batch(self):
+        """在有待处理写入的设备间轮转，每个设备每轮处理一条，最多 batch_size 条"""
+        ready, queues = self._ready, self._queues
+        for _ in range(self.batch_size):
+            if not ready:
+                break
+            device_id = ready.popleft()
+            queue = queues[device_id]
+            characteristic_uuid, data, received_ns = queue.popleft()
+            self.pending -= 1
+
+            server = self.servers.get(device_id)
+            if server is None:  # 设备已移除，丢弃其余写入
+                self.dropped += len(queue) + 1
+                self.pending -= len(queue)
+                del queues[device_id]
+                continue
+            if queue:
+                ready.append(device_id)
+            try:
+                server.handle_write(characteristic_uuid, data, received_ns)
+            except Exception as e:
+                logger.error(f"[{server.device_name}] 处理写入失败: {e}")
+            self.processed += 1
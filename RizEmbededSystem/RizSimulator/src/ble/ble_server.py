@@ -4,10 +4,14 @@ BLE GATT Server Simulator
 """
 
 import asyncio
-from typing import Optional, Dict, Callable
+import struct
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Union
 from dataclasses import dataclass, field
 
 from constants import *
+from window_mode import validate_window
 from logger import get_logger
 
 logger = get_logger("BLEServer")
@@ -47,6 +51,8 @@ class BLEGATTServer:
         self.on_connect_callback: Optional[Callable] = None
         self.on_disconnect_callback: Optional[Callable] = None
         self.on_message_callback: Optional[Callable] = None
+        self.on_write_callback: Optional[Callable] = None  # (特征值UUID, 原始数据)，用于录制
+        self.write_ns = 0  # 正在处理的写入的到达时刻 (perf_counter_ns)，处理完毕后为0
 
         # Bleak服务器（如果可用）
         self.bleak_server: Optional[BleakServer] = None
@@ -128,19 +134,27 @@ class BLEGATTServer:
         # 重新开始广播
         self.is_advertising = True
 
-    def handle_write(self, characteristic_uuid: str, data: bytes):
-        """处理写入"""
+    def handle_write(self, characteristic_uuid: str, data: bytes, received_ns: int = 0):
+        """处理写入（received_ns 为写入到达的 perf_counter_ns，经接收队列延后处理时由队列给出）"""
         if characteristic_uuid not in self.characteristics:
             logger.warning(f"[{self.device_name}] 未知特征值: {characteristic_uuid}")
             return
 
+        self.write_ns = received_ns or time.perf_counter_ns()
+        if self.on_write_callback:
+            self.on_write_callback(characteristic_uuid, data)
+
         char = self.characteristics[characteristic_uuid]
         char.value = data
 
-        # 解析消息
+        # 解析消息（二进制命令原样交给回调，由解析器自动识别格式）
         try:
-            message = data.decode('utf-8')
-            logger.info(f"[{self.device_name}] 收到消息: {message}")
+            if is_binary(data):
+                message = data
+                logger.info(f"[{self.device_name}] 收到二进制消息: {data.hex()}")
+            else:
+                message = data.decode('utf-8')
+                logger.info(f"[{self.device_name}] 收到消息: {message}")
 
             # 触发消息回调
             if self.on_message_callback:
@@ -148,6 +162,8 @@ class BLEGATTServer:
 
         except UnicodeDecodeError:
             logger.error(f"[{self.device_name}] 消息解码失败")
+        finally:
+            self.write_ns = 0
 
     def handle_read(self, characteristic_uuid: str) -> bytes:
         """处理读取"""
@@ -192,75 +208,208 @@ class BLEGATTServer:
         }
 
 
+class BLECommand(NamedTuple):
+    """解析后的BLE命令（不可变，相同消息的解析结果由缓存与广播目标共享；未出现的参数为None）"""
+    mode: Optional[int]
+    # 标准格式 mode,blinkBreak,timedBreak,buzzer,buzzerTime,buffer,doubleModeIndex,process
+    blink_break: Optional[int] = None
+    timed_break: Optional[int] = None
+    buzzer: Optional[int] = None
+    buzzer_time: Optional[int] = None
+    buffer: Optional[int] = None
+    double_index: Optional[int] = None
+    process: Optional[int] = None
+    # 节奏模式 5,R,G,B,timer,buzzer,sensorMode
+    red: Optional[int] = None
+    green: Optional[int] = None
+    blue: Optional[int] = None
+    timer: Optional[int] = None
+    sensor_mode: Optional[int] = None
+    # 窗口模式 7,totalDuration,goodWindowDuration,buzzer,buzzerTime,sensorMode,p1,p2
+    window_total: Optional[int] = None
+    window_good: Optional[int] = None
+    # 配置模式 config:N / 100,N
+    blink_count: Optional[int] = None
+
+
+_REJECTED = BLECommand(None)
+_MALFORMED = BLECommand(TERMINATE_MODE)
+_CONFIG_PREFIX = b"config:"
+# 二进制格式: 魔数, 版本, 参数个数, 模式 (各1字节) + 每个参数 uint16 小端。魔数 0xA5 不能作为 UTF-8 文本的首字节，
+# 因此按首字节即可区分文本与二进制消息；参数个数与文本的字段数对应，简写与8字段格式的含义不变
+_BINARY_MAX_PARAMS = 7
+_BINARY_FORMATS = tuple(struct.Struct(f"<4B{n}H") for n in range(_BINARY_MAX_PARAMS + 1))
+_BINARY_HEADER_SIZE = _BINARY_FORMATS[0].size
+_BINARY_MAGIC = bytes((BLE_BINARY_MAGIC,))
+_STANDARD_DEFAULTS = (
+    ('blink_break', DEFAULT_BLINKBREAK), ('timed_break', DEFAULT_TIMEDBREAK), ('buzzer', DEFAULT_BUZZER),
+    ('buzzer_time', DEFAULT_BUZZERTIME), ('buffer', DEFAULT_BUFFER), ('double_index', 0), ('process', 0),
+)
+
+
+def is_binary(data: bytes) -> bool:
+    """消息是否为二进制格式"""
+    return data[:1] == _BINARY_MAGIC
+
+
+def encode_binary(fields: Sequence[int]) -> bytes:
+    """把 (模式, 参数...) 编码为二进制消息（模式 0-255，参数 0-65535）"""
+    params = len(fields) - 1
+    if not 0 <= params <= _BINARY_MAX_PARAMS:
+        raise ValueError(f"二进制消息最多 {_BINARY_MAX_PARAMS} 个参数: {fields}")
+    try:
+        return _BINARY_FORMATS[params].pack(BLE_BINARY_MAGIC, BLE_BINARY_VERSION, params, *fields)
+    except struct.error as e:
+        raise ValueError(f"字段超出二进制格式范围 (模式 0-255，参数 0-65535): {fields}") from e
+
+
+def _split_fields(data: bytes) -> Optional[List[int]]:
+    """解析逗号分隔的整数字段，格式错误返回None
+
+    直接在字节串上分割并用 int() 转换，不先解码为字符串。int() 只允许字段首尾的空白，数字中间夹空白
+    （如 "1 2"）按格式错误处理，与原先 decode + split 的行为一致。逐字节扫描的纯Python循环每条命令
+    约慢2倍，因此不采用。
+    """
+    try:
+        return [int(field) for field in data.split(b",")]
+    except ValueError:
+        return None
+
+
+def _decode_binary(data: bytes) -> Optional[Sequence[int]]:
+    """解码二进制消息为 (模式, 参数...)，版本不支持或长度不符返回None"""
+    if len(data) < _BINARY_HEADER_SIZE or data[1] != BLE_BINARY_VERSION:
+        logger.error(f"不支持的二进制消息版本: {data.hex()}")
+        return None
+    params = data[2]
+    if params > _BINARY_MAX_PARAMS or len(data) != _BINARY_FORMATS[params].size:
+        logger.error(f"二进制消息长度错误: {data.hex()}")
+        return None
+    return _BINARY_FORMATS[params].unpack(data)[3:]
+
+
+def decode_command(data: bytes) -> BLECommand:
+    """解析原始消息（文本或二进制，不经过缓存）"""
+    if is_binary(data):
+        fields = _decode_binary(data)
+        # 版本不支持时忽略而不是按格式错误终止，旧设备收到新格式不会中断训练
+        return _REJECTED if fields is None else _command(fields, data)
+
+    text = data.lstrip()
+    config = text.startswith(_CONFIG_PREFIX)
+    fields = _split_fields(text[len(_CONFIG_PREFIX):] if config else text)
+    if fields is None or (config and len(fields) != 1):
+        logger.error(f"消息解析失败: {data!r}")
+        return _MALFORMED
+    if config:
+        return BLECommand(CONFIG_MODE, blink_count=fields[0])
+    return _command(fields, data)
+
+
+def _command(fields: Sequence[int], data: bytes) -> BLECommand:
+    """按模式把字段 (模式, 参数...) 映射为命令（文本与二进制消息共用）"""
+    mode, count = fields[0], len(fields)
+    if mode == RHYTHM_MODE:
+        if count >= 7:
+            return BLECommand(mode, red=fields[1], green=fields[2], blue=fields[3], timer=fields[4],
+                              buzzer=fields[5], sensor_mode=fields[6])
+    elif mode == WINDOW_MODE:
+        if count >= 6:
+            try:
+                validate_window(fields[1], fields[2])
+            except ValueError as e:
+                logger.error(f"拒绝窗口模式消息: {data!r}, {e}")
+                return _REJECTED
+            return BLECommand(mode, window_total=fields[1], window_good=fields[2], buzzer=fields[3],
+                              buzzer_time=fields[4], sensor_mode=fields[5])
+    elif mode == CONFIG_MODE:
+        if count >= 2:
+            return BLECommand(mode, blink_count=fields[1])
+    elif count >= 8:
+        return BLECommand(mode, blink_break=fields[1], timed_break=fields[2], buzzer=fields[3],
+                          buzzer_time=fields[4], buffer=fields[5], double_index=fields[6], process=fields[7])
+    elif mode == DOUBLE_MODE and count >= 2:
+        return BLECommand(mode, double_index=fields[1])
+    return BLECommand(mode)
+
+
+# 按原始字节缓存解析结果，App反复发送的少数几条命令只解析一次
+_parse = lru_cache(maxsize=BLE_COMMAND_CACHE_SIZE)(decode_command)
+
+
 class BLEMessageParser:
     """BLE消息解析器"""
 
     @staticmethod
-    def parse_message(message: str) -> dict:
-        """解析BLE消息
+    def parse_command(message: Union[bytes, str]) -> BLECommand:
+        """解析BLE消息为命令对象（格式见 parse_message，结果可能与其他调用方共享）"""
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        elif not isinstance(message, bytes):
+            message = bytes(message)  # bytearray / memoryview 不可哈希
+        return _parse(message)
+
+    @staticmethod
+    def parse_message(message: Union[bytes, str]) -> dict:
+        """解析BLE消息，返回 mode 及消息中出现的参数
 
-        消息格式:
-        - Manual: "1"
-        - Random: "2"
+        消息格式 (docs BluetoothProtocol.md):
+        - 标准: "mode,blinkBreak,timedBreak,buzzer,buzzerTime,buffer,doubleModeIndex,process"（8个字段）
+        - 简写: "1" / "2" / "11" / "12" / "13" 等只有模式的消息
         - Rhythm: "5,R,G,B,timer,buzzer,sensor_mode"
-        - Double: "4,index"
+        - Double: "4,index"（简写；8字段时取 doubleModeIndex）
+        - Window: "7,total,good,buzzer,buzzer_time,sensor_mode,p1,p2"（参数不合法时 mode 为None）
         - Config: "config:N" 或 "100,N"
-        - Opening: "11"
-        - Closing: "12"
-        - Terminate: "13"
+        - 二进制: 首字节为 BLE_BINARY_MAGIC，字段同文本格式（见 create_message），自动识别
+        格式错误的消息按 Terminate 处理，不支持的二进制版本忽略 (mode 为None)。
         """
-        message = message.strip()
-
-        # Config模式特殊处理
-        if message.startswith("config:"):
-            count = int(message.split(":")[1])
-            return {
-                "mode": CONFIG_MODE,
-                "blink_count": count
-            }
-
-        # 分割参数
-        parts = message.split(",")
+        command = BLEMessageParser.parse_command(message)
+        result = {"mode": command.mode}
+        for name, value in zip(BLECommand._fields[1:], command[1:]):
+            if value is not None:
+                result[name] = value
+        return result
 
-        try:
-            mode = int(parts[0])
+    @staticmethod
+    def cache_info():
+        """解析缓存的命中统计"""
+        return _parse.cache_info()
 
-            result = {"mode": mode}
+    @staticmethod
+    def message_fields(mode: int, **kwargs) -> List[int]:
+        """消息的字段 (模式, 参数...)，参数同 create_message"""
+        if mode == RHYTHM_MODE:
+            return [mode, kwargs.get('red', 255), kwargs.get('green', 140), kwargs.get('blue', 0),
+                    kwargs.get('timer', 0), kwargs.get('buzzer', 0), kwargs.get('sensor_mode', 1)]
 
-            # Rhythm模式 (5,R,G,B,timer,buzzer,sensor_mode)
-            if mode == RHYTHM_MODE and len(parts) >= 7:
-                result["red"] = int(parts[1])
-                result["green"] = int(parts[2])
-                result["blue"] = int(parts[3])
-                result["timer"] = int(parts[4])
-                result["buzzer"] = int(parts[5])
-                result["sensor_mode"] = int(parts[6])
+        elif mode == WINDOW_MODE:
+            return [mode, kwargs.get('total', DEFAULT_WINDOW_TOTAL), kwargs.get('good', DEFAULT_WINDOW_GOOD),
+                    kwargs.get('buzzer', DEFAULT_BUZZER), kwargs.get('buzzer_time', DEFAULT_BUZZERTIME),
+                    kwargs.get('sensor_mode', 1), 0, 100]
 
-            # Double模式 (4,index)
-            elif mode == DOUBLE_MODE and len(parts) >= 2:
-                result["double_index"] = int(parts[1])
+        elif mode == CONFIG_MODE:
+            return [mode, kwargs.get('blink_count', 3)]
 
-            # Config模式 (100,N)
-            elif mode == CONFIG_MODE and len(parts) >= 2:
-                result["blink_count"] = int(parts[1])
+        elif mode == DOUBLE_MODE and set(kwargs) <= {'double_index'}:
+            return [mode, kwargs.get('double_index', 0)]
 
-            return result
+        elif any(name in kwargs for name, _ in _STANDARD_DEFAULTS):
+            # 标准8字段格式，未给出的参数取默认值
+            return [mode] + [kwargs.get(name, default) for name, default in _STANDARD_DEFAULTS]
 
-        except (ValueError, IndexError) as e:
-            logger.error(f"消息解析失败: {message}, 错误: {e}")
-            return {"mode": TERMINATE_MODE}
+        else:
+            return [mode]
 
     @staticmethod
-    def create_message(mode: int, **kwargs) -> str:
-        """创建BLE消息"""
-        if mode == RHYTHM_MODE:
-            return f"{mode},{kwargs.get('red', 255)},{kwargs.get('green', 140)},{kwargs.get('blue', 0)},{kwargs.get('timer', 0)},{kwargs.get('buzzer', 0)},{kwargs.get('sensor_mode', 1)}"
-
-        elif mode == DOUBLE_MODE:
-            return f"{mode},{kwargs.get('double_index', 0)}"
+    def create_message(mode: int, binary: bool = False, **kwargs) -> Union[str, bytes]:
+        """创建BLE消息（binary 为True时返回二进制格式）
 
-        elif mode == CONFIG_MODE:
-            return f"config:{kwargs.get('blink_count', 3)}"
-
-        else:
-            return str(mode)
+        标准模式给出 blink_break / timed_break / buzzer / buzzer_time / buffer / double_index / process
+        中任一参数时生成8字段格式，否则只有模式（双击模式只给 double_index 时为 "4,index" 简写）。
+        """
+        fields = BLEMessageParser.message_fields(mode, **kwargs)
+        if binary:
+            return encode_binary(fields)
+        if mode == CONFIG_MODE:
+            return f"config:{fields[1]}"
+        return ",".join(map(str, fields))
@@ -0,0 +1,78 @@
+"""
+RizSimulator Clock
+时钟抽象 - 支持真实单调时钟、手动推进的虚拟时钟和缩放时钟
+"""
+
+import time
+from typing import Optional
+
+
+class Clock:
+    """时钟基类（单位: 秒）"""
+
+    def now(self) -> float:
+        """当前时间"""
+        raise NotImplementedError
+
+    def now_ns(self) -> int:
+        """当前时间（整数纳秒，与 now 同一时间基准）"""
+        return round(self.now() * 1e9)
+
+
+class MonotonicClock(Clock):
+    """真实单调时钟（perf_counter: 单调且分辨率最高，time.monotonic 在Windows上只有约16ms）"""
+
+    def now(self) -> float:
+        return time.perf_counter()
+
+    def now_ns(self) -> int:
+        return time.perf_counter_ns()
+
+
+class VirtualClock(Clock):
+    """虚拟时钟 - 只在手动推进时前进，用于确定性/超实时仿真"""
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+
+    def now(self) -> float:
+        return self._now
+
+    def advance(self, delta: float):
+        """推进时间"""
+        if delta < 0:
+            raise ValueError(f"虚拟时钟不能倒退: {delta}")
+        self._now += delta
+
+    def set(self, timestamp: float):
+        """跳转到指定时间（不可早于当前时间）"""
+        if timestamp < self._now:
+            raise ValueError(f"虚拟时钟不能倒退: {timestamp} < {self._now}")
+        self._now = timestamp
+
+
+class ScaledClock(Clock):
+    """缩放时钟 - 以基准时钟的 scale 倍速前进"""
+
+    def __init__(self, scale: float = 1.0, base: Optional[Clock] = None):
+        if scale <= 0:
+            raise ValueError(f"时间缩放倍数必须大于0: {scale}")
+        self.base = base if base is not None else MonotonicClock()
+        self._scale = scale
+        self._base_origin = self.base.now()
+        self._origin = self._base_origin
+
+    @property
+    def scale(self) -> float:
+        return self._scale
+
+    def set_scale(self, scale: float):
+        """修改倍速，保持当前时间连续"""
+        if scale <= 0:
+            raise ValueError(f"时间缩放倍数必须大于0: {scale}")
+        self._origin = self.now()
+        self._base_origin = self.base.now()
+        self._scale = scale
+
+    def now(self) -> float:
+        return self._origin + (self.base.now() - self._base_origin) * self._scale
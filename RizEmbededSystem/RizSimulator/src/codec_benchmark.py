@@ -0,0 +1,84 @@
+"""
+RizSimulator Codec Benchmark
+BLE命令编解码基准 - 比较CSV文本与二进制格式的编码/解码耗时和空中字节数
+
+空中字节数按一次 ATT Write 计算: 消息 + ATT头 (opcode 1 + handle 2) + L2CAP头 (4)。未启用数据长度扩展时
+每个链路层数据包最多携带 27 字节，超出时一条命令需要多个数据包，可能跨越多个连接事件。
+"""
+
+import argparse
+import math
+import time
+from typing import Callable, Dict, List
+
+from ble.ble_server import BLEMessageParser, decode_command
+from constants import CONFIG_MODE, MANUAL_MODE, RHYTHM_MODE, TERMINATE_MODE, TIMED_MODE, WINDOW_MODE
+
+ATT_WRITE_OVERHEAD = 3 + 4  # ATT opcode + handle, L2CAP 长度 + 通道
+LL_MAX_PAYLOAD = 27         # 链路层数据包最大载荷 (BLE 4.0/4.1，无数据长度扩展)
+
+# 常用命令 (名称, 模式, 参数)，取自 BluetoothProtocol.md 的示例
+SAMPLE_COMMANDS = (
+    ("manual", MANUAL_MODE, dict(blink_break=999, timed_break=999, buzzer=999, buzzer_time=999,
+                                 buffer=999, double_index=999, process=999)),
+    ("timed", TIMED_MODE, dict(blink_break=1000, timed_break=5000, buzzer=1, buzzer_time=500,
+                               buffer=1, double_index=0, process=0)),
+    ("rhythm", RHYTHM_MODE, dict(red=255, green=0, blue=0, timer=1000, buzzer=500, sensor_mode=1)),
+    ("window", WINDOW_MODE, dict(total=5000, good=3000)),
+    ("config", CONFIG_MODE, dict(blink_count=4)),
+    ("terminate", TERMINATE_MODE, {}),
+)
+
+
+def air_packets(payload: int) -> int:
+    """一次写入占用的链路层数据包数"""
+    return math.ceil((payload + ATT_WRITE_OVERHEAD) / LL_MAX_PAYLOAD)
+
+
+def _time_per_call(function: Callable[[], object], repeat: int) -> float:
+    """每次调用的平均耗时 (微秒)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def run_benchmark(repeat: int = 20000) -> List[Dict]:
+    """逐条命令比较两种格式，解码不经过解析缓存"""
+    rows = []
+    for name, mode, params in SAMPLE_COMMANDS:
+        text = BLEMessageParser.create_message(mode, **params).encode('utf-8')
+        binary = BLEMessageParser.create_message(mode, binary=True, **params)
+        if decode_command(text) != decode_command(binary):
+            raise AssertionError(f"两种格式解码结果不一致: {name}")
+        rows.append({
+            "command": name,
+            "text_bytes": len(text),
+            "binary_bytes": len(binary),
+            "text_packets": air_packets(len(text)),
+            "binary_packets": air_packets(len(binary)),
+            "text_encode_us": _time_per_call(lambda: BLEMessageParser.create_message(mode, **params), repeat),
+            "binary_encode_us": _time_per_call(
+                lambda: BLEMessageParser.create_message(mode, binary=True, **params), repeat),
+            "text_decode_us": _time_per_call(lambda: decode_command(text), repeat),
+            "binary_decode_us": _time_per_call(lambda: decode_command(binary), repeat),
+        })
+    return rows
+
+
+def main():
+    """打印两种格式的字节数、链路层数据包数与编解码耗时"""
+    parser = argparse.ArgumentParser(description="RizSimulator BLE命令编解码基准")
+    parser.add_argument("--repeat", type=int, default=20000, help="每项计时的调用次数")
+    args = parser.parse_args()
+
+    print(f"{'命令':<10}{'字节 文本/二进制':>16}{'数据包':>8}{'编码us':>14}{'解码us':>14}")
+    for row in run_benchmark(args.repeat):
+        print(f"{row['command']:<10}{row['text_bytes']:>8}/{row['binary_bytes']:<7}"
+              f"{row['text_packets']:>4}/{row['binary_packets']:<3}"
+              f"{row['text_encode_us']:>7.2f}/{row['binary_encode_us']:<6.2f}"
+              f"{row['text_decode_us']:>7.2f}/{row['binary_decode_us']:<6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ RizSimulator Constants
 定义所有常量，基于ESP32固件 Global_VAR.h
 """
 
+from pathlib import Path
+
 # ===== 游戏模式常量 =====
 MANUAL_MODE = 1
 RANDOM_MODE = 2
@@ -10,6 +12,7 @@ TIMED_MODE = 3
 DOUBLE_MODE = 4
 RHYTHM_MODE = 5
 MOVEMENT_MODE = 6
+WINDOW_MODE = 7
 OPENING_MODE = 11
 CLOSING_MODE = 12
 TERMINATE_MODE = 13
@@ -24,6 +27,18 @@ OUTER_RING_COUNT = 24  # 外圈LED数量
 RGB_INTENSITY = 105    # 默认亮度
 RGB_REST_INTENSITY = 255
 
+# ===== 动画配置 (毫秒，来自固件 LightControl.cpp) =====
+RGB_DISPLAY_TIME = 1000      # 开机/连接/开启动画一轮的时长
+INIT_CLEAR_HOLD = 500        # 开机动画全灭后的停留时间
+INIT_ANIMATION_VARIANTS = 8  # 开机动画随机配色的变体数（变体间共享帧表缓存）
+RANDOM_WIPE_STEP = 5         # 随机模式逐颗点亮间隔
+CLOSING_BLINK_ON = 400       # 关闭动画每次亮灯时长
+CLOSING_BLINK_OFF = 300      # 关闭动画每次熄灭时长
+CLOSING_BLINK_COUNT = 3
+CONFIG_BUZZER_TIME = 400     # 配置白光的提示音（固定时长，不受蜂鸣器开关控制）
+REST_READY_BUZZER_TIME = 100  # 休息结束的就绪提示音（同上）
+ANIMATION_CACHE_SIZE = 64    # 动画帧表LRU缓存容量
+
 # ===== TOF传感器配置 =====
 AMPLITUDE_THRESHOLD = 5000
 AMPLITUDE_THRESHOLD_FACTOR = 1.04
@@ -33,6 +48,38 @@ COOLDOWN_DURATION = 400  # ms
 BASELINE_HISTORY_SIZE = 30
 MOVING_AVG_SIZE = 3
 
+# ===== TF-Luna 信号流 (固件 TF_Luna_UART.cpp / Global_VAR.h) =====
+TOF_SAMPLE_RATE = 250                 # 帧率 (Hz)，固件配置为250Hz，可选100Hz
+DYNAMIC_THRESHOLD_FACTOR = 1.09       # 动态基线检测阈值 (振幅偏离基线超过9%)
+BUFFER_AMPLITUDE_MIN = 100            # 只有此范围内的振幅进入基线历史
+BUFFER_AMPLITUDE_MAX = 6000
+
+# ===== 毫米波雷达 (固件 MMWave.cpp) =====
+MMWAVE_FRAME_RATE = 20                # 雷达上报帧率 (Hz)
+MMWAVE_SIGNAL_THRESHOLD = 150         # 默认期望信号强度 (_expectedSignalStrength)
+MMWAVE_WEAK_SIGNAL_FACTOR = 0.7       # 连续运动帧足够时允许的较弱信号
+MMWAVE_MOTION_FRAMES = 3              # 连续有目标帧数
+MMWAVE_MIN_DISTANCE = 10              # 有效检测距离 (cm)
+MMWAVE_MAX_DISTANCE = 150
+
+# ===== 窗口模式 (docs/PRD_Window_Mode.md，毫秒) =====
+DEFAULT_WINDOW_TOTAL = 5000           # 总倒计时时长
+DEFAULT_WINDOW_GOOD = 3000            # 最佳窗口时长
+WINDOW_TOTAL_MIN = 2000
+WINDOW_TOTAL_MAX = 10000
+WINDOW_GOOD_MIN = 1000
+WINDOW_MISS_BUZZER_TIME = 100         # 过早触发的短促提示音
+
+# ===== 游戏模式状态机 (v0.1.0 ProcessingTask) =====
+CMD_QUEUE_LENGTH = 8                  # 每个设备的事件队列长度 (固件 cmdQueue)
+
+# ===== BLE消息处理 =====
+BLE_COMMAND_CACHE_SIZE = 256          # 解析结果缓存的不同消息数 (LRU)
+BLE_BINARY_MAGIC = 0xA5               # 二进制命令首字节（不是合法的 UTF-8 首字节）
+BLE_BINARY_VERSION = 1                # 二进制命令格式版本
+INGEST_QUEUE_LENGTH = 64              # 每个设备的待处理写入上限（满时反压）
+INGEST_BATCH_SIZE = 256               # 工作协程每批最多处理的写入数，批间让出事件循环
+
 # ===== 蜂鸣器配置 =====
 DEFAULT_BUZZER = 1  # 开启
 DEFAULT_BUZZERTIME = 500  # ms
@@ -57,6 +104,10 @@ COLOR_ORANGE = (229, 75, 0)
 COLOR_TENNIS = (198, 237, 44)
 COLOR_PALE_GREEN = (0, 155, 0)
 COLOR_DEEP_GREEN = (3, 75, 3)
+COLOR_NEON_GREEN = (57, 255, 20)
+COLOR_RANDOM_OUTER = (120, 120, 120)  # 随机模式外圈
+COLOR_WINDOW_WAIT = (255, 140, 0)     # 窗口模式等待区
+COLOR_WINDOW_GOOD = (0, 255, 0)       # 窗口模式最佳窗口
 
 # ===== 连接状态 =====
 STATE_DISCONNECTED = 0
@@ -75,7 +126,16 @@ WINDOW_WIDTH = 1400
 WINDOW_HEIGHT = 900
 MIN_WIDTH = 1280
 MIN_HEIGHT = 720
-MAX_DEVICES = 20
+MAX_DEVICES = 20  # GUI可显示的最大设备数
+MAX_FLEET_DEVICES = 50000  # 设备管理器默认上限（无界面仿真）
+
+# ===== 仿真引擎配置 =====
+SIM_STEP_SIZE = 0.016  # 默认仿真步长 (秒)，与GUI 60fps刷新一致
+FLEET_INITIAL_CAPACITY = 64  # 设备群状态数组初始容量（不足时倍增）
+TRIGGER_LOG_INITIAL_CAPACITY = 4096  # 触发日志各列初始容量（不足时倍增）
+LATENCY_SUB_BUCKET_BITS = 6  # 延迟直方图精度: 每个2的幂区间32个桶，相对误差约1.6%
+SESSION_DB_PATH = Path(__file__).resolve().parent.parent / "data" / "sessions.db"  # 会话存储 (SQLite，项目根目录下)
+STORE_FLUSH_INTERVAL = 0.1  # 会话存储组提交间隔 (秒)
 
 # LED显示配置
 LED_SIZE = 6  # LED圆点大小
@@ -3,33 +3,97 @@ RizSimulator Device Core
 设备核心逻辑，基于ESP32固件
 """
 
-import time
+import math
 import random
+import time
 from typing import Optional, Callable
 
 from models import RizDevice, LEDState, TOFSensorState
+from scheduler import TimerScheduler
+from animation import AnimationTable, AnimationPlayer, compile_animation
+from tof_uart import CaptureReplay
+from trigger_log import SENSOR_MMWAVE, SENSOR_TOF, TriggerLog
+from game_fsm import GameFSM, EVENT_OFF
+from window_mode import WINDOW_EARLY, WINDOW_HIT, WINDOW_LATE, WINDOW_MESSAGES, classify as classify_window
+from mmwave import FRAME_SIZE as MMWAVE_FRAME_SIZE, parse_frames as parse_mmwave_frames, scan_frames
 from constants import *
 from logger import get_logger
 
 logger = get_logger("DeviceCore")
 
 
+def _record_detection(device: RizDevice, at: Optional[float], sensor: int, distance: int, amplitude: int,
+                      trigger_log: Optional[TriggerLog] = None) -> float:
+    """记录一次检测触发，返回检测时刻 (秒)
+
+    at 为触发帧的时间戳，未给出时读取设备时钟；换算为纳秒后与点亮时刻 light_on_ns 相减得到
+    反应时间（灯未点亮时无反应时间），计入设备统计并追加到触发日志。
+    """
+    if at is None:
+        at, detect_ns = device.clock.now(), device.clock.now_ns()
+    else:
+        detect_ns = round(at * 1e9)
+    light_on_ns = int(device.fleet.light_on_ns[device.slot])
+    reaction_time = (detect_ns - light_on_ns) / 1e6 if light_on_ns >= 0 else None
+    mode = device.config.prev_game_mode
+    device.stats.record_trigger(at, reaction_time, mode)
+
+    if trigger_log is not None:
+        leds = device.fleet.leds[device.slot]
+        lit = leds.any(axis=1)
+        color = leds[lit.argmax()] if lit.any() else (0, 0, 0)
+        trigger_log.append(device.device_id, mode, color, light_on_ns, detect_ns, reaction_time,
+                           distance, amplitude, sensor)
+    return at
+
+
 class DeviceController:
     """设备控制器 - 处理设备逻辑"""
 
-    def __init__(self, device: RizDevice):
+    def __init__(self, device: RizDevice, scheduler: Optional[TimerScheduler] = None,
+                 animation_player: Optional[AnimationPlayer] = None,
+                 rng: Optional[random.Random] = None, fsm: Optional[GameFSM] = None):
         self.device = device
+        self.rng = rng if rng is not None else random.Random()
         self.light_change_callback: Optional[Callable] = None
         self.state_change_callback: Optional[Callable] = None
         self.notification_callback: Optional[Callable] = None
 
+        # 截止时间调度器（为None时由调用方每帧轮询update）
+        self.scheduler = scheduler
+        # 批量动画播放器（为None时由update逐帧拷贝）
+        self.animation_player = animation_player
+
         # Animation state
         self.animation_running = False
         self.animation_start_time = 0
         self.animation_type = None
-
-    def turn_light_on(self, color: tuple, dual_led: bool = False):
-        """点亮灯光"""
+        self.animation_table: Optional[AnimationTable] = None
+        self.animation_frame = -1  # 当前显示的帧序号
+        self.buzzer_duration = device.config.buzzer_time  # 本次蜂鸣时长 (ms)
+        self.countdown_deadline: Optional[float] = None  # 节奏模式倒计时结束时间 (秒，设备时钟)
+        self.led_changed_ns = 0  # 最近一次LED变化的真实时刻 (perf_counter_ns)，用于统计系统处理延迟
+
+        # 游戏模式状态机（设备群共享，为None时使用本设备所在FleetState的私有状态机）
+        self.fsm = fsm if fsm is not None else GameFSM(device.fleet)
+        self.fsm.attach(device.slot, self._enter_mode)
+        self._mode_handlers = {
+            MANUAL_MODE: self._handle_manual_mode,
+            RANDOM_MODE: self._handle_random_mode,
+            TIMED_MODE: self._handle_timed_mode,
+            RHYTHM_MODE: self._handle_rhythm_mode,
+            DOUBLE_MODE: self._handle_double_mode,
+            MOVEMENT_MODE: self._handle_movement_mode,
+            WINDOW_MODE: self._handle_window_mode,
+            OPENING_MODE: self._handle_opening_mode,
+            CLOSING_MODE: self._handle_closing_mode,
+            TERMINATE_MODE: self._handle_terminate_mode,
+            CONFIG_MODE: self._handle_config_mode,
+            RESTTIMESUP_MODE: self._handle_rest_mode,
+        }
+
+    def turn_light_on(self, color: tuple, dual_led: bool = False, buzzer: bool = True):
+        """点亮灯光（buzzer 为False时由调用方自行处理蜂鸣）"""
         if dual_led:
             # 双LED模式：内圈外圈颜色不同
             r, g, b = color
@@ -39,284 +103,411 @@ class DeviceController:
             self.device.led_state.set_all(color)
 
         self.device.led_state.is_on = True
-
-        # 启动蜂鸣器
-        if self.device.config.buzzer_enabled:
-            self.device.buzzer_active = True
-            self.device.buzzer_start_time = time.time()
+        self._led_changed(True)
+        if buzzer:
+            self._start_buzzer()
 
         logger.info(f"[{self.device.name}] 点亮灯光 RGB{color}, 模式: {self.device.config.game_mode}, 双LED: {dual_led}")
 
         if self.light_change_callback:
             self.light_change_callback(self.device.led_state)
 
+    def _start_buzzer(self, duration: Optional[int] = None, force: bool = False):
+        """启动蜂鸣器（duration 为None时使用配置的 buzzer_time，单位: ms；force 为True时忽略蜂鸣器开关）"""
+        if force or self.device.config.buzzer_enabled:
+            self.buzzer_duration = duration if duration is not None else self.device.config.buzzer_time
+            self.device.buzzer_active = True
+            self.device.buzzer_start_time = self.device.clock.now()
+            self._reschedule()
+
+    def _led_changed(self, lit: bool):
+        """LED变化: 记录点亮时刻（设备时钟，熄灭时清除）与真实时刻"""
+        self.led_changed_ns = time.perf_counter_ns()
+        self.device.fleet.light_on_ns[self.device.slot] = self.device.clock.now_ns() if lit else -1
+
     def turn_light_off(self):
         """关闭灯光"""
         self.device.led_state.clear()
+        self._led_changed(False)
         self.device.buzzer_active = False
-        self.device.able_to_turn_on = False
-        self.animation_running = False
+        self.device.fleet.win_active[self.device.slot] = False
+        self.countdown_deadline = None
+        self._stop_animation()
+        self._reschedule()
+        self.fsm.post(self.device.slot, EVENT_OFF)
+        self.fsm.dispatch()
 
         logger.info(f"[{self.device.name}] 关闭灯光")
 
         if self.light_change_callback:
             self.light_change_callback(self.device.led_state)
 
-    def handle_game_mode(self, mode: int):
-        """处理游戏模式"""
+    def handle_game_mode(self, mode: int, arm: bool = False):
+        """处理游戏模式（arm 为True时先使设备就绪，对应收到一条新命令）"""
         logger.info(f"[{self.device.name}] 处理游戏模式: {mode}")
+        self.fsm.post_mode(self.device.slot, mode, arm)
+        self.fsm.dispatch()
 
-        if mode == MANUAL_MODE:
-            self._handle_manual_mode()
-        elif mode == RANDOM_MODE:
-            self._handle_random_mode()
-        elif mode == RHYTHM_MODE:
-            self._handle_rhythm_mode()
-        elif mode == DOUBLE_MODE:
-            self._handle_double_mode()
-        elif mode == OPENING_MODE:
-            self._handle_opening_mode()
-        elif mode == CLOSING_MODE:
-            self._handle_closing_mode()
-        elif mode == TERMINATE_MODE:
-            self._handle_terminate_mode()
-        elif mode == CONFIG_MODE:
-            self._handle_config_mode()
-        elif mode == RESTTIMESUP_MODE:
-            self._handle_rest_mode()
+    def _enter_mode(self, mode: int):
+        """状态机进入动作（查表分发），进入任何模式都会结束进行中的窗口倒计时"""
+        self.device.fleet.win_active[self.device.slot] = False
+        self._mode_handlers[mode]()
 
     def _handle_manual_mode(self):
-        """手动模式 - 根据process值显示不同蓝色"""
-        if self.device.able_to_turn_on and not self.device.led_state.is_on:
-            process = self.device.config.process
-
-            # 根据process选择颜色（来自固件的manualWipe）
-            if process > 50:
-                color = COLOR_PALE_BLUE  # 淡蓝色
-            elif process > 25:
-                color = COLOR_SKY_BLUE  # 天蓝色
-            else:
-                color = COLOR_DEEP_BLUE  # 深蓝色
-
-            self.turn_light_on(color)
-            self.device.tof_state.detection_active = True
-            self.device.able_to_turn_on = False
-            self.device.config.prev_game_mode = MANUAL_MODE
+        """手动模式 - 根据process值显示不同蓝色（外圈为轮换色）"""
+        process = self.device.config.process
+
+        # 根据process选择颜色（来自固件的manualWipe）
+        if process > 50:
+            color = COLOR_PALE_BLUE  # 淡蓝色
+        elif process > 25:
+            color = COLOR_SKY_BLUE  # 天蓝色
+        else:
+            color = COLOR_DEEP_BLUE  # 深蓝色
+
+        self.turn_light_on(color, dual_led=True)  # 固件emit默认dual_led=true
+        self.device.tof_state.detection_active = True
 
     def _handle_random_mode(self):
-        """随机模式 - 从绿/黄/红中随机选择"""
-        if self.device.able_to_turn_on and not self.device.led_state.is_on:
-            # 固件中的随机模式：Green, Yellow, Red
-            colors = [
-                (0, 255, 0),      # Green
-                (255, 255, 0),    # Yellow
-                (255, 0, 0),      # Red
-            ]
-            random_color = random.choice(colors)
-
-            self.turn_light_on(random_color)
-            self.device.tof_state.detection_active = True
-            self.device.able_to_turn_on = False
-            self.device.config.prev_game_mode = RANDOM_MODE
+        """随机模式 - 内圈霓虹绿、外圈灰色逐颗点亮（固件randomWipe）"""
+        self._start_buzzer()
+        self._start_animation("random")
+        self.device.tof_state.detection_active = True
+
+        logger.info(f"[{self.device.name}] 随机模式 霓虹绿RGB{COLOR_NEON_GREEN}")
+
+    def _handle_timed_mode(self):
+        """计时模式 - 根据process值选色全亮，在timed_break内逐颗熄灭倒计时（固件timedWipe）"""
+        process = self.device.config.process
+        if process > 50:
+            color = COLOR_PALE_BLUE
+        elif process > 25:
+            color = COLOR_ORANGE
+        else:
+            color = COLOR_DEEP_BLUE
+
+        self._start_buzzer()
+        self._start_animation("timed", color, self.device.config.timed_break)
+        if self.device.config.sensor_mode in [2, 3]:  # 2=MMWave, 3=Both
+            self.device.mmwave_state.detection_active = True
 
-            logger.info(f"[{self.device.name}] 随机模式选择颜色: RGB{random_color}")
+        logger.info(f"[{self.device.name}] 计时模式 RGB{color}, 时长: {self.device.config.timed_break}ms")
 
     def _handle_rhythm_mode(self):
-        """节奏模式 - 使用自定义RGB颜色"""
-        if self.device.able_to_turn_on and not self.device.led_state.is_on:
-            # 使用配置中的RGB值
-            color = (
-                self.device.config.red_value,
-                self.device.config.green_value,
-                self.device.config.blue_value
-            )
+        """节奏模式 - 使用自定义RGB颜色，rhythm_timer > 0 时倒计时结束熄灭（固件rhythmWipe）"""
+        config = self.device.config
+        color = (config.red_value, config.green_value, config.blue_value)
+
+        self.turn_light_on(color, buzzer=False)
+        # 固件 turnLightON: 节奏模式只要蜂鸣时长 > 0 就蜂鸣，不看蜂鸣器开关
+        if config.rhythm_buzzer_time > 0:
+            self._start_buzzer(config.rhythm_buzzer_time, force=True)
+        if config.rhythm_timer > 0:
+            self.countdown_deadline = self.device.clock.now() + config.rhythm_timer / 1000
+            self._reschedule()
+
+        # 根据sensor_mode决定是否启动TOF
+        if self.device.config.sensor_mode in [1, 3]:  # 1=LiDAR, 3=Both
+            self.device.tof_state.detection_active = True
+        if self.device.config.sensor_mode in [2, 3]:  # 2=MMWave, 3=Both
+            self.device.mmwave_state.detection_active = True
 
-            self.turn_light_on(color)
+        logger.info(f"[{self.device.name}] 节奏模式 RGB{color}, 倒计时: {config.rhythm_timer}ms, "
+                    f"传感器模式: {config.sensor_mode}")
 
-            # 根据sensor_mode决定是否启动TOF
-            if self.device.config.sensor_mode in [1, 3]:  # 1=LiDAR, 3=Both
-                self.device.tof_state.detection_active = True
+    def _handle_double_mode(self):
+        """双击模式 - Orange或Deep Blue"""
+        # 根据double_mode_index选择颜色
+        if self.device.config.double_mode_index == 0:
+            color = COLOR_ORANGE
+        else:
+            color = COLOR_DEEP_BLUE
 
-            self.device.able_to_turn_on = False
-            self.device.config.prev_game_mode = RHYTHM_MODE
+        self.turn_light_on(color, dual_led=False)  # 固件使用dual_led=false
 
-            logger.info(f"[{self.device.name}] 节奏模式 RGB{color}, 传感器模式: {self.device.config.sensor_mode}")
+        # 发送通知
+        if self.notification_callback:
+            msg = f"double{self.device.config.double_mode_index}"
+            self.notification_callback(msg)
+
+    def _handle_movement_mode(self):
+        """移动模式 - 自定义RGB常亮，由毫米波雷达检测玩家走近"""
+        color = (
+            self.device.config.red_value,
+            self.device.config.green_value,
+            self.device.config.blue_value
+        )
+
+        self.turn_light_on(color)
+        self.device.mmwave_state.detection_active = True
+
+        logger.info(f"[{self.device.name}] 移动模式 RGB{color}")
+
+    def _handle_window_mode(self):
+        """窗口模式 - 橙色等待区后瞬间变绿进入最佳窗口，双层对称逐颗熄灭倒计时（固件windowWipe）"""
+        config = self.device.config
+        self._start_buzzer()
+        self._start_animation("window", config.window_total, config.window_good)
+
+        slot = self.device.slot
+        fleet = self.device.fleet
+        start = self.animation_start_time
+        fleet.win_good[slot] = start + (config.window_total - config.window_good) / 1000
+        fleet.win_end[slot] = start + config.window_total / 1000
+        fleet.win_active[slot] = True
+        self._arm_window_sensors()
+
+        logger.info(f"[{self.device.name}] 窗口模式 总时长: {config.window_total}ms, 最佳窗口: {config.window_good}ms")
+
+    def _arm_window_sensors(self):
+        """按 sensor_mode 启动传感器（0=仅展示倒计时）"""
+        if self.device.config.sensor_mode in [1, 3]:
+            self.device.tof_state.detection_active = True
+        if self.device.config.sensor_mode in [2, 3]:
+            self.device.mmwave_state.detection_active = True
+
+    def window_detection(self, at: float) -> int:
+        """窗口倒计时中的检测（at 为检测时刻）: 命中则熄灭，过早则提示后继续倒计时，超时按倒计时结束处理"""
+        fleet = self.device.fleet
+        slot = self.device.slot
+        result = int(classify_window(at, fleet.win_good[slot], fleet.win_end[slot]))
+        if result == WINDOW_EARLY:
+            self.device.stats.record_window(result)
+            self._start_buzzer(WINDOW_MISS_BUZZER_TIME)
+            self._arm_window_sensors()
+            self._notify_window(result)
+        elif result == WINDOW_HIT:
+            self.device.stats.record_window(result, (at - fleet.win_good[slot]) * 1000)
+            self.turn_light_off()
+            self._start_buzzer()
+            self._notify_window(result)
+        else:
+            self.finish_window()
+        return result
 
-    def _handle_double_mode(self):
-        """双击模式 - Orange或Deep Blue"""
-        if self.device.able_to_turn_on and not self.device.led_state.is_on:
-            # 根据double_mode_index选择颜色
-            if self.device.config.double_mode_index == 0:
-                color = COLOR_ORANGE
-            else:
-                color = COLOR_DEEP_BLUE
-
-            self.turn_light_on(color, dual_led=False)  # 固件使用dual_led=false
-            self.device.able_to_turn_on = False
-            self.device.config.prev_game_mode = DOUBLE_MODE
-
-            # 发送通知
-            if self.notification_callback:
-                msg = f"double{self.device.config.double_mode_index}"
-                self.notification_callback(msg)
+    def finish_window(self):
+        """窗口倒计时结束未命中 - 停止检测并熄灭"""
+        self.device.tof_state.detection_active = False
+        self.device.mmwave_state.detection_active = False
+        self.turn_light_off()
+        self.device.stats.record_window(WINDOW_LATE)
+        self._notify_window(WINDOW_LATE)
+
+    def _notify_window(self, result: int):
+        message = WINDOW_MESSAGES[result]
+        logger.info(f"[{self.device.name}] 窗口模式结果: {message}")
+        if self.notification_callback:
+            self.notification_callback(message)
 
     def _handle_opening_mode(self):
-        """开启模式"""
+        """开启模式 - 深蓝/淡蓝/深蓝三轮点亮后熄灭"""
         # 采集TOF基线
         if self.device.tof_state.amplitude > 0:
             self.device.tof_state.add_baseline_sample(self.device.tof_state.amplitude)
 
-        self.turn_light_on(COLOR_WHITE)
-        self.device.able_to_turn_on = False
+        self._start_animation("opening")
         logger.info(f"[{self.device.name}] 开启模式 - 基线: {self.device.tof_state.baseline}")
 
     def _handle_closing_mode(self):
-        """关闭模式"""
-        self.turn_light_on(COLOR_WHITE)
+        """关闭模式 - 樱桃红闪烁三次后熄灭"""
+        self._start_animation("closing")
 
     def _handle_terminate_mode(self):
         """终止模式"""
         self.turn_light_off()
         self.device.tof_state.reset()
+        self.device.mmwave_state.reset()
         logger.info(f"[{self.device.name}] 终止模式")
 
     def _handle_config_mode(self):
-        """配置模式 - 显示白光并闪烁"""
+        """配置模式 - 48颗白光常亮，用于定位设备（固件configNumberWipe）"""
         count = self.device.config.config_blink_count
-        logger.info(f"[{self.device.name}] 配置模式 - 显示数字: {count}")
+        logger.info(f"[{self.device.name}] 配置模式 - 配置号: {count}")
 
-        # 点亮白光
-        self.turn_light_on(COLOR_WHITE)
-        self.device.able_to_turn_on = False
-
-        # 启动配置动画
-        self.animation_running = True
-        self.animation_type = "config"
-        self.animation_start_time = time.time()
+        self._stop_animation()
+        self.device.led_state.intensity = 255  # 固件调到最亮后不恢复，直到下一次休息动画结束
+        self.turn_light_on(COLOR_WHITE, buzzer=False)
+        self._start_buzzer(CONFIG_BUZZER_TIME, force=True)  # 固件 configNumberWipe 总是蜂鸣 400ms
 
         if self.notification_callback:
             self.notification_callback(f"config:{count}")
 
     def _handle_rest_mode(self):
-        """休息模式 - Tennis绿色倒计时"""
-        self.turn_light_on(COLOR_TENNIS)
-        self.device.able_to_turn_on = False
-
-        # 启动休息动画（倒计时熄灭）
-        self.animation_running = True
-        self.animation_type = "rest"
-        self.animation_start_time = time.time()
+        """休息模式 - Tennis绿全亮，在blink_break内逐颗熄灭"""
+        self.device.led_state.intensity = RGB_REST_INTENSITY
+        self._start_animation("rest", self.device.config.blink_break)
 
         logger.info(f"[{self.device.name}] 休息模式开始")
 
     def start_init_animation(self):
         """启动初始化动画（开机动画）"""
-        self.animation_running = True
-        self.animation_type = "init"
-        self.animation_start_time = time.time()
+        self._start_animation("init", self.rng.randrange(INIT_ANIMATION_VARIANTS))
         logger.info(f"[{self.device.name}] 启动初始化动画")
 
     def start_connected_animation(self):
         """启动连接成功动画"""
-        self.animation_running = True
-        self.animation_type = "connected"
-        self.animation_start_time = time.time()
+        self._start_animation("connected")
         logger.info(f"[{self.device.name}] 启动连接动画")
 
+    def _start_animation(self, animation_type: str, *params):
+        """启动动画（帧表按参数从缓存获取），首帧立即显示"""
+        table = compile_animation(animation_type, *params)
+        now = self.device.clock.now()
+        self.animation_running = True
+        self.animation_type = animation_type
+        self.animation_table = table
+        self.animation_frame = 0
+        self.animation_start_time = now
+        self.device.led_state.load_frame(table.frames[0], table.brightness[0], table.led_on[0])
+        self._led_changed(bool(table.led_on[0]))
+        if self.animation_player is not None:
+            self.animation_player.start(self.device.slot, table, now, frame=0)
+        self._reschedule()
+
+        if self.light_change_callback:
+            self.light_change_callback(self.device.led_state)
+
+    def _stop_animation(self):
+        """停止动画（不改动当前LED）"""
+        if self.animation_running and self.animation_player is not None:
+            self.animation_player.stop(self.device.slot)
+        self.animation_running = False
+
+    def _buzzer_deadline(self) -> float:
+        """蜂鸣器结束时间"""
+        return self.device.buzzer_start_time + self.buzzer_duration / 1000
+
+    def _animation_deadline(self) -> float:
+        """动画下一次需要处理的时间（批量播放时只需处理结束，否则逐帧）"""
+        if self.animation_player is not None:
+            return self.animation_start_time + self.animation_table.duration
+        elapsed = self.device.clock.now() - self.animation_start_time
+        return self.animation_start_time + self.animation_table.next_frame_time(elapsed)
+
+    def next_deadline(self) -> Optional[float]:
+        """下一次需要调用update的时间（无待处理事件时为None）"""
+        deadlines = []
+        if self.device.buzzer_active:
+            deadlines.append(self._buzzer_deadline())
+        if self.device.tof_state.is_cooldown:
+            deadlines.append(self.device.tof_state.cooldown_until)
+        if self.animation_running:
+            deadline = self._animation_deadline()
+            if not math.isinf(deadline):  # 常亮动画没有结束时间
+                deadlines.append(deadline)
+        if self.countdown_deadline is not None:
+            deadlines.append(self.countdown_deadline)
+        return min(deadlines) if deadlines else None
+
+    def _reschedule(self):
+        """向调度器登记下一次唤醒时间"""
+        if self.scheduler is None:
+            return
+        deadline = self.next_deadline()
+        if deadline is None:
+            self.scheduler.cancel(self.device.device_id)
+        else:
+            self.scheduler.schedule(self.device.device_id, deadline)
+
     def update(self, delta_time: float):
-        """更新设备状态（每帧调用）"""
+        """更新设备状态（轮询模式下每帧调用；调度模式下仅在截止时间到达时调用）"""
+        now = self.device.clock.now()
+
         # 更新蜂鸣器
-        if self.device.buzzer_active:
-            elapsed = (time.time() - self.device.buzzer_start_time) * 1000
-            if elapsed >= self.device.config.buzzer_time:
-                self.device.buzzer_active = False
+        if self.device.buzzer_active and now >= self._buzzer_deadline():
+            self.device.buzzer_active = False
 
         # 更新TOF冷却
-        if self.device.tof_state.is_cooldown:
-            elapsed = (time.time() - self.device.tof_state.cooldown_start) * 1000
-            if elapsed >= COOLDOWN_DURATION:
-                self.device.tof_state.is_cooldown = False
-                self.device.tof_state.consecutive_detections = 0
+        if self.device.tof_state.is_cooldown and now >= self.device.tof_state.cooldown_until:
+            self.device.tof_state.is_cooldown = False
+            self.device.tof_state.consecutive_detections = 0
 
         # 更新动画
         if self.animation_running:
             self._update_animation()
 
+        # 节奏模式倒计时结束 - 停止检测并熄灭（固件不发送通知）
+        if self.countdown_deadline is not None and now >= self.countdown_deadline:
+            self.device.tof_state.detection_active = False
+            self.device.mmwave_state.detection_active = False
+            self.turn_light_off()
+            logger.info(f"[{self.device.name}] 节奏模式倒计时结束，熄灭")
+
+        self._reschedule()
+
     def _update_animation(self):
-        """更新动画状态"""
-        elapsed = time.time() - self.animation_start_time
-
-        if self.animation_type == "init":
-            # 初始化动画 - 显示绿色主题随机渐变
-            # 简化版：显示Brat Green 1秒后结束
-            if elapsed < 1.0:
-                # 显示渐变绿色
-                progress = int(elapsed * 100) % 6
-                colors = [
-                    (138, 207, 0),   # Brat Green
-                    (155, 225, 0),   # Yellow-Green
-                    (195, 242, 0),   # Neon Yellow-Green
-                    (115, 170, 0),   # Dark Brat Green
-                    (125, 185, 0),   # Olive Green
-                    (120, 227, 0),   # Vibrant Green
-                ]
-                self.device.led_state.set_all(colors[progress])
-                if self.light_change_callback:
-                    self.light_change_callback(self.device.led_state)
-            else:
-                self.animation_running = False
-                self.turn_light_off()
-
-        elif self.animation_type == "connected":
-            # 连接动画 - Tennis绿色快速点亮
-            if elapsed < 0.5:
-                self.device.led_state.set_all(COLOR_TENNIS)
-                if self.light_change_callback:
-                    self.light_change_callback(self.device.led_state)
-            else:
-                self.animation_running = False
-                self.turn_light_off()
-
-        elif self.animation_type == "config":
-            # 配置动画 - 白光闪烁
-            blink_count = self.device.config.config_blink_count
-            blink_duration = 0.4  # 每次闪烁400ms
-            total_duration = blink_count * blink_duration * 2  # 亮+暗
-
-            if elapsed < total_duration:
-                cycle = int(elapsed / blink_duration)
-                if cycle % 2 == 0:
-                    # 亮
-                    self.device.led_state.set_all(COLOR_WHITE)
-                else:
-                    # 暗
-                    self.device.led_state.clear()
-
-                if self.light_change_callback:
-                    self.light_change_callback(self.device.led_state)
-            else:
-                self.animation_running = False
-                self.turn_light_off()
-
-        elif self.animation_type == "rest":
-            # 休息模式动画 - 倒计时熄灭（简化版：3秒后关闭）
-            if elapsed < 3.0:
-                # 逐渐变暗
-                brightness = 1.0 - (elapsed / 3.0)
-                self.device.led_state.brightness = max(0.0, brightness)
-                if self.light_change_callback:
-                    self.light_change_callback(self.device.led_state)
-            else:
-                self.animation_running = False
-                self.turn_light_off()
+        """更新动画状态 - 查表得到当前帧，换帧时整帧拷贝"""
+        table = self.animation_table
+        index = table.frame_index(self.device.clock.now() - self.animation_start_time)
+
+        if index < 0:
+            self._finish_animation()
+            return
+
+        if self.animation_player is None and index != self.animation_frame:
+            self.animation_frame = index
+            self.device.led_state.load_frame(
+                table.frames[index], table.brightness[index], table.led_on[index]
+            )
+            if self.light_change_callback:
+                self.light_change_callback(self.device.led_state)
+
+    def _finish_animation(self):
+        """动画结束 - 熄灭，休息结束时蜂鸣提示就绪，计时模式发送倒计时结束通知"""
+        animation_type = self.animation_type
+        self.turn_light_off()
+
+        if animation_type == "rest":
+            self.device.led_state.intensity = RGB_INTENSITY
+            self._start_buzzer(REST_READY_BUZZER_TIME, force=True)  # 固件 restWipe 结束后蜂鸣 100ms
+
+        if animation_type == "timed":
+            self.device.mmwave_state.detection_active = False  # 倒计时结束，雷达检测随之结束
+            if self.notification_callback:
+                self.notification_callback("timed_countdown:0")
 
 
 class TOFSensorController:
     """TOF传感器控制器"""
 
-    def __init__(self, device: RizDevice):
+    def __init__(self, device: RizDevice, rng: Optional[random.Random] = None,
+                 trigger_log: Optional[TriggerLog] = None):
         self.device = device
+        self.rng = rng if rng is not None else random.Random()
+        self.trigger_log = trigger_log  # 设备群共享的触发日志（为None时不记录）
         self.detection_callback: Optional[Callable] = None
+        self.replay: Optional[CaptureReplay] = None  # 抓包回放源
+        self._replay_index = -1
+
+    def start_replay(self, replay: CaptureReplay):
+        """用抓包帧代替距离滑块驱动传感器"""
+        self.replay = replay
+        self._replay_index = -1
+        logger.info(f"[{self.device.name}] 开始回放抓包: {len(replay.frames)} 帧, {replay.sample_rate}Hz")
+
+    def stop_replay(self):
+        self.replay = None
+
+    def update_replay(self, now: float) -> bool:
+        """推进抓包回放到 now，期间到达的帧依次计入滑动平均；回放结束时返回False"""
+        replay = self.replay
+        if replay is None:
+            return False
+
+        index = int(replay.index_at(now))
+        if index > self._replay_index:
+            frames = replay.frames
+            # 只有最后 MOVING_AVG_SIZE 帧会留在滑动平均中
+            for i in range(max(self._replay_index + 1, index + 1 - MOVING_AVG_SIZE), index + 1):
+                self.device.tof_state.add_amplitude_sample(int(frames.amplitude[i]))
+            self.device.tof_state.distance = int(frames.distance[index]) * 10  # cm -> mm
+            self._replay_index = index
+
+        if now >= replay.end_time:
+            self.replay = None
+            logger.info(f"[{self.device.name}] 抓包回放结束")
+            return False
+        return True
 
     def update_distance(self, distance: int):
         """更新距离值"""
@@ -325,12 +516,12 @@ class TOFSensorController:
         # 根据距离计算振幅（模拟真实传感器）
         if distance < 300:
             # 近距离 - 高振幅
-            base_amplitude = 5000 + random.randint(0, 1000)
+            base_amplitude = 5000 + self.rng.randint(0, 1000)
         else:
             # 远距离 - 低振幅
-            base_amplitude = 100 + random.randint(0, 200)
+            base_amplitude = 100 + self.rng.randint(0, 200)
 
-        self.device.tof_state.amplitude = base_amplitude
+        self.device.tof_state.add_amplitude_sample(base_amplitude)
 
     def check_detection(self) -> bool:
         """检查是否检测到物体"""
@@ -341,12 +532,8 @@ class TOFSensorController:
         if self.device.tof_state.is_cooldown:
             return False
 
-        # 检测逻辑
-        threshold = int(self.device.tof_state.baseline * AMPLITUDE_THRESHOLD_FACTOR)
-        if threshold == 0:
-            threshold = AMPLITUDE_THRESHOLD
-
-        if self.device.tof_state.amplitude > threshold:
+        # 检测逻辑（阈值在基线更新时已预先计算）
+        if self.device.tof_state.amplitude > self.device.tof_state.threshold:
             self.device.tof_state.consecutive_detections += 1
 
             if self.device.tof_state.consecutive_detections >= CONSECUTIVE_READINGS:
@@ -358,18 +545,19 @@ class TOFSensorController:
 
         return False
 
-    def _trigger_detection(self):
-        """触发检测"""
+    def _trigger_detection(self, at: Optional[float] = None):
+        """触发检测（at 为检测时刻，批量检测传入触发帧的时间戳，默认为当前时间）"""
         logger.info(f"[{self.device.name}] TOF检测到物体! 距离: {self.device.tof_state.distance}mm, 振幅: {self.device.tof_state.amplitude}")
+        state = self.device.tof_state
+        now = _record_detection(self.device, at, SENSOR_TOF, state.distance, state.amplitude, self.trigger_log)
 
         # 进入冷却期
         self.device.tof_state.is_cooldown = True
-        self.device.tof_state.cooldown_start = time.time()
+        self.device.tof_state.cooldown_start = now
+        self.device.tof_state.last_detection_time = now
         self.device.tof_state.consecutive_detections = 0
         self.device.tof_state.detection_active = False
-
-        # 记录统计
-        self.device.stats.record_trigger()
+        self.device.mmwave_state.detection_active = False  # 灯已熄灭，雷达检测一并结束
 
         # 回调
         if self.detection_callback:
@@ -388,3 +576,59 @@ class TOFSensorController:
         # 直接触发检测（不修改distance/amplitude，避免影响update_all中的check_detection）
         logger.info(f"[{self.device.name}] 模拟触碰触发")
         self._trigger_detection()
+
+
+class MMWaveSensorController:
+    """毫米波雷达控制器
+
+    设备群的合成目标由 DeviceManager 的 MMWaveRadar 批量生成；feed 用于把真实抓包或
+    encode_frames 生成的串口数据送入单个设备，此后该设备不再生成合成目标。
+    """
+
+    def __init__(self, device: RizDevice, trigger_log: Optional[TriggerLog] = None):
+        self.device = device
+        self.trigger_log = trigger_log  # 设备群共享的触发日志（为None时不记录）
+        self.detection_callback: Optional[Callable] = None
+        self._uart = b""  # 未凑满一帧的串口数据
+
+    def set_expected_signal_strength(self, value: int):
+        """设置期望信号强度（固件 setExpectedSignalStrength）"""
+        self.device.mmwave_state.expected_signal_strength = value
+
+    def feed(self, data: bytes) -> bool:
+        """处理一段雷达串口数据，检测中且有帧进入范围时触发并返回True"""
+        state = self.device.mmwave_state
+        self.device.fleet.mmw_external[self.device.slot] = True
+        if not state.detection_active:
+            self._uart = b""
+            return False
+
+        buffer = self._uart + bytes(data)
+        frames = parse_mmwave_frames(buffer)
+        end = int(frames.offset[-1]) + MMWAVE_FRAME_SIZE if len(frames) else 0
+        self._uart = buffer[max(end, len(buffer) - MMWAVE_FRAME_SIZE + 1):]
+        if len(frames) == 0:
+            return False
+
+        index, state.motion_frames = scan_frames(frames, state.motion_frames, state.expected_signal_strength)
+        last = index if index >= 0 else len(frames) - 1
+        state.update_frame(int(frames.presence[last]), int(frames.distance[last]), int(frames.signal[last]))
+        if index < 0:
+            return False
+
+        self._uart = b""  # 固件检测到目标后清空串口缓冲并退出检测任务
+        self._trigger_detection()
+        return True
+
+    def _trigger_detection(self, at: Optional[float] = None):
+        """触发检测（at 为检测时刻，批量检测传入触发帧的时间戳，默认为当前时间）"""
+        state = self.device.mmwave_state
+        logger.info(f"[{self.device.name}] 雷达检测到目标! 距离: {state.distance}cm, 信号强度: {state.signal}")
+        now = _record_detection(self.device, at, SENSOR_MMWAVE, state.distance * 10, state.signal, self.trigger_log)
+
+        state.detection_active = False
+        self.device.tof_state.detection_active = False  # 灯已熄灭，TOF检测一并结束
+        self.device.tof_state.last_detection_time = now
+
+        if self.detection_callback:
+            self.detection_callback()
@@ -3,13 +3,38 @@ RizSimulator Device Manager
 设备管理器 - 管理多个设备实例
 """
 
-from typing import Dict, List, Optional
+import itertools
+import numbers
+import random
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
 from models import RizDevice
-from device_core import DeviceController, TOFSensorController
-from ble.ble_server import BLEGATTServer, BLEMessageParser
+from clock import Clock, MonotonicClock
+from fleet_state import FleetState
+from tof_detection import detect_batch
+from tof_stream import SignalModel, TOFStream
+from tof_uart import CaptureReplay, TOFFrames
+from mmwave import MMWaveRadar, TargetModel
+from power import BatteryModel, PowerMonitor
+from scheduler import TimerScheduler
+from animation import AnimationPlayer
+from game_fsm import GameFSM
+from window_mode import expired_slots as expired_windows, validate_window
+from device_core import DeviceController, TOFSensorController, MMWaveSensorController
+from ble.ble_server import BLECommand, BLEGATTServer, BLEMessageParser
+from session_log import SessionEvent, SessionRecorder
+from latency import PERCENTILES, LatencySeries, summarize
+from trigger_log import TriggerLog
+from session_store import SessionStore
 from constants import (
-    MAX_DEVICES, STATE_CONNECTED, STATE_ADVERTISING, STATE_DISCONNECTED,
-    CHARACTERISTIC_MSG_UUID
+    MAX_FLEET_DEVICES, STATE_CONNECTED, STATE_ADVERTISING, STATE_DISCONNECTED,
+    CHARACTERISTIC_MSG_UUID, TOF_SAMPLE_RATE, MANUAL_MODE, RANDOM_MODE, TIMED_MODE, RHYTHM_MODE,
+    MOVEMENT_MODE
 )
 from logger import get_logger
 
@@ -19,31 +44,69 @@ logger = get_logger("DeviceManager")
 class DeviceManager:
     """设备管理器"""
 
-    def __init__(self):
+    def __init__(self, max_devices: int = MAX_FLEET_DEVICES, clock: Optional[Clock] = None,
+                 fleet: Optional[FleetState] = None, seed: Optional[int] = None,
+                 signal_model: Optional[SignalModel] = None,
+                 battery_model: Optional[BatteryModel] = None):
+        self.max_devices = max_devices
+        self.clock = clock if clock is not None else MonotonicClock()
+        # 所有设备共享的随机源（传感器噪声、开机动画配色），种子会写入会话录制以便重放
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.recorder: Optional[SessionRecorder] = None
+        self.fleet = fleet if fleet is not None else FleetState()  # 所有设备状态的连续数组存储
+        self.scheduler = TimerScheduler()  # 蜂鸣器/冷却/动画截止时间
+        # 错开执行的广播命令: 序号 -> (消息, 命令, 设备ID)，到期时间由独立的调度器管理
+        self.broadcast_scheduler = TimerScheduler()
+        self._broadcasts: Dict[int, Tuple[Union[str, bytes], BLECommand, List[int]]] = {}
+        self._broadcast_seq = itertools.count()
+        self.animation_player = AnimationPlayer(self.fleet)  # 所有设备的动画帧批量渲染
+        self.fsm = GameFSM(self.fleet)  # 所有设备的游戏模式状态机与事件队列
+        self.tof_stream: Optional[TOFStream] = None  # 设置信号模型后按传感器帧率检测
+        self._replaying: Dict[int, int] = {}  # 抓包回放中的设备: device_id -> slot
+        # 毫米波雷达合成目标（独立的随机源，启用雷达不影响其余随机序列）
+        self.mmwave = MMWaveRadar(self.fleet, TargetModel(), np.random.default_rng((self.seed, 1)))
+        # 功耗积分（只读观测，不影响仿真，因此不写入会话录制）
+        self.power = PowerMonitor(self.fleet, battery_model if battery_model is not None else BatteryModel())
+        # 仿真器自身的处理延迟 BLE写入 -> LED变化 (ms，真实时间，与设备时钟无关)
+        self.system_latency = LatencySeries()
+        # 所有设备的逐次触发记录（列式，只追加）
+        self.trigger_log = TriggerLog()
+        # 会话持久化（start_persistence 后每帧把新的触发记录交给后台写线程）
+        self.store: Optional[SessionStore] = None
+        self.session_id: Optional[str] = None
+        self._stored_triggers = 0  # 已交给存储的触发日志行数
+        if signal_model is not None:
+            self.set_signal_model(signal_model)
         self.devices: Dict[int, RizDevice] = {}
         self.controllers: Dict[int, DeviceController] = {}
         self.tof_controllers: Dict[int, TOFSensorController] = {}
+        self.mmwave_controllers: Dict[int, MMWaveSensorController] = {}
         self.ble_servers: Dict[int, BLEGATTServer] = {}
         self.next_id = 1
 
     def create_device(self) -> RizDevice:
         """创建新设备"""
-        if len(self.devices) >= MAX_DEVICES:
-            raise ValueError(f"最多支持 {MAX_DEVICES} 个设备")
+        if len(self.devices) >= self.max_devices:
+            raise ValueError(f"最多支持 {self.max_devices} 个设备")
 
         device_id = self.next_id
-        device = RizDevice(device_id=device_id)
+        self._record(SessionEvent.CREATE, device_id)
+        slot = self.fleet.allocate(device_id)
+        device = RizDevice(device_id=device_id, clock=self.clock, fleet=self.fleet, slot=slot)
         self.devices[device_id] = device
 
         # 创建控制器
-        self.controllers[device_id] = DeviceController(device)
-        self.tof_controllers[device_id] = TOFSensorController(device)
+        self.controllers[device_id] = DeviceController(device, self.scheduler, self.animation_player, self.rng, self.fsm)
+        self.tof_controllers[device_id] = TOFSensorController(device, self.rng, self.trigger_log)
+        self.mmwave_controllers[device_id] = MMWaveSensorController(device, self.trigger_log)
 
         # 创建BLE服务器
         ble_server = BLEGATTServer(device_id, device.name)
         ble_server.on_connect_callback = lambda: self._on_device_connect(device_id)
         ble_server.on_disconnect_callback = lambda: self._on_device_disconnect(device_id)
         ble_server.on_message_callback = lambda msg: self._on_device_message(device_id, msg)
+        ble_server.on_write_callback = lambda uuid, data: self._record(SessionEvent.BLE_WRITE, device_id, (uuid, data))
         self.ble_servers[device_id] = ble_server
         device.ble_server = ble_server
 
@@ -52,6 +115,8 @@ class DeviceManager:
         ble_server.is_advertising = True
 
         self.next_id += 1
+        if self.store is not None:
+            self.store.add_devices(self.session_id, [(device_id, device.name, device.mac_address)])
         logger.info(f"创建设备: {device.name} (当前设备数: {len(self.devices)})")
 
         return device
@@ -63,6 +128,7 @@ class DeviceManager:
             return False
 
         device = self.devices[device_id]
+        self._record(SessionEvent.REMOVE, device_id)
 
         # 停止BLE服务器
         if device_id in self.ble_servers:
@@ -72,10 +138,21 @@ class DeviceManager:
         del self.devices[device_id]
         del self.controllers[device_id]
         del self.tof_controllers[device_id]
+        del self.mmwave_controllers[device_id]
+        self._stop_capture_replay(device_id)
+        self.scheduler.cancel(device_id)
+        self.fsm.detach(device.slot)
+        device.stats.withdraw()
+        self.fleet.release(device.slot)
 
         logger.info(f"移除设备: {device.name} (剩余设备数: {len(self.devices)})")
         return True
 
+    def remove_all_devices(self):
+        """移除所有设备"""
+        for device_id in list(self.devices):
+            self.remove_device(device_id)
+
     def get_device(self, device_id: int) -> Optional[RizDevice]:
         """获取设备"""
         return self.devices.get(device_id)
@@ -88,6 +165,10 @@ class DeviceManager:
         """获取TOF控制器"""
         return self.tof_controllers.get(device_id)
 
+    def get_mmwave_controller(self, device_id: int) -> Optional[MMWaveSensorController]:
+        """获取毫米波雷达控制器"""
+        return self.mmwave_controllers.get(device_id)
+
     def get_all_devices(self) -> List[RizDevice]:
         """获取所有设备"""
         return list(self.devices.values())
@@ -98,11 +179,11 @@ class DeviceManager:
 
     def get_connected_count(self) -> int:
         """获取已连接设备数"""
-        return sum(1 for d in self.devices.values() if d.connection_state == STATE_CONNECTED)
+        return self.fleet.counters.by_state[STATE_CONNECTED]
 
     def get_advertising_count(self) -> int:
         """获取广播中设备数"""
-        return sum(1 for d in self.devices.values() if d.connection_state == STATE_ADVERTISING)
+        return self.fleet.counters.by_state[STATE_ADVERTISING]
 
     def start_all_advertising(self):
         """启动所有设备广播"""
@@ -134,17 +215,109 @@ class DeviceManager:
 
         logger.info(f"断开 {count} 个设备连接")
 
-    def update_all(self, delta_time: float):
-        """更新所有设备"""
-        for device_id, controller in self.controllers.items():
-            controller.update(delta_time)
-
-            # 检查TOF检测
-            tof_controller = self.tof_controllers[device_id]
-            if tof_controller.check_detection():
-                # 检测到物体 - 关灯并发送通知
-                controller.turn_light_off()
-                self._send_notification(device_id)
+    def update_all(self, delta_time: float) -> List[int]:
+        """更新所有设备，返回本帧TOF/雷达检测触发的设备ID"""
+        now = self.clock.now()
+        # 到期的错开广播（在帧录制之前执行，与重放时 BLE写入先于帧推进的顺序一致）
+        for key in self.broadcast_scheduler.pop_due(now):
+            self._apply_broadcast(*self._broadcasts.pop(key))
+        self._record(SessionEvent.TICK, 0, delta_time)
+
+        # 先按上一帧以来保持的LED/蜂鸣器/传感器状态累计功耗
+        self.power.step(now)
+
+        # 只唤醒有到期事件（蜂鸣器/冷却/动画）的设备，空闲设备不占用CPU
+        for device_id in self.scheduler.pop_due(now):
+            controller = self.controllers.get(device_id)
+            if controller is not None:
+                controller.update(delta_time)
+
+        # 批量渲染播放中的动画帧
+        self.animation_player.render(now)
+
+        # 抓包回放
+        for device_id in [d for d in self._replaying if not self.tof_controllers[d].update_replay(now)]:
+            self._stop_capture_replay(device_id)
+
+        # 批量TOF检测，只对触发的设备逐个分发
+        if self.tof_stream is not None:
+            fired_slots = self.tof_stream.step(now)
+        else:
+            fired_slots = detect_batch(self.fleet, now)
+        fired_ids = self.fleet.device_id[fired_slots].tolist()
+        detect_times = self.fleet.last_detection_time[fired_slots].tolist()
+        for device_id, at in zip(fired_ids, detect_times):
+            self.tof_controllers[device_id]._trigger_detection(at)
+
+            # 检测到物体 - 关灯并发送通知
+            self._on_detection(device_id, at)
+
+        # 批量雷达检测（TOF已触发的设备雷达检测已随之结束）
+        radar_slots = self.mmwave.step(now)
+        radar_ids = self.fleet.device_id[radar_slots].tolist()
+        for device_id, at in zip(radar_ids, self.fleet.last_detection_time[radar_slots].tolist()):
+            self.mmwave_controllers[device_id]._trigger_detection(at)
+            self._on_detection(device_id, at)
+
+        # 窗口模式倒计时结束（在检测之后处理，同一帧内早于结束时刻的检测已计为命中）
+        for device_id in self.fleet.device_id[expired_windows(self.fleet, now)].tolist():
+            self.controllers[device_id].finish_window()
+
+        if self.store is not None:
+            self._persist_triggers()
+        return fired_ids + radar_ids
+
+    def _on_detection(self, device_id: int, at: float):
+        """传感器触发: 窗口倒计时中按检测时刻分类，其余模式关灯并发送通知"""
+        device = self.devices[device_id]
+        if self.fleet.win_active[device.slot]:
+            self.controllers[device_id].window_detection(at)
+            return
+        self.controllers[device_id].turn_light_off()
+        self._send_notification(device_id)
+
+    def set_signal_model(self, model: Optional[SignalModel]):
+        """启用TF-Luna信号流与固件动态基线检测（None 恢复按距离滑块的阈值检测）"""
+        self._record(SessionEvent.SIGNAL_MODEL, 0, asdict(model) if model is not None else {})
+        if model is None:
+            self.tof_stream = None
+        else:
+            # 独立于 self.rng 的随机源，启用信号流不影响其余随机序列
+            self.tof_stream = TOFStream(self.fleet, model, np.random.default_rng(self.seed))
+            for device_id, slot in self._replaying.items():
+                self.tof_stream.sources[slot] = self.tof_controllers[device_id].replay
+        logger.info(f"TOF信号模型: {model}")
+
+    def set_target_model(self, model: TargetModel):
+        """设置毫米波雷达合成目标的参数"""
+        self._record(SessionEvent.TARGET_MODEL, 0, asdict(model))
+        self.mmwave.model = model
+        logger.info(f"雷达目标模型: {model}")
+
+    def start_capture_replay(self, device_id: int, frames: TOFFrames,
+                             sample_rate: float = TOF_SAMPLE_RATE):
+        """从当前时刻开始按帧率回放抓包（信号流模式下抓包振幅逐帧送入固件检测器）
+
+        抓包数据不写入会话录制。
+        """
+        device = self.devices.get(device_id)
+        if not device:
+            return
+        replay = CaptureReplay(frames, self.clock.now(), sample_rate)
+        self.tof_controllers[device_id].start_replay(replay)
+        self._replaying[device_id] = device.slot
+        if self.tof_stream is not None:
+            self.tof_stream.sources[device.slot] = replay
+
+    def _stop_capture_replay(self, device_id: int):
+        slot = self._replaying.pop(device_id, None)
+        if slot is None:
+            return
+        controller = self.tof_controllers.get(device_id)
+        if controller is not None:
+            controller.stop_replay()
+        if self.tof_stream is not None:
+            self.tof_stream.sources.pop(slot, None)
 
     def _send_notification(self, device_id: int):
         """发送BLE通知"""
@@ -156,52 +329,93 @@ class DeviceManager:
         mode = device.config.prev_game_mode
         msg = ""
 
-        if mode == 1:  # MANUAL_MODE
+        if mode == MANUAL_MODE:
             msg = "manual"
-        elif mode == 2:  # RANDOM_MODE
+        elif mode == RANDOM_MODE:
             msg = "random"
-        elif mode == 5:  # RHYTHM_MODE
+        elif mode == TIMED_MODE:
+            msg = "timed"
+        elif mode == RHYTHM_MODE:
             msg = "rhythm"
+        elif mode == MOVEMENT_MODE:
+            msg = "movement"
 
         if msg:
             logger.info(f"[{device.name}] 发送通知: {msg}")
 
     def get_summary(self) -> dict:
-        """获取设备管理器摘要"""
-        # 计算活跃设备（LED亮起的设备）
-        active_devices = sum(1 for d in self.devices.values() if d.led_state.is_on)
+        """获取设备管理器摘要（计数类为增量计数器O(1)，反应时间分位数由设备群直方图计算，
+        电池统计对设备群向量化计算）"""
+        counters = self.fleet.counters
+        trigger_count = counters.trigger_count
+        reaction_count = counters.reaction_count
+        avg_response_time = counters.total_reaction_time / reaction_count if reaction_count > 0 else 0
 
-        # 计算总触发次数
-        total_triggers = sum(d.stats.trigger_count for d in self.devices.values())
+        by_state = {state: n for state, n in counters.by_state.items() if n > 0}
+        by_mode = {mode: n for mode, n in counters.by_mode.items() if n > 0}
 
-        # 计算平均反应时间
-        total_reaction_time = sum(d.stats.total_reaction_time for d in self.devices.values())
-        trigger_count = sum(d.stats.trigger_count for d in self.devices.values())
-        avg_response_time = total_reaction_time / trigger_count if trigger_count > 0 else 0
-
-        # 按连接状态分组
-        by_state = {}
-        for device in self.devices.values():
-            state = device.connection_state
-            by_state[state] = by_state.get(state, 0) + 1
-
-        # 按游戏模式分组
-        by_mode = {}
-        for device in self.devices.values():
-            mode = device.config.game_mode
-            by_mode[mode] = by_mode.get(mode, 0) + 1
+        connected = counters.by_state[STATE_CONNECTED]
+        advertising = counters.by_state[STATE_ADVERTISING]
+        percentiles = counters.reactions.percentiles(PERCENTILES).tolist()
 
         return {
             'total_devices': len(self.devices),
-            'active_devices': active_devices,
-            'total_triggers': total_triggers,
+            'active_devices': counters.led_on,
+            'total_triggers': trigger_count,
             'average_response_time': avg_response_time,
+            **{f'response_time_p{q}': value for q, value in zip(PERCENTILES, percentiles)},
+            'average_system_latency': self.system_latency.mean,
             'by_state': by_state,
             'by_mode': by_mode,
-            'connected': self.get_connected_count(),
-            'advertising': self.get_advertising_count(),
-            'disconnected': len(self.devices) - self.get_connected_count() - self.get_advertising_count(),
-            'max_devices': MAX_DEVICES,
+            'connected': connected,
+            'advertising': advertising,
+            'disconnected': len(self.devices) - connected - advertising,
+            'max_devices': self.max_devices,
+            **self._battery_summary(),
+        }
+
+    def get_latency_report(self) -> dict:
+        """延迟分布: 设备群反应时间（点亮 -> 检测，总体及按游戏模式）与系统处理延迟（BLE写入 -> LED变化），单位 ms"""
+        counters = self.fleet.counters
+        reaction = summarize(counters.reactions)
+        if counters.reaction_count:
+            reaction['mean'] = counters.total_reaction_time / counters.reaction_count
+        return {
+            'reaction': reaction,
+            'reaction_by_mode': {mode: summarize(sketch)
+                                 for mode, sketch in counters.reactions_by_mode.items() if sketch.count},
+            'system': self.system_latency.summary(),
+        }
+
+    def _battery_summary(self) -> dict:
+        """电池统计: 最低/平均电量百分比、平均电流 (mA)、最先耗尽设备的预计剩余时间 (秒)"""
+        slots = self.fleet.active_slots()
+        if len(slots) == 0:
+            return {'battery_min': 0, 'battery_average': 0.0, 'average_current': 0.0, 'time_to_empty': None}
+
+        percentage = self.power.reported_percentage(slots)
+        time_to_empty = float(self.power.time_to_empty(slots).min())
+        return {
+            'battery_min': int(percentage.min()),
+            'battery_average': float(percentage.mean()),
+            'average_current': float(self.fleet.current_avg[slots].mean()),
+            'time_to_empty': time_to_empty if time_to_empty != float('inf') else None,
+        }
+
+    def get_battery(self, device_id: int) -> Optional[dict]:
+        """单个设备的电池状态"""
+        device = self.devices.get(device_id)
+        if not device:
+            return None
+        slots = np.array([device.slot])
+        time_to_empty = float(self.power.time_to_empty(slots)[0])
+        return {
+            'percentage': int(self.power.reported_percentage(slots)[0]),
+            'voltage': float(self.power.voltage(slots)[0]),
+            'charge_used': device.charge_used,
+            'energy_used': float(self.fleet.energy_used[device.slot]),
+            'current': float(self.power.current(slots)[0]),
+            'time_to_empty': time_to_empty if time_to_empty != float('inf') else None,
         }
 
     # ===== BLE回调方法 =====
@@ -229,42 +443,315 @@ class DeviceManager:
         device.connection_state = STATE_ADVERTISING
         logger.info(f"[{device.name}] BLE断开连接")
 
-    def _on_device_message(self, device_id: int, message: str):
-        """设备消息回调"""
+    def _on_device_message(self, device_id: int, message: Union[str, bytes]):
+        """设备消息回调（文本消息已解码，二进制消息为原始字节）"""
         device = self.devices.get(device_id)
         controller = self.controllers.get(device_id)
 
         if not device or not controller:
             return
 
+        server = self.ble_servers.get(device_id)
+        received_ns = server.write_ns if server is not None and server.write_ns else time.perf_counter_ns()
         logger.info(f"[{device.name}] 收到BLE消息: {message}")
 
         # 解析消息
-        parsed = BLEMessageParser.parse_message(message)
-        mode = parsed.get("mode")
-
-        if mode is None:
+        command = BLEMessageParser.parse_command(message)
+        if command.mode is None:
             logger.warning(f"[{device.name}] 无效的BLE消息: {message}")
             return
 
-        # 重置设备状态
-        device.able_to_turn_on = True
-
-        # 应用参数
-        if "red" in parsed:
-            device.config.red_value = parsed["red"]
-            device.config.green_value = parsed["green"]
-            device.config.blue_value = parsed["blue"]
-            device.config.sensor_mode = parsed.get("sensor_mode", 1)
-
-        if "double_index" in parsed:
-            device.config.double_mode_index = parsed["double_index"]
+        # 应用参数，新命令使设备就绪后执行游戏模式
+        self._apply_command(device, command)
+        controller.handle_game_mode(command.mode, arm=True)
+        self._record_system_latency(device, controller, received_ns)
+
+    def _record_system_latency(self, device: RizDevice, controller: DeviceController, received_ns: int):
+        """命令改变了LED（被状态机忽略的命令不计入）时记录系统处理延迟"""
+        if controller.led_changed_ns >= received_ns:
+            latency = (controller.led_changed_ns - received_ns) / 1e6
+            device.stats.system_latency.record(latency)
+            self.system_latency.record(latency)
+
+    @staticmethod
+    def _apply_command(device: RizDevice, command: BLECommand):
+        """把BLE命令携带的参数写入设备配置"""
+        config = device.config
+        if command.blink_break is not None:  # 标准8字段格式
+            config.blink_break = command.blink_break
+            config.timed_break = command.timed_break
+            config.buzzer_enabled = command.buzzer == 1
+            config.buzzer_time = command.buzzer_time
+            config.buffer_time = command.buffer + 1  # 固件 setBuffer(buffer + 1)
+            config.process = command.process
+
+        if command.red is not None:
+            config.red_value = command.red
+            config.green_value = command.green
+            config.blue_value = command.blue
+            config.rhythm_timer = command.timer
+            config.rhythm_buzzer_time = command.buzzer
+            config.sensor_mode = command.sensor_mode if command.sensor_mode is not None else 1
+
+        if command.double_index is not None:
+            config.double_mode_index = command.double_index
+
+        if command.blink_count is not None:
+            config.config_blink_count = command.blink_count
+
+        if command.window_total is not None:
+            config.window_total = command.window_total
+            config.window_good = command.window_good
+            config.buzzer_enabled = command.buzzer == 1
+            config.buzzer_time = command.buzzer_time
+            config.sensor_mode = command.sensor_mode
+
+    # ===== 广播 =====
+
+    def broadcast(self, message: Union[str, bytes],
+                  targets: Union[Iterable[int], Callable[[RizDevice], bool], None] = None,
+                  stagger: Union[float, Sequence[float]] = 0.0) -> int:
+        """向多个设备发送同一条BLE消息（文本或二进制），返回目标设备数
+
+        消息只解析一次，不可变的命令对象由所有目标共享，同一时刻执行的设备一次批量投递到状态机。
+        targets 为设备ID序列、筛选函数 selector(device) -> bool 或 None（所有设备）；stagger 为相邻目标
+        的执行间隔 (秒) 或与目标一一对应的执行偏移，偏移大于0的设备在到期的 update_all 中执行。
+        未知或重复的设备ID连同其偏移一起跳过。录制为逐个设备的 BLE_WRITE 事件，重放结果相同。
+        """
+        if targets is None:
+            candidates = list(self.devices)
+        elif callable(targets):
+            candidates = [device_id for device_id, device in self.devices.items() if targets(device)]
+        else:
+            candidates = list(targets)
+
+        if isinstance(stagger, numbers.Real):
+            offsets = None
+        else:
+            offsets = list(stagger)
+            if len(offsets) != len(candidates):
+                raise ValueError(f"执行偏移个数 {len(offsets)} 与目标设备数 {len(candidates)} 不一致")
+
+        # 设备ID -> 偏移（保留首次出现）
+        targeted: Dict[int, float] = {}
+        for i, device_id in enumerate(candidates):
+            if device_id in self.devices and device_id not in targeted:
+                targeted[device_id] = offsets[i] if offsets is not None else len(targeted) * stagger
+
+        command = BLEMessageParser.parse_command(message)
+        if command.mode is None:
+            logger.warning(f"无效的广播消息: {message}")
+            return 0
+
+        # 同一偏移的设备合为一批
+        groups: Dict[float, List[int]] = {}
+        for device_id, offset in targeted.items():
+            groups.setdefault(max(float(offset), 0.0), []).append(device_id)
+        now = self.clock.now()
+        for offset, group in groups.items():
+            if offset == 0:
+                self._apply_broadcast(message, command, group)
+            else:
+                key = next(self._broadcast_seq)
+                self._broadcasts[key] = (message, command, group)
+                self.broadcast_scheduler.schedule(key, now + offset)
+        return len(targeted)
+
+    def _apply_broadcast(self, message: Union[str, bytes], command: BLECommand, device_ids: List[int]):
+        """对一批设备执行广播命令（错开执行前已移除的设备跳过）"""
+        # 按slot顺序录制与执行，重放时逐个处理的顺序与批量状态机的处理顺序一致
+        devices = sorted((self.devices[d] for d in device_ids if d in self.devices), key=lambda d: d.slot)
+        if not devices:
+            return
+        received_ns = time.perf_counter_ns()
+        data = message.encode('utf-8') if isinstance(message, str) else message
+        for device in devices:
+            self._record(SessionEvent.BLE_WRITE, device.device_id, (CHARACTERISTIC_MSG_UUID, data))
+            self._apply_command(device, command)
+
+        slots = np.array([device.slot for device in devices], dtype=np.intp)
+        self.fsm.post_mode(slots, command.mode, arm=True)
+        self.fsm.dispatch()
+        for device in devices:
+            self._record_system_latency(device, self.controllers[device.device_id], received_ns)
+        logger.info(f"广播消息 {message}: {len(devices)} 个设备")
+
+    # ===== 输入操作（GUI与脚本统一入口，录制时会被记录） =====
+
+    def update_distance(self, device_id: int, distance: int):
+        """设置TOF距离 (mm)"""
+        tof_controller = self.tof_controllers.get(device_id)
+        if tof_controller:
+            self._record(SessionEvent.DISTANCE, device_id, distance)
+            tof_controller.update_distance(distance)
+
+    def simulate_touch(self, device_id: int):
+        """模拟手部触碰"""
+        tof_controller = self.tof_controllers.get(device_id)
+        if tof_controller:
+            self._record(SessionEvent.TOUCH, device_id)
+            tof_controller.simulate_touch()
+
+    def trigger_device(self, device_id: int):
+        """点击设备: 灯亮时模拟TOF检测关灯（窗口倒计时中按点击时刻判定），灯灭时重新执行当前游戏模式（开灯）"""
+        device = self.devices.get(device_id)
+        if not device:
+            return
+        self._record(SessionEvent.TRIGGER, device_id)
+
+        controller = self.controllers[device_id]
+        if self.fleet.win_active[device.slot]:
+            self.tof_controllers[device_id].simulate_touch()
+            controller.window_detection(self.clock.now())
+        elif device.led_state.is_on:
+            self.tof_controllers[device_id].simulate_touch()
+            controller.turn_light_off()
+        else:
+            controller.handle_game_mode(device.config.game_mode, arm=True)
+
+    def apply_game_mode(self, device_id: int, mode: int, params: Optional[dict] = None):
+        """设置设备游戏模式及参数并执行"""
+        device = self.devices.get(device_id)
+        if not device:
+            return
+        params = params or {}
+        self._record(SessionEvent.APPLY_MODE, device_id, (mode, params))
+
+        device.config.game_mode = mode
+        self._apply_params(device, params)
+        self.controllers[device_id].handle_game_mode(mode, arm=True)
+
+    def apply_game_mode_batch(self, device_ids: Iterable[int], mode: int, params: Optional[dict] = None):
+        """批量设置游戏模式及参数并执行
+
+        模式计数与状态转换对整批设备一次完成，只有真正进入新状态的设备逐个执行进入动作。
+        录制为逐个设备的 APPLY_MODE 事件，重放结果相同。
+        """
+        params = params or {}
+        devices = [self.devices[d] for d in dict.fromkeys(device_ids) if d in self.devices]
+        if not devices:
+            return
+        for device in devices:
+            self._record(SessionEvent.APPLY_MODE, device.device_id, (mode, params))
+            self._apply_params(device, params)
+
+        slots = np.array([device.slot for device in devices], dtype=np.intp)
+        self.fleet.set_mode(slots, mode)
+        self.fsm.post_mode(slots, mode, arm=True)
+        self.fsm.dispatch()
+        logger.info(f"批量设置游戏模式 {mode}: {len(devices)} 个设备")
+
+    @staticmethod
+    def _apply_params(device: RizDevice, params: dict):
+        """应用游戏模式参数"""
+        if "window" in params:
+            total, good = params["window"]
+            validate_window(total, good)
+            device.config.window_total = total
+            device.config.window_good = good
+        if "process" in params:
+            device.config.process = params["process"]
+        if "double_index" in params:
+            device.config.double_mode_index = params["double_index"]
+        if "rgb" in params:
+            r, g, b = params["rgb"]
+            device.config.red_value = r
+            device.config.green_value = g
+            device.config.blue_value = b
+        if "blink_count" in params:
+            device.config.config_blink_count = params["blink_count"]
+        if "sensor_mode" in params:
+            device.config.sensor_mode = params["sensor_mode"]
+
+    def run_game_mode(self, device_id: int, mode: int):
+        """直接执行游戏模式（不修改设备配置）"""
+        controller = self.controllers.get(device_id)
+        if controller:
+            self._record(SessionEvent.GAME_MODE, device_id, mode)
+            controller.handle_game_mode(mode)
 
-        if "blink_count" in parsed:
-            device.config.config_blink_count = parsed["blink_count"]
+    def start_animation(self, device_id: int, animation_type: str):
+        """启动开机/连接动画"""
+        controller = self.controllers.get(device_id)
+        if not controller:
+            return
+        self._record(SessionEvent.ANIMATION, device_id, animation_type)
+        if animation_type == "init":
+            controller.start_init_animation()
+        elif animation_type == "connected":
+            controller.start_connected_animation()
 
-        # 执行游戏模式
-        controller.handle_game_mode(mode)
+    def reset_statistics(self):
+        """重置所有设备统计"""
+        self._record(SessionEvent.RESET_STATS)
+        for device in self.devices.values():
+            device.stats.reset()
+
+    # ===== 会话录制 =====
+
+    def start_recording(self, path: Union[str, Path]) -> SessionRecorder:
+        """开始录制输入事件（必须在创建设备之前开始，重放才能从相同初始状态出发）"""
+        if self.devices:
+            raise ValueError("会话录制必须在创建设备之前开始")
+        self.stop_recording()
+        self.recorder = SessionRecorder(path, self.seed)
+        if self.tof_stream is not None:
+            self._record(SessionEvent.SIGNAL_MODEL, 0, asdict(self.tof_stream.model))
+        if self.mmwave.model != TargetModel():
+            self._record(SessionEvent.TARGET_MODEL, 0, asdict(self.mmwave.model))
+        logger.info(f"开始录制会话: {path}")
+        return self.recorder
+
+    def stop_recording(self):
+        """停止录制"""
+        if self.recorder is not None:
+            self.recorder.close()
+            logger.info(f"停止录制会话: {self.recorder.path} ({self.recorder.event_count} 个事件)")
+            self.recorder = None
+
+    def _record(self, kind: SessionEvent, device_id: int = 0, value=None):
+        """录制中时追加一条输入事件"""
+        if self.recorder is not None:
+            self.recorder.record(kind, self.clock.now(), device_id, value)
+
+    # ===== 会话存储 =====
+
+    def start_persistence(self, store: SessionStore, athlete: Optional[str] = None) -> str:
+        """开始把设备、触发记录与模式切换写入会话存储，返回会话ID（此前的触发记录不写入）"""
+        self.stop_persistence()
+        self.store = store
+        self.session_id = store.begin_session(self.seed, athlete)
+        store.add_devices(self.session_id, [(device.device_id, device.name, device.mac_address)
+                                            for device in self.devices.values()])
+        self._stored_triggers = len(self.trigger_log)
+        self.fsm.on_enter = self._store_mode_changes
+        logger.info(f"开始持久化会话: {self.session_id} ({store.path})")
+        return self.session_id
+
+    def stop_persistence(self):
+        """写入剩余的触发记录并结束会话（不关闭存储）"""
+        if self.store is None:
+            return
+        self._persist_triggers()
+        self.store.end_session(self.session_id)
+        self.fsm.on_enter = None
+        logger.info(f"结束持久化会话: {self.session_id}")
+        self.store = None
+        self.session_id = None
+
+    def _persist_triggers(self):
+        """把上次以来新增的触发记录交给写线程（复制，日志扩容或清空不影响已入队的数据）"""
+        count = len(self.trigger_log)
+        if count < self._stored_triggers:  # 日志被清空
+            self._stored_triggers = 0
+        if count > self._stored_triggers:
+            rows = slice(self._stored_triggers, count)
+            self.store.add_triggers(self.session_id, {name: column[rows].copy()
+                                                      for name, column in self.trigger_log.columns().items()})
+            self._stored_triggers = count
+
+    def _store_mode_changes(self, slots: np.ndarray, modes: np.ndarray):
+        self.store.add_mode_changes(self.session_id, self.fleet.device_id[slots], self.clock.now(), modes)
 
     # ===== BLE操作方法 =====
 
@@ -272,16 +759,19 @@ class DeviceManager:
         """连接设备"""
         ble_server = self.ble_servers.get(device_id)
         if ble_server:
+            self._record(SessionEvent.CONNECT, device_id)
             ble_server.simulate_connect(client_address)
 
     def disconnect_device(self, device_id: int):
         """断开设备"""
         ble_server = self.ble_servers.get(device_id)
         if ble_server:
+            self._record(SessionEvent.DISCONNECT, device_id)
             ble_server.simulate_disconnect()
 
-    def send_message_to_device(self, device_id: int, message: str):
-        """向设备发送消息"""
+    def send_message_to_device(self, device_id: int, message: Union[str, bytes]):
+        """向设备发送消息（文本或 create_message(binary=True) 生成的二进制消息）"""
         ble_server = self.ble_servers.get(device_id)
         if ble_server:
-            ble_server.handle_write(CHARACTERISTIC_MSG_UUID, message.encode('utf-8'))
+            data = message.encode('utf-8') if isinstance(message, str) else message
+            ble_server.handle_write(CHARACTERISTIC_MSG_UUID, data)
@@ -0,0 +1,312 @@
+"""
+RizSimulator Fleet State
+设备群状态存储 - 所有设备的状态按列保存在连续的NumPy数组中 (struct-of-arrays)
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from constants import (
+    LED_COUNT, INNER_RING_COUNT, TERMINATE_MODE, FLEET_INITIAL_CAPACITY,
+    AMPLITUDE_THRESHOLD, AMPLITUDE_THRESHOLD_FACTOR, STATE_DISCONNECTED,
+    BASELINE_HISTORY_SIZE, MOVING_AVG_SIZE, MMWAVE_SIGNAL_THRESHOLD, RGB_INTENSITY,
+    CMD_QUEUE_LENGTH
+)
+from latency import LatencySketch, bucket_index
+
+# 字段定义: (名称, 每行形状, dtype, 默认值)
+_FIELDS = (
+    ('leds', (LED_COUNT, 3), np.uint8, 0),       # 内圈 [0, 24) + 外圈 [24, 48)
+    ('brightness', (), np.float32, 1.0),
+    ('led_on', (), np.bool_, False),
+    ('led_intensity', (), np.uint8, RGB_INTENSITY),  # 灯带全局亮度 (固件 setBrightness)
+    ('buzzer_active', (), np.bool_, False),
+    ('distance', (), np.int32, 1000),            # mm
+    ('amplitude', (), np.int32, 100),
+    ('baseline', (), np.int32, 0),
+    ('threshold', (), np.int32, AMPLITUDE_THRESHOLD),  # 振幅阈值，随基线更新
+    ('consecutive', (), np.int32, 0),            # 连续检测计数
+    ('is_cooldown', (), np.bool_, False),
+    ('cooldown_until', (), np.float64, 0.0),     # 冷却截止时间 (秒, 设备时钟)
+    ('last_detection_time', (), np.float64, 0.0),  # 最近一次触发的传感器帧时间 (秒, 设备时钟)
+    ('detection_active', (), np.bool_, False),
+    ('light_on_ns', (), np.int64, -1),           # 最近一次点亮的时间 (纳秒, 设备时钟)，熄灭后为 -1
+    ('mode', (), np.int32, TERMINATE_MODE),
+    ('conn_state', (), np.int8, STATE_DISCONNECTED),
+    ('anim_id', (), np.int32, -1),               # 播放中的帧表编号 (-1 表示无)
+    ('anim_start', (), np.float64, 0.0),         # 动画开始时间 (秒, 设备时钟)
+    ('anim_frame', (), np.int32, -1),            # 当前显示的帧序号
+    # TF-Luna 信号流与固件动态基线检测器 (见 tof_stream.py)
+    ('tof_ambient', (), np.float32, 0.0),        # 环境振幅 (0 表示尚未初始化)
+    ('tof_level', (), np.float32, 0.0),          # 无噪声振幅，随手部距离一阶跟随
+    ('tof_armed', (), np.bool_, False),          # 检测周期进行中 (固件 updateLidarData 循环)
+    ('tof_next_frame', (), np.float64, 0.0),     # 下一帧时间 (秒, 设备时钟)
+    ('tof_pending', (), np.bool_, False),        # 已越过阈值，等待下一帧确认
+    ('tof_was_cooldown', (), np.bool_, False),
+    ('tof_frames', (), np.int32, 0),             # framesProcessed
+    ('tof_fresh', (), np.int32, 0),              # 冷却结束后的新帧数 framesAfterCooldown
+    ('amp_history', (BASELINE_HISTORY_SIZE,), np.uint16, 0),  # 动态基线环形缓冲
+    ('history_index', (), np.int32, 0),
+    ('history_filled', (), np.bool_, False),
+    ('history_sum', (), np.int64, 0),
+    ('amp_window', (MOVING_AVG_SIZE,), np.uint16, 0),  # 滑动平均环形缓冲
+    ('dist_window', (MOVING_AVG_SIZE,), np.int32, 0),
+    ('window_index', (), np.int32, 0),
+    # 毫米波雷达 (见 mmwave.py)
+    ('mmw_active', (), np.bool_, False),         # 请求检测 (固件 hasMMWaveDetectionTask)
+    ('mmw_running', (), np.bool_, False),        # 检测进行中
+    ('mmw_external', (), np.bool_, False),       # 由串口数据驱动，不生成合成目标
+    ('mmw_next_frame', (), np.float64, 0.0),     # 下一帧时间 (秒, 设备时钟)
+    ('mmw_target_start', (), np.float64, 0.0),   # 合成目标开始走近的时间
+    ('mmw_motion_frames', (), np.int32, 0),      # consecutiveMotionFrames
+    ('mmw_presence', (), np.uint8, 0),           # 最近一帧的目标状态
+    ('mmw_distance', (), np.int32, 0),           # 最近一帧的目标距离 (cm)
+    ('mmw_signal', (), np.int32, 0),             # 最近一帧的信号强度
+    ('mmw_expected_signal', (), np.int32, MMWAVE_SIGNAL_THRESHOLD),  # _expectedSignalStrength
+    # 游戏模式状态机 (见 game_fsm.py)
+    ('fsm_state', (), np.int8, 1),               # STATE_READY: 新设备可以直接点亮
+    ('fsm_game', (), np.int32, -1),              # 最近进入的游戏模式 (固件 prevGameMode)
+    ('fsm_queue', (CMD_QUEUE_LENGTH, 2), np.int32, 0),  # 事件队列: (事件, 模式)
+    ('fsm_head', (), np.int32, 0),
+    ('fsm_pending', (), np.int32, 0),
+    # 窗口模式 (见 window_mode.py)
+    ('win_active', (), np.bool_, False),         # 倒计时进行中
+    ('win_good', (), np.float64, 0.0),           # 最佳窗口开始时间 (秒, 设备时钟)
+    ('win_end', (), np.float64, 0.0),            # 倒计时结束时间
+    # 功耗 (见 power.py)
+    ('charge_used', (), np.float64, 0.0),        # 已消耗电量 (mAh)
+    ('energy_used', (), np.float64, 0.0),        # 已消耗能量 (mWh)
+    ('current_avg', (), np.float32, 0.0),        # 平均电流 (mA)
+    ('device_id', (), np.int32, -1),
+    ('in_use', (), np.bool_, False),
+)
+
+
+# 共享内存中各列的起始偏移按此对齐
+_COLUMN_ALIGN = 64
+
+
+def column_layout(capacity: int) -> Tuple[List[Tuple[str, tuple, np.dtype, int]], int]:
+    """各列在同一块连续内存中的布局: ([(名称, 形状, dtype, 偏移)], 总字节数)"""
+    layout = []
+    offset = 0
+    for name, shape, dtype, _ in _FIELDS:
+        dtype = np.dtype(dtype)
+        full_shape = (capacity,) + shape
+        layout.append((name, full_shape, dtype, offset))
+        nbytes = int(np.prod(full_shape)) * dtype.itemsize
+        offset += -(-nbytes // _COLUMN_ALIGN) * _COLUMN_ALIGN
+    return layout, offset
+
+
+def columns_from_buffer(buffer, capacity: int) -> Dict[str, np.ndarray]:
+    """在外部缓冲区（如 SharedMemory.buf）上构造各列的数组视图，不拷贝数据"""
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        for name, shape, dtype, offset in column_layout(capacity)[0]
+    }
+
+
+def compute_threshold(baseline: int) -> int:
+    """由基线计算振幅阈值（基线为0时使用默认阈值）"""
+    threshold = int(baseline * AMPLITUDE_THRESHOLD_FACTOR)
+    return threshold if threshold != 0 else AMPLITUDE_THRESHOLD
+
+
+class FleetCounters:
+    """设备群聚合计数器 - 在每次状态转换时增量更新，查询为O(1)"""
+
+    def __init__(self):
+        self.by_state: Counter = Counter()  # 连接状态 -> 设备数
+        self.by_mode: Counter = Counter()   # 游戏模式 -> 设备数
+        self.led_on = 0                     # LED点亮的设备数
+        self.trigger_count = 0              # 总触发次数
+        self.reaction_count = 0             # 有反应时间的触发次数（点亮后检测到）
+        self.total_reaction_time = 0.0      # 总反应时间 (ms)
+        self.reactions = LatencySketch()    # 反应时间分布（各设备直方图之和）
+        self.reactions_by_mode: Dict[int, LatencySketch] = {}  # 游戏模式 -> 反应时间分布
+
+    def record_trigger(self, reaction_time: Optional[float] = None, mode: int = -1, bucket: int = -1):
+        """记录一次触发（reaction_time 为None表示触发时灯未点亮，无有效反应时间；
+        mode 为点亮时的游戏模式，bucket 为已计算好的直方图桶）"""
+        self.trigger_count += 1
+        if reaction_time is not None:
+            if bucket < 0:
+                bucket = bucket_index(reaction_time)
+            self.reaction_count += 1
+            self.total_reaction_time += reaction_time
+            self.reactions.add(bucket)
+            if mode >= 0:
+                self.reactions_by_mode.setdefault(mode, LatencySketch()).add(bucket)
+
+    def remove_triggers(self, trigger_count: int, total_reaction_time: float, reaction_count: int = 0,
+                        reactions: Optional[LatencySketch] = None,
+                        reactions_by_mode: Optional[Dict[int, LatencySketch]] = None):
+        """扣除某设备的触发统计（设备重置统计或被移除时），直方图逐桶相减"""
+        self.trigger_count -= trigger_count
+        self.reaction_count -= reaction_count
+        self.total_reaction_time -= total_reaction_time
+        if reactions is not None:
+            self.reactions.subtract(reactions)
+        for mode, sketch in (reactions_by_mode or {}).items():
+            self.reactions_by_mode[mode].subtract(sketch)
+
+
+class FleetState:
+    """设备群状态存储
+
+    每个设备占用一行 (slot)。RizDevice 及其 LEDState / TOFSensorState / DeviceConfig
+    只是某一行的视图，批量操作可直接对整列做向量化运算。
+    容量不足时按倍数扩容，因此视图不能缓存数组引用，每次访问都应通过 FleetState 取列。
+    mode / conn_state / led_on 三列必须通过 set_* 方法修改，以保持 counters 同步。
+    传入 columns（如共享内存上的视图，见 columns_from_buffer）时容量固定，不能扩容。
+    """
+
+    def __init__(self, capacity: int = FLEET_INITIAL_CAPACITY,
+                 columns: Optional[Dict[str, np.ndarray]] = None):
+        self.capacity = 0
+        self.count = 0
+        self._next_slot = 0
+        self._free_slots: List[int] = []
+        self.counters = FleetCounters()
+        self._fixed = columns is not None
+
+        if columns is None:
+            for name, shape, dtype, _ in _FIELDS:
+                setattr(self, name, np.zeros((0,) + shape, dtype=dtype))
+            self._resize(max(1, capacity))
+        else:
+            for name, _, _, default in _FIELDS:
+                column = columns[name]
+                column[...] = default
+                setattr(self, name, column)
+            self.capacity = capacity
+
+    def _resize(self, capacity: int):
+        """扩容到指定容量"""
+        if self._fixed:
+            raise ValueError(f"FleetState容量固定为 {self.capacity}，无法扩容")
+        for name, shape, dtype, default in _FIELDS:
+            old = getattr(self, name)
+            new = np.full((capacity,) + shape, default, dtype=dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def _reset_row(self, slot: int):
+        """恢复某行为默认值"""
+        for name, _, _, default in _FIELDS:
+            getattr(self, name)[slot] = default
+
+    def allocate(self, device_id: int) -> int:
+        """为设备分配一行，返回slot"""
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            if self._next_slot >= self.capacity:
+                self._resize(self.capacity * 2)
+            slot = self._next_slot
+            self._next_slot += 1
+
+        self._reset_row(slot)
+        self.device_id[slot] = device_id
+        self.in_use[slot] = True
+        self.count += 1
+
+        self.counters.by_state[STATE_DISCONNECTED] += 1
+        self.counters.by_mode[TERMINATE_MODE] += 1
+        return slot
+
+    def release(self, slot: int):
+        """释放某行"""
+        if not self.in_use[slot]:
+            return
+
+        counters = self.counters
+        counters.by_state[int(self.conn_state[slot])] -= 1
+        counters.by_mode[int(self.mode[slot])] -= 1
+        if self.led_on[slot]:
+            counters.led_on -= 1
+
+        self._reset_row(slot)
+        self._free_slots.append(slot)
+        self.count -= 1
+
+    @property
+    def size(self) -> int:
+        """已使用过的最大slot数（数组有效区间为 [0, size)）"""
+        return self._next_slot
+
+    def active_slots(self) -> np.ndarray:
+        """所有在用的slot"""
+        return np.flatnonzero(self.in_use[:self._next_slot])
+
+    # ===== 批量操作 =====
+
+    def set_led_on(self, slot: int, on: bool):
+        """设置单个设备LED点亮状态"""
+        if bool(self.led_on[slot]) != on:
+            self.led_on[slot] = on
+            self.counters.led_on += 1 if on else -1
+
+    def set_connection_state(self, slot: int, state: int):
+        """设置单个设备连接状态"""
+        old = int(self.conn_state[slot])
+        if old != state:
+            self.conn_state[slot] = state
+            self.counters.by_state[old] -= 1
+            self.counters.by_state[state] += 1
+
+    def set_device_mode(self, slot: int, mode: int):
+        """设置单个设备游戏模式"""
+        old = int(self.mode[slot])
+        if old != mode:
+            self.mode[slot] = mode
+            self.counters.by_mode[old] -= 1
+            self.counters.by_mode[mode] += 1
+
+    def fill_leds(self, slots: Iterable[int], color: Tuple[int, int, int]):
+        """批量设置LED为同一颜色并点亮"""
+        slots = np.asarray(slots, dtype=np.intp)
+        self.leds[slots] = color
+        self.counters.led_on += int(np.count_nonzero(~self.led_on[slots]))
+        self.led_on[slots] = True
+
+    def clear_leds(self, slots: Iterable[int]):
+        """批量熄灭LED"""
+        slots = np.asarray(slots, dtype=np.intp)
+        self.leds[slots] = 0
+        self.counters.led_on -= int(np.count_nonzero(self.led_on[slots]))
+        self.led_on[slots] = False
+
+    def load_frames(self, slots: np.ndarray, frames: np.ndarray,
+                    brightness: np.ndarray, led_on: np.ndarray):
+        """批量整帧拷贝（slots 不可重复）"""
+        self.leds[slots] = frames
+        self.brightness[slots] = brightness
+        self.counters.led_on += int(np.count_nonzero(led_on)) - int(np.count_nonzero(self.led_on[slots]))
+        self.led_on[slots] = led_on
+
+    def set_mode(self, slots: Iterable[int], mode: int):
+        """批量设置游戏模式"""
+        slots = np.asarray(slots, dtype=np.intp)
+        old_modes, counts = np.unique(self.mode[slots], return_counts=True)
+        for old, count in zip(old_modes.tolist(), counts.tolist()):
+            self.counters.by_mode[old] -= count
+        self.counters.by_mode[mode] += len(slots)
+        self.mode[slots] = mode
+
+    def set_baseline(self, slot: int, baseline: int):
+        """设置基线并同步更新检测阈值"""
+        self.baseline[slot] = baseline
+        self.threshold[slot] = compute_threshold(baseline)
+
+    def inner_ring(self, slot: int) -> np.ndarray:
+        """某设备内圈LED (24x3视图)"""
+        return self.leds[slot, :INNER_RING_COUNT]
+
+    def outer_ring(self, slot: int) -> np.ndarray:
+        """某设备外圈LED (24x3视图)"""
+        return self.leds[slot, INNER_RING_COUNT:]
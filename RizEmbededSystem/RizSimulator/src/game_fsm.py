@@ -0,0 +1,169 @@
+"""
+RizSimulator Game FSM
+游戏模式状态机 - 对应 v0.1.0 升级计划中 ProcessingTask 的 FSM: 命令进入每个设备的定长
+事件队列（固件 cmdQueue），由转换表 TRANSITIONS[状态, 事件] 决定下一状态，再按模式执行
+进入动作。状态、队列都是 FleetState 中的列，同一轮中所有设备的查表合并为一次向量化运算。
+
+状态:
+    IDLE     熄灭，等待命令
+    READY    已收到命令，可以点亮（固件 ableToTurnOn）
+    RUNNING  游戏灯亮，等待检测或倒计时结束（固件点亮后把模式改为 PROCESSED_MODE）
+    EFFECT   开启/关闭/配置/休息等效果，不响应游戏模式
+"""
+
+from typing import Callable, Dict, Iterable, Optional, Union
+
+import numpy as np
+
+from fleet_state import FleetState
+from constants import (
+    MANUAL_MODE, RANDOM_MODE, TIMED_MODE, DOUBLE_MODE, RHYTHM_MODE, MOVEMENT_MODE, WINDOW_MODE,
+    OPENING_MODE, CLOSING_MODE, TERMINATE_MODE, RESTTIMESUP_MODE, PROCESSED_MODE, CONFIG_MODE,
+    CMD_QUEUE_LENGTH
+)
+from logger import get_logger
+
+logger = get_logger("GameFSM")
+
+STATE_IDLE = 0
+STATE_READY = 1
+STATE_RUNNING = 2
+STATE_EFFECT = 3
+
+EVENT_ARM = 0       # BLE命令/设置模式/点击设备
+EVENT_GAME = 1      # 游戏模式: 灯灭且已就绪时点亮
+EVENT_EFFECT = 2    # 效果模式: 总是执行
+EVENT_OFF = 3       # 熄灭: 检测触发、倒计时结束或终止
+
+_ = -1  # 忽略该事件，不执行进入动作
+
+TRANSITIONS = np.array([
+    # ARM          GAME           EFFECT        OFF
+    [STATE_READY, _,             STATE_EFFECT, STATE_IDLE],  # IDLE
+    [STATE_READY, STATE_RUNNING, STATE_EFFECT, STATE_IDLE],  # READY
+    [_,           _,             STATE_EFFECT, STATE_IDLE],  # RUNNING
+    [_,           _,             STATE_EFFECT, STATE_IDLE],  # EFFECT
+], dtype=np.int8)
+
+# 游戏模式 -> 事件
+MODE_EVENTS = {
+    MANUAL_MODE: EVENT_GAME,
+    RANDOM_MODE: EVENT_GAME,
+    TIMED_MODE: EVENT_GAME,
+    DOUBLE_MODE: EVENT_GAME,
+    RHYTHM_MODE: EVENT_GAME,
+    MOVEMENT_MODE: EVENT_GAME,
+    WINDOW_MODE: EVENT_GAME,
+    OPENING_MODE: EVENT_EFFECT,
+    CLOSING_MODE: EVENT_EFFECT,
+    CONFIG_MODE: EVENT_EFFECT,
+    RESTTIMESUP_MODE: EVENT_EFFECT,
+    TERMINATE_MODE: EVENT_OFF,
+}
+
+SlotsLike = Union[int, Iterable[int], np.ndarray]
+
+
+class GameFSM:
+    """设备群游戏模式状态机
+
+    post 把 (事件, 模式) 写入设备的事件队列，dispatch 按轮处理: 每轮取出所有有事件的设备
+    的队首事件，一次查表得到下一状态，再对状态转换成功且带模式的设备调用进入动作。
+    进入动作中投递的事件（如终止时关灯）留在队列中由同一次 dispatch 的后续轮次处理，
+    不会递归进入状态机。队列写满时丢弃新事件（固件 xQueueSend 返回 errQUEUE_FULL）。
+    """
+
+    def __init__(self, fleet: FleetState):
+        self.fleet = fleet
+        self._actions: Dict[int, Callable[[int], None]] = {}  # slot -> 进入动作
+        self._pending = set()  # 队列非空的slot
+        self._dispatching = False
+        # 每轮进入游戏模式的设备 on_enter(slots, modes)，在进入动作之前调用（持久化等观察者）
+        self.on_enter: Optional[Callable[[np.ndarray, np.ndarray], None]] = None
+
+    def attach(self, slot: int, action: Callable[[int], None]):
+        """登记设备的进入动作 action(mode)"""
+        self._actions[slot] = action
+
+    def detach(self, slot: int):
+        """设备移除时注销进入动作并丢弃未处理的事件"""
+        self._actions.pop(slot, None)
+        self._pending.discard(slot)
+        self.fleet.fsm_pending[slot] = 0
+
+    def post(self, slots: SlotsLike, event: int, mode: int = -1) -> int:
+        """向设备队列追加事件（slots 不可重复），返回因队列已满而丢弃的个数"""
+        fleet = self.fleet
+        slots = np.atleast_1d(np.asarray(slots, dtype=np.intp))
+        pending = fleet.fsm_pending[slots]
+        full = pending >= CMD_QUEUE_LENGTH
+        dropped = int(np.count_nonzero(full))
+        if dropped:
+            logger.warning(f"{dropped} 个设备事件队列已满，丢弃事件 {event} (模式 {mode})")
+            slots, pending = slots[~full], pending[~full]
+
+        tail = (fleet.fsm_head[slots] + pending) % CMD_QUEUE_LENGTH
+        fleet.fsm_queue[slots, tail] = (event, mode)
+        fleet.fsm_pending[slots] = pending + 1
+        self._pending.update(slots.tolist())
+        return dropped
+
+    def post_mode(self, slots: SlotsLike, mode: int, arm: bool = False) -> bool:
+        """投递执行游戏模式的事件（arm 为True时先投递就绪事件），模式无需处理时返回False"""
+        if arm:
+            self.post(slots, EVENT_ARM)
+        event = MODE_EVENTS.get(mode)
+        if event is None:
+            if mode != PROCESSED_MODE:  # 已处理的模式不再执行
+                logger.warning(f"未知游戏模式: {mode}")
+            return False
+        self.post(slots, event, mode)
+        return True
+
+    def dispatch(self):
+        """处理所有队列中的事件直到队列为空（在进入动作中调用时直接返回）"""
+        if self._dispatching:
+            return
+        self._dispatching = True
+        fleet = self.fleet
+        try:
+            while self._pending:
+                slots = np.fromiter(sorted(self._pending), dtype=np.intp, count=len(self._pending))
+                head = fleet.fsm_head[slots]
+                events = fleet.fsm_queue[slots, head, 0]
+                modes = fleet.fsm_queue[slots, head, 1]
+                fleet.fsm_head[slots] = (head + 1) % CMD_QUEUE_LENGTH
+                fleet.fsm_pending[slots] -= 1
+                self._pending.difference_update(slots[fleet.fsm_pending[slots] == 0].tolist())
+                self._apply(slots, events, modes)
+        finally:
+            self._dispatching = False
+
+    def _apply(self, slots: np.ndarray, events: np.ndarray, modes: np.ndarray):
+        """一轮事件: 查表转换状态，记录进入的游戏模式，执行进入动作"""
+        fleet = self.fleet
+        next_states = TRANSITIONS[fleet.fsm_state[slots], events]
+        # 灯亮着时不执行游戏模式（固件 !isLightTurnedOn，开机/连接动画期间也是如此）
+        next_states[(events == EVENT_GAME) & fleet.led_on[slots]] = _
+        moved = next_states != _
+        fleet.fsm_state[slots[moved]] = next_states[moved]
+
+        game = moved & (events == EVENT_GAME)
+        fleet.fsm_game[slots[game]] = modes[game]
+
+        entered = moved & (modes >= 0)
+        if self.on_enter is not None and entered.any():
+            self.on_enter(slots[entered], modes[entered])
+        for slot, mode in zip(slots[entered].tolist(), modes[entered].tolist()):
+            action = self._actions.get(slot)
+            if action is not None:
+                action(mode)
+
+    def state(self, slot: int) -> int:
+        return int(self.fleet.fsm_state[slot])
+
+    def count(self, state: int, slots: Optional[np.ndarray] = None) -> int:
+        """处于某状态的设备数"""
+        if slots is None:
+            slots = self.fleet.active_slots()
+        return int(np.count_nonzero(self.fleet.fsm_state[slots] == state))
@@ -71,6 +71,7 @@ class ControlPanelWidget(QWidget):
             ("Random", RANDOM_MODE, "随机模式 - 绿/黄/红"),
             ("Rhythm", RHYTHM_MODE, "节奏模式 - 自定义RGB"),
             ("Double", DOUBLE_MODE, "双击模式 - 橙/蓝"),
+            ("Window", WINDOW_MODE, "窗口模式 - 橙/绿时间窗口"),
         ]
 
         for i, (name, mode, desc) in enumerate(basic_modes):
@@ -3,14 +3,19 @@ Main Window
 RizSimulator主窗口
 """
 
+from pathlib import Path
+from typing import Optional, Union
+
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QSplitter, QMenuBar, QMenu, QStatusBar, QMessageBox
+    QSplitter, QMenuBar, QMenu, QStatusBar, QMessageBox, QFileDialog
 )
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QAction
 
 from device_manager import DeviceManager
+from simulation_engine import SimulationEngine, SimulationMode
+from session_store import SessionStore
 from gui.device_grid import DeviceGridWidget
 from gui.control_panel import ControlPanelWidget
 from gui.statistics_panel import StatisticsPanelWidget
@@ -23,16 +28,27 @@ logger = get_logger("MainWindow")
 class MainWindow(QMainWindow):
     """RizSimulator主窗口"""
 
-    def __init__(self):
+    def __init__(self, session_db: Optional[Union[str, Path]] = None):
+        """session_db 为会话存储路径，None 时不记录会话"""
         super().__init__()
         self.setWindowTitle("RizSimulator - Riz ESP32 Device Simulator")
         self.setGeometry(100, 50, WINDOW_WIDTH, WINDOW_HEIGHT)
         self.setMinimumSize(MIN_WIDTH, MIN_HEIGHT)
 
         # 设备管理器
-        self.device_manager = DeviceManager()
+        self.device_manager = DeviceManager(max_devices=MAX_DEVICES)
         self.selected_devices = []  # 当前选中的设备
 
+        # 会话存储（可选，后台线程写入，关闭窗口时提交剩余数据）
+        self.session_store: Optional[SessionStore] = None
+        if session_db is not None:
+            self.session_store = SessionStore(session_db)
+            self.device_manager.start_persistence(self.session_store)
+
+        # 仿真引擎（GUI仅作为引擎的一个使用者，按实际帧间隔推进）
+        self.engine = SimulationEngine(self.device_manager, mode=SimulationMode.REAL_TIME)
+        self.engine.add_tick_listener(self._on_engine_tick)
+
         self._init_ui()
         self._init_menu()
         self._init_status_bar()
@@ -128,6 +144,10 @@ class MainWindow(QMainWindow):
         reset_stats_action.triggered.connect(self._reset_statistics)
         control_menu.addAction(reset_stats_action)
 
+        export_triggers_action = QAction("导出触发记录...", self)
+        export_triggers_action.triggered.connect(self._export_triggers)
+        control_menu.addAction(export_triggers_action)
+
         # 帮助菜单
         help_menu = menubar.addMenu("帮助(&H)")
 
@@ -143,9 +163,11 @@ class MainWindow(QMainWindow):
 
     def _update(self):
         """主更新循环"""
-        # 更新设备管理器
-        self.device_manager.update_all(0.016)
+        # 推进仿真引擎（显示刷新在tick回调中完成）
+        self.engine.step()
 
+    def _on_engine_tick(self, delta_time: float):
+        """仿真引擎每帧回调"""
         # 更新设备网格显示
         self.device_grid.update_display()
 
@@ -169,17 +191,8 @@ class MainWindow(QMainWindow):
     def _on_device_triggered(self, device):
         """设备触发事件（模拟TOF检测到物体）"""
         logger.info(f"设备触发: {device.name}")
-        controller = self.device_manager.get_controller(device.device_id)
-
-        # 如果灯是亮的，模拟TOF检测关灯
-        if device.led_state.is_on:
-            tof_controller = self.device_manager.get_tof_controller(device.device_id)
-            tof_controller.simulate_touch()
-            controller.turn_light_off()
-        else:
-            # 如果灯是关的，重新触发游戏模式（开灯）
-            device.able_to_turn_on = True
-            controller.handle_game_mode(device.config.game_mode)
+        # 灯亮时模拟TOF检测关灯，灯灭时重新触发游戏模式（开灯）
+        self.device_manager.trigger_device(device.device_id)
 
     def _on_mode_changed(self, mode: int, params: dict):
         """模式变化事件"""
@@ -189,25 +202,7 @@ class MainWindow(QMainWindow):
 
         # 应用到所有选中设备
         for device in self.selected_devices:
-            device.able_to_turn_on = True
-            device.config.game_mode = mode
-
-            # 应用参数
-            if "process" in params:
-                device.config.process = params["process"]
-            if "double_index" in params:
-                device.config.double_mode_index = params["double_index"]
-            if "rgb" in params:
-                r, g, b = params["rgb"]
-                device.config.red_value = r
-                device.config.green_value = g
-                device.config.blue_value = b
-            if "blink_count" in params:
-                device.config.config_blink_count = params["blink_count"]
-
-            # 执行模式
-            controller = self.device_manager.get_controller(device.device_id)
-            controller.handle_game_mode(mode)
+            self.device_manager.apply_game_mode(device.device_id, mode, params)
 
         logger.info(f"应用模式 {mode} 到 {len(self.selected_devices)} 个设备")
 
@@ -218,11 +213,7 @@ class MainWindow(QMainWindow):
             return
 
         for device in self.selected_devices:
-            controller = self.device_manager.get_controller(device.device_id)
-            if animation_type == "init":
-                controller.start_init_animation()
-            elif animation_type == "connected":
-                controller.start_connected_animation()
+            self.device_manager.start_animation(device.device_id, animation_type)
 
         logger.info(f"启动 {animation_type} 动画，{len(self.selected_devices)} 个设备")
 
@@ -278,27 +269,36 @@ class MainWindow(QMainWindow):
     def _start_all_devices(self):
         """启动所有设备"""
         for device in self.device_manager.devices.values():
-            device.able_to_turn_on = True
-            controller = self.device_manager.get_controller(device.device_id)
-            controller.handle_game_mode(device.config.game_mode)
+            self.device_manager.apply_game_mode(device.device_id, device.config.game_mode)
 
         logger.info("启动所有设备")
 
     def _stop_all_devices(self):
         """停止所有设备"""
-        for device in self.device_manager.devices.values():
-            controller = self.device_manager.get_controller(device.device_id)
-            controller.handle_game_mode(TERMINATE_MODE)
+        for device_id in list(self.device_manager.devices):
+            self.device_manager.run_game_mode(device_id, TERMINATE_MODE)
 
         logger.info("停止所有设备")
 
     def _reset_statistics(self):
         """重置统计"""
-        for device in self.device_manager.devices.values():
-            device.stats.reset()
+        self.device_manager.reset_statistics()
 
         logger.info("重置统计")
 
+    def _export_triggers(self):
+        """导出触发记录"""
+        path, _ = QFileDialog.getSaveFileName(
+            self, "导出触发记录", "triggers.csv",
+            "CSV (*.csv);;NumPy (*.npz);;Parquet (*.parquet)"
+        )
+        if not path:
+            return
+        try:
+            self.device_manager.trigger_log.export(path)
+        except (ValueError, RuntimeError, OSError) as e:
+            QMessageBox.warning(self, "导出失败", str(e))
+
     def _show_about(self):
         """显示关于对话框"""
         QMessageBox.about(
@@ -323,4 +323,7 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """关闭事件"""
         logger.info("RizSimulator关闭")
+        if self.session_store is not None:
+            self.device_manager.stop_persistence()
+            self.session_store.close()
         event.accept()
@@ -72,6 +72,21 @@ class StatisticsPanelWidget(QWidget):
         self.avg_response_label.setStyleSheet("font-weight: bold;")
         layout.addWidget(self.avg_response_label, 3, 1)
 
+        # 反应时间分位数
+        self.percentile_labels = {}
+        for row, q in enumerate((50, 95, 99), start=4):
+            layout.addWidget(QLabel(f"反应时间 P{q}:"), row, 0)
+            label = QLabel("0 ms")
+            label.setStyleSheet("font-weight: bold;")
+            self.percentile_labels[q] = label
+            layout.addWidget(label, row, 1)
+
+        # 平均系统延迟 (BLE写入 -> LED变化)
+        layout.addWidget(QLabel("平均系统延迟:"), 7, 0)
+        self.avg_system_latency_label = QLabel("0 ms")
+        self.avg_system_latency_label.setStyleSheet("font-weight: bold;")
+        layout.addWidget(self.avg_system_latency_label, 7, 1)
+
         return group
 
     def _create_device_stats(self) -> QGroupBox:
@@ -138,6 +153,9 @@ class StatisticsPanelWidget(QWidget):
 
         avg_response = summary["average_response_time"]
         self.avg_response_label.setText(f"{avg_response:.1f} ms")
+        for q, label in self.percentile_labels.items():
+            label.setText(f"{summary[f'response_time_p{q}']:.1f} ms")
+        self.avg_system_latency_label.setText(f"{summary['average_system_latency']:.3f} ms")
 
         # 连接状态统计
         state_counts = summary["by_state"]
@@ -0,0 +1,174 @@
+"""
+RizSimulator Latency
+延迟统计 - 记录每次触发的反应时间（点亮 -> 检测，设备时钟）与仿真器自身的处理延迟
+（BLE写入 -> LED变化，真实 perf_counter_ns），两者分开统计。
+
+分布用可合并的对数-线性直方图 (HDR Histogram 布局) 表示: 以微秒为单位，小于 2^SUB_BUCKET_BITS
+的值每微秒一个桶，此后每个2的幂区间分为 2^(SUB_BUCKET_BITS-1) 个等宽桶，相对误差不超过
+1/2^SUB_BUCKET_BITS。写入为O(1)，设备群分布由各设备直方图逐桶相加得到，不保留样本。
+"""
+
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from constants import LATENCY_SUB_BUCKET_BITS
+
+_SUB_BUCKETS = 1 << LATENCY_SUB_BUCKET_BITS
+_HALF_BUCKETS = _SUB_BUCKETS >> 1
+
+PERCENTILES = (50, 95, 99)
+
+
+def bucket_index(value: float) -> int:
+    """延迟 (ms) 所在的桶"""
+    micros = int(value * 1000) if value > 0 else 0
+    if micros < _SUB_BUCKETS:
+        return micros
+    shift = micros.bit_length() - LATENCY_SUB_BUCKET_BITS
+    return shift * _HALF_BUCKETS + (micros >> shift)
+
+
+def bucket_values(indices: np.ndarray) -> np.ndarray:
+    """各桶的代表值 (ms，桶区间的中点)"""
+    indices = np.asarray(indices, dtype=np.int64)
+    shift = np.maximum(indices // _HALF_BUCKETS - 1, 0)
+    low = (indices - shift * _HALF_BUCKETS) << shift
+    return (low + ((1 << shift) - 1) / 2) / 1000
+
+
+class LatencySketch:
+    """可合并的延迟直方图（桶数组随最大值按需增长）"""
+
+    __slots__ = ('counts', 'count')
+
+    def __init__(self):
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.count = 0
+
+    def _grow(self, size: int):
+        grown = np.zeros(size, dtype=np.int64)
+        grown[:len(self.counts)] = self.counts
+        self.counts = grown
+
+    def add(self, index: int, n: int = 1):
+        """按桶写入（同一样本写入多个直方图时只需计算一次桶）"""
+        if index >= len(self.counts):
+            self._grow(max(index + 1, 2 * len(self.counts)))
+        self.counts[index] += n
+        self.count += n
+
+    def record(self, value: float):
+        """写入一个样本 (ms)"""
+        self.add(bucket_index(value))
+
+    def merge(self, other: 'LatencySketch'):
+        """逐桶加上另一个直方图"""
+        if len(other.counts) > len(self.counts):
+            self._grow(len(other.counts))
+        self.counts[:len(other.counts)] += other.counts
+        self.count += other.count
+
+    def subtract(self, other: 'LatencySketch'):
+        """逐桶减去另一个直方图（other 必须已合并在本直方图中，超出本直方图长度的桶都为0）"""
+        n = min(len(self.counts), len(other.counts))
+        self.counts[:n] -= other.counts[:n]
+        self.count -= other.count
+
+    def clear(self):
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.count = 0
+
+    def percentiles(self, qs: Sequence[float] = PERCENTILES) -> np.ndarray:
+        """分位数 (ms，q 为0-100，空直方图为0): 累计计数首次达到 q% 的桶"""
+        if self.count == 0:
+            return np.zeros(len(qs))
+        cumulative = np.cumsum(self.counts)
+        ranks = np.maximum(np.ceil(np.asarray(qs, dtype=np.float64) / 100 * self.count), 1)
+        return bucket_values(np.searchsorted(cumulative, ranks))
+
+    def percentile(self, q: float) -> float:
+        return float(self.percentiles([q])[0])
+
+    def mean(self) -> float:
+        """按桶代表值估算的均值"""
+        if self.count == 0:
+            return 0.0
+        return float(self.counts @ bucket_values(np.arange(len(self.counts))) / self.count)
+
+
+class LatencySeries:
+    """延迟序列 (ms)
+
+    次数、总和与最值精确维护，分布由 LatencySketch 给出（分位数按精确最值截断）。
+    """
+
+    __slots__ = ('sketch', 'count', 'total', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.sketch = LatencySketch()
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float('inf')
+        self.maximum = 0.0
+
+    def record(self, value: float, index: int = -1) -> int:
+        """写入一个样本 (ms)，返回所在的桶（index 为已计算好的桶）"""
+        if index < 0:
+            index = bucket_index(value)
+        self.sketch.add(index)
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        return index
+
+    def clear(self):
+        """清空序列"""
+        self.sketch.clear()
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float('inf')
+        self.maximum = 0.0
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """分位数 (q 为0-100，空序列为0)"""
+        if self.count == 0:
+            return 0.0
+        return min(max(self.sketch.percentile(q), self.minimum), self.maximum)
+
+    def summary(self) -> dict:
+        """次数、均值、最值与 p50/p95/p99"""
+        result = summarize(self.sketch)
+        result.update(count=self.count, mean=self.mean)
+        if self.count:
+            result.update(min=self.minimum, max=self.maximum)
+            for q in PERCENTILES:
+                result[f'p{q}'] = min(max(result[f'p{q}'], self.minimum), self.maximum)
+        return result
+
+
+def summarize(sketch: LatencySketch) -> dict:
+    """由直方图计算分布摘要（均值与最值为桶代表值，空直方图各项为0）"""
+    result = {'count': sketch.count, 'mean': sketch.mean(), 'min': 0.0, 'max': 0.0}
+    if sketch.count:
+        nonzero = np.flatnonzero(sketch.counts)
+        result['min'], result['max'] = bucket_values(nonzero[[0, -1]]).tolist()
+    for q, value in zip(PERCENTILES, sketch.percentiles().tolist()):
+        result[f'p{q}'] = value
+    return result
+
+
+def merge_sketches(sketches: Iterable[LatencySketch]) -> LatencySketch:
+    """合并多个直方图（不修改输入）"""
+    merged = LatencySketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
@@ -16,18 +16,27 @@ except ImportError:
     HAS_COLORLOG = False
 
 
+# 主日志器名称；各模块日志器是它的子日志器，级别统一由主日志器决定（无界面快速仿真时可调高以减少日志开销）
+_ROOT_NAME = "RizSimulator"
+
+
 class SimulatorLogger:
     """模拟器日志管理器"""
 
-    def __init__(self, name: str = "RizSimulator", log_file: Optional[str] = None):
-        self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.DEBUG)
+    def __init__(self, name: str = _ROOT_NAME, log_file: Optional[str] = None):
+        if name == _ROOT_NAME:
+            self.logger = logging.getLogger(name)
+            self.logger.setLevel(logging.DEBUG)
+        else:
+            # 级别保持 NOTSET，继承主日志器；不向上传播，输出只经过自己的处理器
+            self.logger = logging.getLogger(f"{_ROOT_NAME}.{name}")
+            self.logger.propagate = False
         self.logger.handlers = []  # 清除已有处理器
 
         # 创建格式化器
         if HAS_COLORLOG:
             console_formatter = colorlog.ColoredFormatter(
-                '%(log_color)s%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                f'%(log_color)s%(asctime)s - {name} - %(levelname)s - %(message)s',
                 datefmt='%Y-%m-%d %H:%M:%S',
                 log_colors={
                     'DEBUG': 'cyan',
@@ -39,7 +48,7 @@ class SimulatorLogger:
             )
         else:
             console_formatter = logging.Formatter(
-                '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                f'%(asctime)s - {name} - %(levelname)s - %(message)s',
                 datefmt='%Y-%m-%d %H:%M:%S'
             )
 
@@ -55,7 +64,7 @@ class SimulatorLogger:
             log_path.parent.mkdir(parents=True, exist_ok=True)
 
             file_formatter = logging.Formatter(
-                '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                f'%(asctime)s - {name} - %(levelname)s - %(message)s',
                 datefmt='%Y-%m-%d %H:%M:%S'
             )
 
@@ -81,10 +90,15 @@ class SimulatorLogger:
 
 
 # 全局日志实例
-_main_logger = SimulatorLogger("RizSimulator", "logs/rizsimulator.log")
+_main_logger = SimulatorLogger(_ROOT_NAME, "logs/rizsimulator.log")
 
-def get_logger(name: str = "RizSimulator") -> SimulatorLogger:
+def get_logger(name: str = _ROOT_NAME) -> SimulatorLogger:
     """获取日志器"""
-    if name == "RizSimulator":
+    if name == _ROOT_NAME:
         return _main_logger
     return SimulatorLogger(name)
+
+
+def set_log_level(level: int):
+    """设置所有日志器的级别（设置在主日志器上，各模块日志器随之生效）"""
+    _main_logger.logger.setLevel(level)
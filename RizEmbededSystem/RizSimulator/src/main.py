@@ -3,10 +3,12 @@ RizSimulator - Riz ESP32 Device Simulator
 Main Application Entry Point
 """
 
+import argparse
 import sys
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import Qt
 
+from constants import SESSION_DB_PATH
 from gui.main_window import MainWindow
 from logger import get_logger
 
@@ -15,12 +17,17 @@ logger = get_logger("RizSimulator")
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="RizSimulator - Riz ESP32 Device Simulator")
+    parser.add_argument("--session-db", nargs="?", const=SESSION_DB_PATH, default=None, metavar="PATH",
+                        help=f"把训练会话记录到 SQLite（不指定路径时为 {SESSION_DB_PATH}），默认不记录")
+    args, qt_args = parser.parse_known_args()
+
     # 启用高DPI支持
     QApplication.setHighDpiScaleFactorRoundingPolicy(
         Qt.HighDpiScaleFactorRoundingPolicy.PassThrough
     )
 
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setApplicationName("RizSimulator")
     app.setOrganizationName("RizLab")
 
@@ -39,7 +46,7 @@ def main():
     logger.info("=" * 70)
 
     # 创建主窗口
-    window = MainWindow()
+    window = MainWindow(session_db=args.session_db)
     window.show()
 
     logger.info("✅ 主窗口已显示")
@@ -0,0 +1,246 @@
+"""
+RizSimulator MMWave Radar
+毫米波雷达 - 18字节串口帧的批量解析/编码、合成人体目标，以及固件 MMWave::detectionTask
+判定逻辑的移植版本。同一帧序号上所有设备的计算合并为一次向量化运算。
+
+帧格式 (MMWave.cpp):
+    0x55 0xA5 | 6字节 | 状态 (0=无目标 1=运动 2=静止存在) | 距离 u16 大端 (cm) | 4字节 |
+    信号强度 u16 大端 | 校验和 (前17字节之和的低8位)
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Tuple, Union
+
+import numpy as np
+
+from fleet_state import FleetState
+from tof_uart import _resolve_overlaps
+from constants import (
+    MMWAVE_FRAME_RATE, MMWAVE_WEAK_SIGNAL_FACTOR, MMWAVE_MOTION_FRAMES,
+    MMWAVE_MIN_DISTANCE, MMWAVE_MAX_DISTANCE
+)
+
+FRAME_SIZE = 18
+FRAME_HEADER = (0x55, 0xA5)
+
+PRESENCE_NONE = 0
+PRESENCE_MOTION = 1
+PRESENCE_STATIC = 2
+
+
+@dataclass(frozen=True, eq=False)
+class MMWaveFrames:
+    """解析出的雷达帧（各列等长）"""
+    offset: np.ndarray     # 帧在数据中的字节偏移 (int64)
+    presence: np.ndarray   # 目标状态 (uint8)
+    distance: np.ndarray   # 目标距离 (cm, uint16)
+    signal: np.ndarray     # 信号强度 (uint16)
+    checksum_errors: int   # 帧头正确但校验失败、且不在有效帧内的候选数
+
+    def __len__(self) -> int:
+        return len(self.offset)
+
+
+def parse_frames(buffer) -> MMWaveFrames:
+    """解析 bytes / memoryview 中的全部雷达帧（垃圾字节后重新同步帧头，校验失败的帧丢弃）"""
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    limit = len(data) - FRAME_SIZE + 1
+    if limit <= 0:
+        candidates = np.empty(0, dtype=np.intp)
+    else:
+        candidates = np.flatnonzero((data[:limit] == FRAME_HEADER[0]) & (data[1:limit + 1] == FRAME_HEADER[1]))
+
+    rows = data[candidates[:, None] + np.arange(FRAME_SIZE)]
+    valid = rows[:, :FRAME_SIZE - 1].sum(axis=1, dtype=np.uint8) == rows[:, FRAME_SIZE - 1]
+    positions = candidates[valid]
+    keep = _resolve_overlaps(positions, FRAME_SIZE)
+    positions = positions[keep]
+    rows = rows[valid][keep]
+
+    # 校验失败且不落在任何有效帧内的候选才算错误
+    bad = candidates[~valid]
+    covered = np.zeros(len(bad), dtype=bool)
+    if len(positions):
+        owner = np.maximum(np.searchsorted(positions, bad, side='right') - 1, 0)
+        covered = (positions[owner] <= bad) & (bad < positions[owner] + FRAME_SIZE)
+
+    rows = rows.astype(np.uint16)
+    return MMWaveFrames(
+        offset=positions.astype(np.int64),
+        presence=rows[:, 8].astype(np.uint8),
+        distance=(rows[:, 9] << 8) | rows[:, 10],
+        signal=(rows[:, 15] << 8) | rows[:, 16],
+        checksum_errors=int(np.count_nonzero(~covered)),
+    )
+
+
+def read_capture(path: Union[str, Path]) -> MMWaveFrames:
+    """解析雷达串口抓包文件（雷达数据量很小，整体读入）"""
+    return parse_frames(Path(path).read_bytes())
+
+
+def encode_frames(presence, distance, signal) -> bytes:
+    """把各列编码为连续的雷达帧（未使用的字节填0），用于生成合成串口数据"""
+    presence = np.atleast_1d(np.asarray(presence, dtype=np.uint8))
+    rows = np.zeros((len(presence), FRAME_SIZE), dtype=np.uint8)
+    rows[:, 0], rows[:, 1] = FRAME_HEADER
+    rows[:, 8] = presence
+    rows[:, 9:11] = np.broadcast_to(distance, len(presence)).astype('>u2').view(np.uint8).reshape(-1, 2)
+    rows[:, 15:17] = np.broadcast_to(signal, len(presence)).astype('>u2').view(np.uint8).reshape(-1, 2)
+    rows[:, 17] = rows[:, :FRAME_SIZE - 1].sum(axis=1, dtype=np.uint8)
+    return rows.tobytes()
+
+
+# ===== 固件判定逻辑 =====
+
+def in_range(presence, distance, signal, motion_frames, expected_signal):
+    """detectionTask 的单帧判定: 信号达到期望值且距离有效，或连续有目标帧足够时信号达到期望值的70%"""
+    present = presence != PRESENCE_NONE
+    distance_ok = (distance >= MMWAVE_MIN_DISTANCE) & (distance <= MMWAVE_MAX_DISTANCE)
+    strong = signal >= expected_signal
+    weak = (motion_frames >= MMWAVE_MOTION_FRAMES) & (signal >= expected_signal * MMWAVE_WEAK_SIGNAL_FACTOR)
+    return present & distance_ok & (strong | weak)
+
+
+def motion_counts(presence: np.ndarray, start: int = 0) -> np.ndarray:
+    """一台雷达逐帧的连续有目标帧数: 无目标清零，运动/静止+1，未知状态保持不变"""
+    present = ((presence == PRESENCE_MOTION) | (presence == PRESENCE_STATIC)).astype(np.int64)
+    counts = np.cumsum(present)
+    index = np.arange(len(presence))
+    last_reset = np.maximum.accumulate(np.where(presence == PRESENCE_NONE, index, -1))
+    base = np.where(last_reset >= 0, counts[np.maximum(last_reset, 0)], -start)
+    return counts - base
+
+
+def scan_frames(frames: MMWaveFrames, motion_frames: int, expected_signal: int) -> Tuple[int, int]:
+    """按顺序判定一台雷达的一段帧，返回 (首个进入范围的帧序号或-1, 判定到该帧为止的连续帧计数)"""
+    if len(frames) == 0:
+        return -1, motion_frames
+    motion = motion_counts(frames.presence, motion_frames)
+    hits = np.flatnonzero(in_range(frames.presence, frames.distance, frames.signal, motion, expected_signal))
+    index = int(hits[0]) if len(hits) else -1
+    return index, int(motion[index])
+
+
+# ===== 合成目标 =====
+
+@dataclass(frozen=True)
+class TargetModel:
+    """合成人体目标: 雷达启动后玩家经过反应时间从远处走近，停在近处
+
+    信号强度与距离平方成反比，叠加每帧噪声；移动中上报运动，停下后上报静止存在，
+    超出感知范围时上报无目标。
+    """
+    frame_rate: float = MMWAVE_FRAME_RATE  # 帧率 (Hz)
+    start_distance: float = 300.0          # 玩家等待位置 (cm)
+    stop_distance: float = 40.0            # 走近后停下的位置 (cm)
+    speed: float = 150.0                   # 走近速度 (cm/s)
+    reaction_time: float = 0.5             # 雷达启动到玩家开始移动的平均时间 (秒)
+    reaction_spread: float = 0.15          # 反应时间标准差 (秒)
+    signal_ref: float = 200.0              # 100cm 处的信号强度
+    presence_range: float = 500.0          # 感知范围 (cm)
+    noise: float = 0.1                     # 每帧信号强度噪声 (相对标准差)
+
+    def __post_init__(self):
+        if self.frame_rate <= 0:
+            raise ValueError(f"帧率必须大于0: {self.frame_rate}")
+        if self.speed <= 0 or self.signal_ref <= 0:
+            raise ValueError("speed 与 signal_ref 必须大于0")
+        if not 0 < self.stop_distance <= self.start_distance:
+            raise ValueError(f"停下位置必须在 (0, {self.start_distance}] 内: {self.stop_distance}")
+
+    @property
+    def period(self) -> float:
+        """帧间隔 (秒)"""
+        return 1.0 / self.frame_rate
+
+
+class MMWaveRadar:
+    """设备群毫米波雷达
+
+    mmw_active 置位（固件 hasMMWaveDetectionTask / startDetection）时开始一次检测:
+    连续帧计数清零，为该设备抽取玩家的反应时间，之后按帧率逐帧生成合成目标并判定，
+    首个进入范围的帧触发并结束检测（固件 detectionTask 退出）。
+    mmw_external 置位的设备由 MMWaveSensorController.feed 的串口数据驱动，不生成合成目标。
+    """
+
+    def __init__(self, fleet: FleetState, model: TargetModel, rng: np.random.Generator):
+        self.fleet = fleet
+        self.model = model
+        self.rng = rng
+
+    def step(self, now: float) -> np.ndarray:
+        """推进到 now，处理期间的全部雷达帧，返回本次触发的slot数组"""
+        fleet = self.fleet
+        slots = fleet.active_slots()
+        if len(slots) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        requested = fleet.mmw_active[slots] & ~fleet.mmw_external[slots]
+        started = slots[requested & ~fleet.mmw_running[slots]]
+        fleet.mmw_running[slots] = requested
+        if len(started):
+            self._start(started, now)
+
+        active = slots[requested]
+        if len(active) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        period = self.model.period
+        first = fleet.mmw_next_frame[active]
+        counts = np.maximum(np.floor((now - first) / period + 1e-9).astype(np.intp) + 1, 0)
+        fleet.mmw_next_frame[active] = first + counts * period
+
+        running = np.ones(len(active), dtype=bool)
+        fired = []
+        for j in range(int(counts.max(initial=0))):
+            mask = running & (counts > j)
+            frame_fired = self._process_frame(active[mask], first[mask] + j * period)
+            if len(frame_fired):
+                fired.append(frame_fired)
+                running[np.isin(active, frame_fired)] = False
+
+        if not fired:
+            return np.empty(0, dtype=np.intp)
+        fired = np.concatenate(fired)
+        fleet.mmw_active[fired] = False
+        fleet.mmw_running[fired] = False
+        return fired
+
+    def _start(self, slots: np.ndarray, now: float):
+        """开始检测: 清零连续帧计数，抽取玩家开始移动的时间"""
+        fleet = self.fleet
+        model = self.model
+        fleet.mmw_motion_frames[slots] = 0
+        fleet.mmw_next_frame[slots] = now
+        delay = model.reaction_time + model.reaction_spread * self.rng.standard_normal(len(slots))
+        fleet.mmw_target_start[slots] = now + np.maximum(delay, 0.0)
+
+    def _target(self, slots: np.ndarray, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """各设备在 times 时刻的合成目标 (状态, 距离cm, 信号强度)"""
+        model = self.model
+        elapsed = np.maximum(times - self.fleet.mmw_target_start[slots], 0.0)
+        distance = np.maximum(model.start_distance - model.speed * elapsed, model.stop_distance)
+        moving = (elapsed > 0) & (distance > model.stop_distance)
+        presence = np.where(distance > model.presence_range, PRESENCE_NONE,
+                            np.where(moving, PRESENCE_MOTION, PRESENCE_STATIC)).astype(np.uint8)
+
+        signal = model.signal_ref * (100.0 / distance) ** 2
+        signal *= 1.0 + model.noise * self.rng.standard_normal(len(slots))
+        return (presence, np.rint(distance).astype(np.int32),
+                np.clip(np.rint(signal), 0, 0xFFFF).astype(np.int32))
+
+    def _process_frame(self, slots: np.ndarray, times: np.ndarray) -> np.ndarray:
+        """对一组设备各处理一帧，返回本帧进入范围的slot"""
+        fleet = self.fleet
+        presence, distance, signal = self._target(slots, times)
+        present = (presence == PRESENCE_MOTION) | (presence == PRESENCE_STATIC)
+        motion = np.where(presence == PRESENCE_NONE, 0, fleet.mmw_motion_frames[slots] + present)
+        fleet.mmw_motion_frames[slots] = motion
+        fleet.mmw_presence[slots] = presence
+        fleet.mmw_distance[slots] = distance
+        fleet.mmw_signal[slots] = signal
+        hit = in_range(presence, distance, signal, motion, fleet.mmw_expected_signal[slots])
+        fleet.last_detection_time[slots[hit]] = times[hit]
+        return slots[hit]
@@ -4,57 +4,195 @@ RizSimulator Data Models
 """
 
 from dataclasses import dataclass, field
-from typing import List, Tuple
-import time
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+
+from clock import Clock, MonotonicClock
+from fleet_state import FleetState, FleetCounters
+from ring_buffer import RingBuffer
+from latency import LatencySeries, LatencySketch
+from game_fsm import TRANSITIONS, EVENT_ARM, STATE_IDLE, STATE_READY
+from window_mode import WINDOW_EARLY, WINDOW_HIT
 from constants import (
-    LED_COUNT, INNER_RING_COUNT, OUTER_RING_COUNT,
-    TERMINATE_MODE, STATE_DISCONNECTED,
+    COOLDOWN_DURATION, BASELINE_HISTORY_SIZE, MOVING_AVG_SIZE,
     DEFAULT_BLINKBREAK, DEFAULT_TIMEDBREAK, DEFAULT_BUFFER,
-    DEFAULT_BUZZER, DEFAULT_BUZZERTIME
+    DEFAULT_BUZZER, DEFAULT_BUZZERTIME, DEFAULT_WINDOW_TOTAL, DEFAULT_WINDOW_GOOD
 )
 
 
-@dataclass
+def _bind_row(fleet: Optional[FleetState], slot: int) -> Tuple[FleetState, int]:
+    """未指定FleetState时创建单行的私有存储（独立使用模型时）"""
+    if fleet is None:
+        fleet = FleetState(capacity=1)
+        slot = fleet.allocate(-1)
+    return fleet, slot
+
+
 class LEDState:
-    """LED灯光状态"""
-    inner_ring: List[Tuple[int, int, int]] = field(default_factory=lambda: [(0, 0, 0)] * INNER_RING_COUNT)
-    outer_ring: List[Tuple[int, int, int]] = field(default_factory=lambda: [(0, 0, 0)] * OUTER_RING_COUNT)
-    brightness: float = 1.0  # 0.0 - 1.0
-    is_on: bool = False
+    """LED灯光状态（FleetState 中一行的视图）"""
+
+    __slots__ = ('_fleet', '_slot')
+
+    def __init__(self, fleet: Optional[FleetState] = None, slot: int = -1):
+        self._fleet, self._slot = _bind_row(fleet, slot)
+
+    @property
+    def pixels(self) -> np.ndarray:
+        """全部48颗LED (48x3 uint8 视图，内圈在前)"""
+        return self._fleet.leds[self._slot]
+
+    @property
+    def inner_ring(self) -> List[Tuple[int, int, int]]:
+        return [tuple(c) for c in self._fleet.inner_ring(self._slot).tolist()]
+
+    @inner_ring.setter
+    def inner_ring(self, colors: List[Tuple[int, int, int]]):
+        self._fleet.inner_ring(self._slot)[:] = colors
+
+    @property
+    def outer_ring(self) -> List[Tuple[int, int, int]]:
+        return [tuple(c) for c in self._fleet.outer_ring(self._slot).tolist()]
+
+    @outer_ring.setter
+    def outer_ring(self, colors: List[Tuple[int, int, int]]):
+        self._fleet.outer_ring(self._slot)[:] = colors
+
+    @property
+    def brightness(self) -> float:
+        """亮度 0.0 - 1.0"""
+        return float(self._fleet.brightness[self._slot])
+
+    @brightness.setter
+    def brightness(self, value: float):
+        self._fleet.brightness[self._slot] = value
+
+    @property
+    def intensity(self) -> int:
+        """灯带全局亮度 0-255（固件 setBrightness，影响功耗不影响显示）"""
+        return int(self._fleet.led_intensity[self._slot])
+
+    @intensity.setter
+    def intensity(self, value: int):
+        self._fleet.led_intensity[self._slot] = value
+
+    @property
+    def is_on(self) -> bool:
+        return bool(self._fleet.led_on[self._slot])
+
+    @is_on.setter
+    def is_on(self, value: bool):
+        self._fleet.set_led_on(self._slot, bool(value))
 
     def set_all(self, color: Tuple[int, int, int]):
         """设置所有LED为相同颜色"""
-        self.inner_ring = [color] * INNER_RING_COUNT
-        self.outer_ring = [color] * OUTER_RING_COUNT
+        self._fleet.leds[self._slot] = color
 
     def set_inner(self, color: Tuple[int, int, int]):
         """设置内圈颜色"""
-        self.inner_ring = [color] * INNER_RING_COUNT
+        self._fleet.inner_ring(self._slot)[:] = color
 
     def set_outer(self, color: Tuple[int, int, int]):
         """设置外圈颜色"""
-        self.outer_ring = [color] * OUTER_RING_COUNT
+        self._fleet.outer_ring(self._slot)[:] = color
 
     def clear(self):
         """清除所有LED"""
-        self.inner_ring = [(0, 0, 0)] * INNER_RING_COUNT
-        self.outer_ring = [(0, 0, 0)] * OUTER_RING_COUNT
-        self.is_on = False
+        self._fleet.leds[self._slot] = 0
+        self._fleet.set_led_on(self._slot, False)
+
+    def load_frame(self, pixels: np.ndarray, brightness: float, is_on: bool):
+        """整帧拷贝 (48x3)，用于播放预计算的动画帧"""
+        self._fleet.leds[self._slot] = pixels
+        self._fleet.brightness[self._slot] = brightness
+        self._fleet.set_led_on(self._slot, is_on)
 
 
-@dataclass
 class TOFSensorState:
-    """TOF传感器状态"""
-    distance: int = 1000  # mm
-    amplitude: int = 100
-    baseline: int = 0
-    baseline_history: List[int] = field(default_factory=list)
-    consecutive_detections: int = 0
-    last_detection_time: float = 0.0
-    is_cooldown: bool = False
-    cooldown_start: float = 0.0
-    detection_active: bool = False
+    """TOF传感器状态（FleetState 中一行的视图）"""
+
+    __slots__ = ('_fleet', '_slot', 'baseline_history', 'amplitude_window')
+
+    def __init__(self, fleet: Optional[FleetState] = None, slot: int = -1):
+        self._fleet, self._slot = _bind_row(fleet, slot)
+        self.baseline_history = RingBuffer(BASELINE_HISTORY_SIZE)
+        self.amplitude_window = RingBuffer(MOVING_AVG_SIZE)  # 振幅滑动平均
+
+    @property
+    def distance(self) -> int:
+        """距离 (mm)"""
+        return int(self._fleet.distance[self._slot])
+
+    @distance.setter
+    def distance(self, value: int):
+        self._fleet.distance[self._slot] = value
+
+    @property
+    def amplitude(self) -> int:
+        return int(self._fleet.amplitude[self._slot])
+
+    @amplitude.setter
+    def amplitude(self, value: int):
+        self._fleet.amplitude[self._slot] = value
+
+    @property
+    def baseline(self) -> int:
+        return int(self._fleet.baseline[self._slot])
+
+    @baseline.setter
+    def baseline(self, value: int):
+        self._fleet.set_baseline(self._slot, value)
+
+    @property
+    def threshold(self) -> int:
+        """振幅检测阈值（基线变化时预先计算）"""
+        return int(self._fleet.threshold[self._slot])
+
+    @property
+    def consecutive_detections(self) -> int:
+        return int(self._fleet.consecutive[self._slot])
+
+    @consecutive_detections.setter
+    def consecutive_detections(self, value: int):
+        self._fleet.consecutive[self._slot] = value
+
+    @property
+    def last_detection_time(self) -> float:
+        return float(self._fleet.last_detection_time[self._slot])
+
+    @last_detection_time.setter
+    def last_detection_time(self, value: float):
+        self._fleet.last_detection_time[self._slot] = value
+
+    @property
+    def is_cooldown(self) -> bool:
+        return bool(self._fleet.is_cooldown[self._slot])
+
+    @is_cooldown.setter
+    def is_cooldown(self, value: bool):
+        self._fleet.is_cooldown[self._slot] = value
+
+    @property
+    def cooldown_until(self) -> float:
+        """冷却截止时间 (秒)"""
+        return float(self._fleet.cooldown_until[self._slot])
+
+    @property
+    def cooldown_start(self) -> float:
+        """冷却开始时间 (秒)，由截止时间反推"""
+        return self.cooldown_until - COOLDOWN_DURATION / 1000
+
+    @cooldown_start.setter
+    def cooldown_start(self, value: float):
+        self._fleet.cooldown_until[self._slot] = value + COOLDOWN_DURATION / 1000
+
+    @property
+    def detection_active(self) -> bool:
+        return bool(self._fleet.detection_active[self._slot])
+
+    @detection_active.setter
+    def detection_active(self, value: bool):
+        self._fleet.detection_active[self._slot] = value
 
     def reset(self):
         """重置传感器状态"""
@@ -63,59 +201,209 @@ class TOFSensorState:
         self.detection_active = False
 
     def add_baseline_sample(self, amplitude: int):
-        """添加基线样本"""
-        self.baseline_history.append(amplitude)
-        if len(self.baseline_history) > 30:  # BASELINE_HISTORY_SIZE
-            self.baseline_history.pop(0)
-        if self.baseline_history:
-            self.baseline = sum(self.baseline_history) // len(self.baseline_history)
+        """添加基线样本（基线为最近 BASELINE_HISTORY_SIZE 个样本的整数均值）"""
+        self.baseline_history.push(amplitude)
+        self.baseline = self.baseline_history.mean
+
+    def add_amplitude_sample(self, amplitude: int):
+        """记录一次振幅读数并计入滑动平均"""
+        self.amplitude = amplitude
+        self.amplitude_window.push(amplitude)
+
+    @property
+    def smoothed_amplitude(self) -> int:
+        """最近 MOVING_AVG_SIZE 次振幅读数的均值（无读数时为当前振幅）"""
+        return self.amplitude_window.mean if self.amplitude_window else self.amplitude
+
+
+class MMWaveSensorState:
+    """毫米波雷达状态（FleetState 中一行的视图）"""
+
+    __slots__ = ('_fleet', '_slot')
+
+    def __init__(self, fleet: Optional[FleetState] = None, slot: int = -1):
+        self._fleet, self._slot = _bind_row(fleet, slot)
+
+    @property
+    def detection_active(self) -> bool:
+        return bool(self._fleet.mmw_active[self._slot])
+
+    @detection_active.setter
+    def detection_active(self, value: bool):
+        if value and not self._fleet.mmw_active[self._slot]:
+            self._fleet.mmw_running[self._slot] = False  # 重新开始一次检测
+        self._fleet.mmw_active[self._slot] = value
+
+    @property
+    def presence(self) -> int:
+        """最近一帧的目标状态 (0=无目标 1=运动 2=静止存在)"""
+        return int(self._fleet.mmw_presence[self._slot])
+
+    @property
+    def distance(self) -> int:
+        """最近一帧的目标距离 (cm)"""
+        return int(self._fleet.mmw_distance[self._slot])
+
+    @property
+    def signal(self) -> int:
+        """最近一帧的信号强度"""
+        return int(self._fleet.mmw_signal[self._slot])
+
+    @property
+    def motion_frames(self) -> int:
+        return int(self._fleet.mmw_motion_frames[self._slot])
+
+    @motion_frames.setter
+    def motion_frames(self, value: int):
+        self._fleet.mmw_motion_frames[self._slot] = value
+
+    @property
+    def expected_signal_strength(self) -> int:
+        return int(self._fleet.mmw_expected_signal[self._slot])
+
+    @expected_signal_strength.setter
+    def expected_signal_strength(self, value: int):
+        self._fleet.mmw_expected_signal[self._slot] = value
+
+    def update_frame(self, presence: int, distance: int, signal: int):
+        """记录最近一帧"""
+        self._fleet.mmw_presence[self._slot] = presence
+        self._fleet.mmw_distance[self._slot] = distance
+        self._fleet.mmw_signal[self._slot] = signal
+
+    def reset(self):
+        """停止检测"""
+        self.detection_active = False
+        self.motion_frames = 0
 
 
-@dataclass
 class DeviceConfig:
-    """设备配置参数"""
-    game_mode: int = TERMINATE_MODE
-    prev_game_mode: int = -1
-    blink_break: int = DEFAULT_BLINKBREAK
-    timed_break: int = DEFAULT_TIMEDBREAK
-    buffer_time: int = DEFAULT_BUFFER
-    buzzer_enabled: bool = (DEFAULT_BUZZER == 1)
-    buzzer_time: int = DEFAULT_BUZZERTIME
-    double_mode_index: int = 0
-    sensor_mode: int = 1  # 1=LiDAR, 2=MMWave, 3=Both
-    config_blink_count: int = 1
+    """设备配置参数（game_mode / prev_game_mode 存于 FleetState，其余为普通属性）"""
+
+    def __init__(self, fleet: Optional[FleetState] = None, slot: int = -1):
+        self._fleet, self._slot = _bind_row(fleet, slot)
+        self.blink_break: int = DEFAULT_BLINKBREAK
+        self.timed_break: int = DEFAULT_TIMEDBREAK
+        self.buffer_time: int = DEFAULT_BUFFER
+        self.buzzer_enabled: bool = (DEFAULT_BUZZER == 1)
+        self.buzzer_time: int = DEFAULT_BUZZERTIME
+        self.double_mode_index: int = 0
+        self.sensor_mode: int = 1  # 1=LiDAR, 2=MMWave, 3=Both
+        self.config_blink_count: int = 1
+        self.process: int = 0  # 训练进度 (Manual模式颜色)
+        self.red_value: int = 255  # Rhythm模式RGB
+        self.green_value: int = 140
+        self.blue_value: int = 0
+        self.rhythm_timer: int = 0  # Rhythm模式倒计时 (ms)，0 为常亮直到检测
+        self.rhythm_buzzer_time: int = DEFAULT_BUZZERTIME  # Rhythm模式蜂鸣时长 (ms)，0 为不蜂鸣
+        self.window_total: int = DEFAULT_WINDOW_TOTAL  # Window模式总时长 (ms)
+        self.window_good: int = DEFAULT_WINDOW_GOOD    # Window模式最佳窗口时长 (ms)
+
+    @property
+    def game_mode(self) -> int:
+        return int(self._fleet.mode[self._slot])
+
+    @game_mode.setter
+    def game_mode(self, value: int):
+        self._fleet.set_device_mode(self._slot, value)
+
+    @property
+    def prev_game_mode(self) -> int:
+        """状态机最近进入的游戏模式（-1 表示尚未进入）"""
+        return int(self._fleet.fsm_game[self._slot])
+
+    @prev_game_mode.setter
+    def prev_game_mode(self, value: int):
+        self._fleet.fsm_game[self._slot] = value
 
 
 @dataclass
 class DeviceStats:
     """设备统计数据"""
     trigger_count: int = 0
-    total_reaction_time: float = 0.0
+    reaction_count: int = 0             # 点亮后检测到的触发次数
+    total_reaction_time: float = 0.0    # 点亮 -> 检测的反应时间之和 (ms)
     fastest_reaction: float = float('inf')
     average_reaction: float = 0.0
     last_trigger_time: float = 0.0
 
-    def record_trigger(self):
-        """记录触发"""
-        current_time = time.time()
-        if self.last_trigger_time > 0:
-            reaction_time = (current_time - self.last_trigger_time) * 1000  # ms
+    # 反应时间与 BLE写入 -> LED变化 的系统处理延迟分布 (ms)，反应时间另按点亮时的游戏模式分组
+    reactions: LatencySeries = field(default_factory=LatencySeries, repr=False, compare=False)
+    reactions_by_mode: Dict[int, LatencySketch] = field(default_factory=dict, repr=False, compare=False)
+    system_latency: LatencySeries = field(default_factory=LatencySeries, repr=False, compare=False)
+
+    # 窗口模式结果
+    window_hits: int = 0
+    window_early: int = 0
+    window_late: int = 0
+    window_reaction_total: float = 0.0  # 命中时距最佳窗口开始的时间之和 (ms)
+
+    # 设备群聚合计数器（由所属FleetState提供）
+    counters: Optional[FleetCounters] = field(default=None, repr=False, compare=False)
+
+    def record_trigger(self, current_time: float, reaction_time: Optional[float] = None, mode: int = -1):
+        """记录触发（current_time 来自设备时钟，单位: 秒；reaction_time 为点亮到检测的时间，
+        单位: ms，触发时灯未点亮则为None，不计入反应时间；mode 为点亮时的游戏模式）"""
+        bucket = -1
+        if reaction_time is not None:
+            self.reaction_count += 1
             self.total_reaction_time += reaction_time
             self.fastest_reaction = min(self.fastest_reaction, reaction_time)
+            self.average_reaction = self.total_reaction_time / self.reaction_count
+            bucket = self.reactions.record(reaction_time)
+            if mode >= 0:
+                self.reactions_by_mode.setdefault(mode, LatencySketch()).add(bucket)
+
+        if self.counters is not None:
+            self.counters.record_trigger(reaction_time, mode, bucket)
 
         self.trigger_count += 1
         self.last_trigger_time = current_time
 
-        if self.trigger_count > 0:
-            self.average_reaction = self.total_reaction_time / self.trigger_count
+    def record_window(self, result: int, reaction: float = 0.0):
+        """记录一次窗口模式结果（reaction 为命中时距最佳窗口开始的时间，单位: ms）"""
+        if result == WINDOW_HIT:
+            self.window_hits += 1
+            self.window_reaction_total += reaction
+        elif result == WINDOW_EARLY:
+            self.window_early += 1
+        else:
+            self.window_late += 1
+
+    @property
+    def window_hit_rate(self) -> float:
+        """命中率 window / (window + window_miss + window_timeout)"""
+        attempts = self.window_hits + self.window_early + self.window_late
+        return self.window_hits / attempts if attempts else 0.0
+
+    @property
+    def window_average_reaction(self) -> float:
+        """命中时的平均反应时间 (ms)"""
+        return self.window_reaction_total / self.window_hits if self.window_hits else 0.0
+
+    def withdraw(self):
+        """从设备群聚合计数器中扣除本设备的统计（重置统计或设备被移除时）"""
+        if self.counters is not None:
+            self.counters.remove_triggers(self.trigger_count, self.total_reaction_time, self.reaction_count,
+                                          self.reactions.sketch, self.reactions_by_mode)
 
     def reset(self):
         """重置统计"""
+        self.withdraw()
+
         self.trigger_count = 0
+        self.reaction_count = 0
         self.total_reaction_time = 0.0
         self.fastest_reaction = float('inf')
         self.average_reaction = 0.0
         self.last_trigger_time = 0.0
+        self.window_hits = 0
+        self.window_early = 0
+        self.window_late = 0
+        self.window_reaction_total = 0.0
+        self.reactions.clear()
+        self.reactions_by_mode = {}
+        self.system_latency.clear()
 
 
 @dataclass
@@ -126,28 +414,77 @@ class RizDevice:
     mac_address: str = ""
     firmware_version: str = "v1.0.0"
 
-    # 状态
-    connection_state: int = STATE_DISCONNECTED
-    led_state: LEDState = field(default_factory=LEDState)
-    tof_state: TOFSensorState = field(default_factory=TOFSensorState)
-    config: DeviceConfig = field(default_factory=DeviceConfig)
+    # 状态（connection_state / buzzer_active / able_to_turn_on / led_state / tof_state / mmwave_state / config 为 FleetState 中本设备一行的视图）
+    led_state: LEDState = field(init=False, repr=False, compare=False)
+    tof_state: TOFSensorState = field(init=False, repr=False, compare=False)
+    mmwave_state: MMWaveSensorState = field(init=False, repr=False, compare=False)
+    config: DeviceConfig = field(init=False, repr=False, compare=False)
     stats: DeviceStats = field(default_factory=DeviceStats)
-
-    # 控制标志
-    able_to_turn_on: bool = True
-    buzzer_active: bool = False
     buzzer_start_time: float = 0.0
 
+    # 时钟（默认真实单调时钟，可注入虚拟时钟）
+    clock: Clock = field(default_factory=MonotonicClock)
+
     # BLE相关
     ble_server: any = None  # BLEGATTServer实例（延迟导入避免循环）
 
+    # 设备群状态存储（未指定时使用单行私有存储）
+    fleet: Optional[FleetState] = field(default=None, repr=False, compare=False)
+    slot: int = -1
+
     def __post_init__(self):
         """初始化后处理"""
+        if self.fleet is None:
+            self.fleet = FleetState(capacity=1)
+            self.slot = self.fleet.allocate(self.device_id)
+        self.led_state = LEDState(self.fleet, self.slot)
+        self.tof_state = TOFSensorState(self.fleet, self.slot)
+        self.mmwave_state = MMWaveSensorState(self.fleet, self.slot)
+        self.config = DeviceConfig(self.fleet, self.slot)
+        self.stats.counters = self.fleet.counters
+
         if not self.name:
             self.name = f"RIZ-{self.device_id:04d}"
         if not self.mac_address:
             self.mac_address = self._generate_mac()
 
+    @property
+    def buzzer_active(self) -> bool:
+        return bool(self.fleet.buzzer_active[self.slot])
+
+    @buzzer_active.setter
+    def buzzer_active(self, value: bool):
+        self.fleet.buzzer_active[self.slot] = value
+
+    @property
+    def able_to_turn_on(self) -> bool:
+        """可以点亮（固件 ableToTurnOn），即状态机处于 READY"""
+        return int(self.fleet.fsm_state[self.slot]) == STATE_READY
+
+    @able_to_turn_on.setter
+    def able_to_turn_on(self, value: bool):
+        state = int(self.fleet.fsm_state[self.slot])
+        if value:
+            next_state = int(TRANSITIONS[state, EVENT_ARM])
+            if next_state >= 0:
+                self.fleet.fsm_state[self.slot] = next_state
+        elif state == STATE_READY:
+            self.fleet.fsm_state[self.slot] = STATE_IDLE
+
+    @property
+    def charge_used(self) -> float:
+        """已消耗电量 (mAh)"""
+        return float(self.fleet.charge_used[self.slot])
+
+    @property
+    def connection_state(self) -> int:
+        """连接状态"""
+        return int(self.fleet.conn_state[self.slot])
+
+    @connection_state.setter
+    def connection_state(self, state: int):
+        self.fleet.set_connection_state(self.slot, state)
+
     def _generate_mac(self) -> str:
         """生成MAC地址"""
         mac_bytes = [
@@ -0,0 +1,152 @@
+"""
+RizSimulator Power Model
+电池与功耗模型 - 每个仿真帧由48颗LED的实际帧缓冲、蜂鸣器和传感器状态计算整个设备群的电流，
+累计消耗的电量与能量；18650 放电曲线与电量百分比使用固件 Pangodream_18650_CL 的查找表。
+"""
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from fleet_state import FleetState
+from constants import LED_COUNT
+
+# 固件 _initVoltsArray: 下标为剩余电量百分比 (SoC)，值为开路电压 (V)
+_SOC_VOLTS = np.concatenate([3.650 + 0.005 * np.arange(99), [4.150, 4.200]])
+
+# 固件 getVoltageFromRaw: ADC读数 -> 电压 (V)
+_ADC_VOLTS = np.array([
+    (2018, 3.64), (2023, 3.65), (2030, 3.66), (2040, 3.67), (2050, 3.68),
+    (2060, 3.69), (2070, 3.70), (2080, 3.71), (2090, 3.72), (2100, 3.73),
+    (2111, 3.74), (2120, 3.75), (2123, 3.76), (2130, 3.77), (2140, 3.78),
+    (2150, 3.79), (2160, 3.80), (2170, 3.81), (2174, 3.82), (2185, 3.83),
+    (2190, 3.84), (2203, 3.85), (2210, 3.87), (2220, 3.89), (2230, 3.91),
+    (2240, 3.93), (2250, 3.95), (2260, 3.97), (2270, 3.99), (2280, 4.01),
+    (2290, 4.04), (2300, 4.07), (2310, 4.09), (2320, 4.11), (2323, 4.12),
+])
+
+# 固件 getRawPercentage: ADC读数 -> 电量百分比（区间内整数线性插值）
+_ADC_PERCENT = np.array([
+    (2018, 0), (2023, 1), (2028, 2), (2033, 3), (2038, 4),
+    (2043, 5), (2048, 6), (2053, 8), (2058, 10), (2063, 12),
+    (2068, 16), (2070, 20), (2075, 22), (2080, 24), (2085, 26),
+    (2090, 28), (2095, 30), (2100, 33), (2105, 36), (2110, 38),
+    (2111, 40), (2115, 41), (2120, 43), (2123, 44), (2125, 45),
+    (2130, 48), (2135, 51), (2140, 53), (2145, 56), (2150, 58),
+    (2155, 61), (2160, 63), (2165, 66), (2170, 68), (2174, 70),
+    (2176, 71), (2178, 72), (2180, 73), (2182, 74), (2184, 75),
+    (2185, 76), (2187, 77), (2190, 78), (2193, 80), (2196, 81),
+    (2200, 83), (2203, 85), (2206, 86), (2210, 87), (2215, 89),
+    (2220, 90), (2225, 91), (2230, 92), (2235, 93), (2240, 94),
+    (2245, 95), (2250, 96), (2260, 97), (2270, 98), (2280, 98),
+    (2290, 99), (2300, 99), (2310, 99), (2320, 99), (2323, 100),
+], dtype=np.int64)
+
+
+def voltage_from_soc(soc) -> np.ndarray:
+    """剩余电量 (0-1) 对应的电池电压"""
+    return np.interp(np.asarray(soc) * 100.0, np.arange(len(_SOC_VOLTS)), _SOC_VOLTS)
+
+
+def adc_from_voltage(volts) -> np.ndarray:
+    """电池电压对应的ADC读数（getVoltageFromRaw 的反查）"""
+    return np.rint(np.interp(volts, _ADC_VOLTS[:, 1], _ADC_VOLTS[:, 0])).astype(np.int64)
+
+
+def raw_percentage(adc) -> np.ndarray:
+    """getRawPercentage 的向量化版本: 表外取端点，区间内按整数除法插值"""
+    adc = np.asarray(adc, dtype=np.int64)
+    table_adc, table_percent = _ADC_PERCENT[:, 0], _ADC_PERCENT[:, 1]
+    index = np.clip(np.searchsorted(table_adc, adc, side='right') - 1, 0, len(table_adc) - 2)
+    low, high = table_adc[index], table_adc[index + 1]
+    percent = table_percent[index] + (adc - low) * (table_percent[index + 1] - table_percent[index]) // (high - low)
+    return np.where(adc <= table_adc[0], table_percent[0],
+                    np.where(adc >= table_adc[-1], table_percent[-1], percent))
+
+
+@dataclass(frozen=True)
+class BatteryModel:
+    """单节18650供电的设备功耗参数（电流单位 mA）"""
+    capacity: float = 3000.0        # 电池容量 (mAh)
+    led_channel: float = 20.0       # WS2812 单颜色通道满亮度 (255) 电流
+    led_idle: float = 1.0           # 每颗LED的静态电流
+    mcu: float = 80.0               # ESP32 + BLE
+    tof: float = 70.0               # TF-Luna 持续测距
+    mmwave: float = 60.0            # 毫米波雷达检测中
+    buzzer: float = 30.0
+    average_window: float = 60.0    # 预测剩余时间所用平均电流的时间常数 (秒)
+
+    def __post_init__(self):
+        if self.capacity <= 0:
+            raise ValueError(f"电池容量必须大于0: {self.capacity}")
+        if self.average_window <= 0:
+            raise ValueError(f"平均窗口必须大于0: {self.average_window}")
+
+
+class PowerMonitor:
+    """设备群功耗积分
+
+    每次 step 用上一帧以来保持的设备状态计算电流（LED按帧缓冲各通道值 × 全局亮度 led_intensity
+    × 动画亮度），累计到 charge_used (mAh) / energy_used (mWh)，并更新平均电流用于预测剩余时间。
+    功耗只是观测量，不影响仿真行为。
+    """
+
+    def __init__(self, fleet: FleetState, model: BatteryModel):
+        self.fleet = fleet
+        self.model = model
+        self._last_time = None
+
+    def step(self, now: float):
+        """把 (上次调用, now] 期间的电流累计到各设备"""
+        dt = 0.0 if self._last_time is None else max(0.0, now - self._last_time)
+        self._last_time = now
+        if dt == 0:
+            return
+        slots = self.fleet.active_slots()
+        if len(slots) == 0:
+            return
+
+        fleet = self.fleet
+        current = self.current(slots)
+        charge = current * (dt / 3600.0)
+        fleet.energy_used[slots] += charge * self.voltage(slots)
+        fleet.charge_used[slots] += charge
+
+        average = fleet.current_avg[slots]
+        alpha = 1.0 - math.exp(-dt / self.model.average_window)
+        fleet.current_avg[slots] = np.where(average == 0, current, average + (current - average) * alpha)
+
+    def current(self, slots: np.ndarray) -> np.ndarray:
+        """各设备当前的电流 (mA)"""
+        fleet = self.fleet
+        model = self.model
+        current = np.full(len(slots), model.mcu + model.tof + model.led_idle * LED_COUNT)
+        current += model.mmwave * fleet.mmw_active[slots]
+        current += model.buzzer * fleet.buzzer_active[slots]
+
+        lit = np.flatnonzero(fleet.led_on[slots])
+        if len(lit):
+            lit_slots = slots[lit]
+            levels = fleet.leds[lit_slots].sum(axis=(1, 2), dtype=np.int64)
+            scale = fleet.led_intensity[lit_slots] / 255.0 * fleet.brightness[lit_slots]
+            current[lit] += model.led_channel * levels / 255.0 * scale
+        return current
+
+    def state_of_charge(self, slots: np.ndarray) -> np.ndarray:
+        """剩余电量 (0-1)"""
+        return np.clip(1.0 - self.fleet.charge_used[slots] / self.model.capacity, 0.0, 1.0)
+
+    def voltage(self, slots: np.ndarray) -> np.ndarray:
+        return voltage_from_soc(self.state_of_charge(slots))
+
+    def reported_percentage(self, slots: np.ndarray) -> np.ndarray:
+        """固件上报的电量百分比（由电压换算ADC读数后查表）"""
+        return raw_percentage(adc_from_voltage(self.voltage(slots)))
+
+    def time_to_empty(self, slots: np.ndarray) -> np.ndarray:
+        """按平均电流预测的剩余使用时间 (秒，尚无电流数据时为inf)"""
+        remaining = self.state_of_charge(slots) * self.model.capacity
+        average = self.fleet.current_avg[slots].astype(np.float64)
+        with np.errstate(divide='ignore'):
+            return np.where(average > 0, remaining / average * 3600.0, np.inf)
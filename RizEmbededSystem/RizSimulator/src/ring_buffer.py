@@ -0,0 +1,100 @@
+"""
+RizSimulator Ring Buffer
+定长环形缓冲 - 对应固件 TF_Luna_UART 的 amplitudeHistory / amplitudeBuffer，
+写入时增量维护累加和与平方和，均值和方差为O(1)，不分配新对象
+"""
+
+from bisect import bisect_left, insort
+from typing import Iterator, List, Optional
+
+
+class RingBuffer:
+    """整数定长环形缓冲
+
+    写满后新样本覆盖最旧的样本。track_median 为True时额外维护一份有序副本，
+    中位数查询为O(1)，写入为O(size)（只在定长列表内移动元素）。
+    """
+
+    __slots__ = ('size', '_values', '_index', '_count', '_sum', '_sum_sq', '_sorted')
+
+    def __init__(self, size: int, track_median: bool = False):
+        if size <= 0:
+            raise ValueError(f"缓冲长度必须大于0: {size}")
+        self.size = size
+        self._values: List[int] = [0] * size
+        self._index = 0   # 下一次写入的位置（写满后即最旧样本的位置）
+        self._count = 0
+        self._sum = 0
+        self._sum_sq = 0
+        self._sorted: Optional[List[int]] = [] if track_median else None
+
+    def push(self, value: int) -> Optional[int]:
+        """写入一个样本，返回被覆盖的最旧样本（未写满时为None）"""
+        evicted = None
+        if self._count == self.size:
+            evicted = self._values[self._index]
+            self._sum -= evicted
+            self._sum_sq -= evicted * evicted
+            if self._sorted is not None:
+                del self._sorted[bisect_left(self._sorted, evicted)]
+        else:
+            self._count += 1
+
+        self._values[self._index] = value
+        self._index = (self._index + 1) % self.size
+        self._sum += value
+        self._sum_sq += value * value
+        if self._sorted is not None:
+            insort(self._sorted, value)
+        return evicted
+
+    def clear(self):
+        """清空缓冲"""
+        self._index = 0
+        self._count = 0
+        self._sum = 0
+        self._sum_sq = 0
+        if self._sorted is not None:
+            self._sorted.clear()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[int]:
+        """从最旧到最新"""
+        start = self._index - self._count
+        for i in range(start, self._index):
+            yield self._values[i % self.size]
+
+    @property
+    def full(self) -> bool:
+        return self._count == self.size
+
+    @property
+    def total(self) -> int:
+        """累加和"""
+        return self._sum
+
+    @property
+    def mean(self) -> int:
+        """整数均值（与固件相同的截断除法，空缓冲为0）"""
+        return self._sum // self._count if self._count else 0
+
+    @property
+    def variance(self) -> float:
+        """总体方差（由整数累加和精确计算，不累积浮点误差）"""
+        if self._count == 0:
+            return 0.0
+        return (self._count * self._sum_sq - self._sum * self._sum) / (self._count * self._count)
+
+    @property
+    def median(self) -> float:
+        """中位数（需 track_median=True）"""
+        if self._sorted is None:
+            raise ValueError("创建缓冲时未启用 track_median")
+        if not self._sorted:
+            return 0.0
+        middle = self._count // 2
+        if self._count % 2:
+            return float(self._sorted[middle])
+        return (self._sorted[middle - 1] + self._sorted[middle]) / 2
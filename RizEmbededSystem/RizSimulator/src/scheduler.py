@@ -0,0 +1,64 @@
+"""
+RizSimulator Timer Scheduler
+截止时间调度器 - 最小堆实现，只唤醒到期的设备
+"""
+
+import heapq
+import itertools
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class TimerScheduler:
+    """截止时间调度器
+
+    每个 key（通常是设备ID）最多只有一个有效截止时间。重新调度时旧的堆条目不立即删除，
+    而是在弹出时与 _deadlines 比对后丢弃（惰性删除），因此 schedule/cancel 都是 O(log n)。
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._deadlines: Dict[Hashable, float] = {}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def schedule(self, key: Hashable, deadline: float):
+        """设置 key 的截止时间（覆盖之前的截止时间）"""
+        if self._deadlines.get(key) == deadline:
+            return
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._seq), key))
+
+    def cancel(self, key: Hashable):
+        """取消 key 的截止时间"""
+        self._deadlines.pop(key, None)
+
+    def get_deadline(self, key: Hashable) -> Optional[float]:
+        """获取 key 当前的截止时间"""
+        return self._deadlines.get(key)
+
+    def next_deadline(self) -> Optional[float]:
+        """最近的有效截止时间"""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[Hashable]:
+        """弹出所有截止时间 <= now 的 key（按截止时间顺序）"""
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(heap)
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                due.append(key)
+        return due
+
+    def _discard_stale(self):
+        """丢弃堆顶的过期条目"""
+        heap = self._heap
+        while heap and self._deadlines.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
@@ -0,0 +1,142 @@
+"""
+RizSimulator Session Log
+会话录制格式 - 只追加的二进制文件，按发生顺序记录带时间戳的输入事件
+
+文件结构:
+    文件头  <6sBQ   魔数 b"RIZSES", 版本, 随机种子
+    事件    <dIBH   时间(秒, 设备时钟), 设备ID, 事件类型, 负载长度，随后是负载
+"""
+
+import json
+import struct
+import uuid
+from dataclasses import dataclass
+from enum import IntEnum
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, List, Tuple, Union
+
+SESSION_MAGIC = b"RIZSES"
+SESSION_VERSION = 1
+
+_HEADER = struct.Struct("<6sBQ")
+_EVENT = struct.Struct("<dIBH")
+_INT = struct.Struct("<i")
+_DOUBLE = struct.Struct("<d")
+
+
+class SessionEvent(IntEnum):
+    """输入事件类型"""
+    CREATE = 1        # 创建设备
+    REMOVE = 2        # 移除设备
+    CONNECT = 3       # BLE连接
+    DISCONNECT = 4    # BLE断开
+    BLE_WRITE = 5     # BLE写入: (特征值UUID, 数据)
+    DISTANCE = 6      # TOF距离 (mm)
+    TOUCH = 7         # 模拟触碰
+    TICK = 8          # 仿真帧: 步长 (秒)
+    TRIGGER = 9       # GUI点击设备
+    APPLY_MODE = 10   # GUI应用游戏模式: (模式, 参数)
+    GAME_MODE = 11    # 直接执行游戏模式
+    ANIMATION = 12    # GUI触发动画: 动画类型
+    RESET_STATS = 13  # 重置统计
+    SIGNAL_MODEL = 14  # TOF信号模型参数 (空字典表示关闭信号流)
+    TARGET_MODEL = 15  # 雷达合成目标参数
+
+
+def _encode_ble_write(value: Tuple[str, bytes]) -> bytes:
+    characteristic_uuid, data = value
+    return uuid.UUID(characteristic_uuid).bytes + data
+
+
+def _decode_ble_write(payload: bytes) -> Tuple[str, bytes]:
+    return str(uuid.UUID(bytes=payload[:16])), payload[16:]
+
+
+def _encode_apply_mode(value: Tuple[int, dict]) -> bytes:
+    mode, params = value
+    return json.dumps([mode, params], separators=(',', ':')).encode('utf-8')
+
+
+def _decode_apply_mode(payload: bytes) -> Tuple[int, dict]:
+    mode, params = json.loads(payload)
+    return mode, params
+
+
+def _encode_json(value: Any) -> bytes:
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+# 事件类型 -> (编码, 解码)；无负载的事件不在表中
+_CODECS: Dict[SessionEvent, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    SessionEvent.BLE_WRITE: (_encode_ble_write, _decode_ble_write),
+    SessionEvent.DISTANCE: (_INT.pack, lambda p: _INT.unpack(p)[0]),
+    SessionEvent.TICK: (_DOUBLE.pack, lambda p: _DOUBLE.unpack(p)[0]),
+    SessionEvent.APPLY_MODE: (_encode_apply_mode, _decode_apply_mode),
+    SessionEvent.GAME_MODE: (_INT.pack, lambda p: _INT.unpack(p)[0]),
+    SessionEvent.ANIMATION: (str.encode, bytes.decode),
+    SessionEvent.SIGNAL_MODEL: (_encode_json, json.loads),
+    SessionEvent.TARGET_MODEL: (_encode_json, json.loads),
+}
+
+
+@dataclass
+class SessionRecord:
+    """一条录制事件"""
+    time: float
+    device_id: int
+    kind: SessionEvent
+    value: Any = None
+
+
+class SessionRecorder:
+    """会话录制器 - 事件按发生顺序追加写入，关闭时刷新"""
+
+    def __init__(self, path: Union[str, Path], seed: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file: BinaryIO = open(self.path, "wb")
+        self._file.write(_HEADER.pack(SESSION_MAGIC, SESSION_VERSION, seed))
+        self.event_count = 0
+
+    def record(self, kind: SessionEvent, time: float, device_id: int = 0, value: Any = None):
+        """追加一条事件"""
+        codec = _CODECS.get(kind)
+        payload = codec[0](value) if codec is not None else b""
+        self._file.write(_EVENT.pack(time, device_id, kind, len(payload)))
+        if payload:
+            self._file.write(payload)
+        self.event_count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_session(path: Union[str, Path]) -> Tuple[int, List[SessionRecord]]:
+    """读取会话文件，返回 (随机种子, 事件列表)；末尾不完整的事件（录制中断）被忽略"""
+    data = Path(path).read_bytes()
+    if len(data) < _HEADER.size:
+        raise ValueError(f"会话文件过短: {path}")
+    magic, version, seed = _HEADER.unpack_from(data)
+    if magic != SESSION_MAGIC:
+        raise ValueError(f"不是会话录制文件: {path}")
+    if version != SESSION_VERSION:
+        raise ValueError(f"不支持的会话文件版本: {version}")
+
+    records = []
+    offset = _HEADER.size
+    end = len(data)
+    while offset + _EVENT.size <= end:
+        time, device_id, kind, length = _EVENT.unpack_from(data, offset)
+        offset += _EVENT.size
+        if offset + length > end:
+            break
+        kind = SessionEvent(kind)
+        codec = _CODECS.get(kind)
+        value = codec[1](data[offset:offset + length]) if codec is not None else None
+        offset += length
+        records.append(SessionRecord(time, device_id, kind, value))
+    return seed, records
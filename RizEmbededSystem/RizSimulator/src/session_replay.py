@@ -0,0 +1,104 @@
+"""
+RizSimulator Session Replay
+会话重放 - 将录制的输入事件按原时间戳送回新的 DeviceManager，可按1×、N×或最快速度重放
+"""
+
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Union
+
+from clock import VirtualClock
+from device_manager import DeviceManager
+from session_log import SessionEvent, SessionRecord, read_session
+from tof_stream import SignalModel
+from mmwave import TargetModel
+from logger import get_logger
+
+logger = get_logger("SessionReplay")
+
+
+class SessionReplayer:
+    """会话重放器
+
+    重放使用虚拟时钟，每条事件执行前把时钟设到录制时的时间戳，并以录制时的随机种子创建设备管理器，
+    因此LED状态与触发结果与录制时完全一致。speed 只决定墙钟上的等待，不影响仿真结果。
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.seed, self.records = read_session(self.path)
+        # 每帧回调: (仿真时间, 本帧触发的设备ID)
+        self.tick_callback: Optional[Callable[[float, List[int]], None]] = None
+
+    @property
+    def duration(self) -> float:
+        """录制时长 (秒)"""
+        if not self.records:
+            return 0.0
+        return self.records[-1].time - self.records[0].time
+
+    def replay(self, speed: Optional[float] = None) -> DeviceManager:
+        """重放整个会话并返回重放后的设备管理器（speed 为None时不等待墙钟）"""
+        if speed is not None and speed <= 0:
+            raise ValueError(f"重放速度必须大于0: {speed}")
+
+        start_time = self.records[0].time if self.records else 0.0
+        clock = VirtualClock(start_time)
+        manager = DeviceManager(clock=clock, seed=self.seed)
+        wall_start = time.perf_counter()
+
+        for record in self.records:
+            if speed is not None:
+                wait = (record.time - start_time) / speed - (time.perf_counter() - wall_start)
+                if wait > 0:
+                    time.sleep(wait)
+            clock.set(record.time)
+            self._apply(manager, record)
+
+        wall_time = time.perf_counter() - wall_start
+        logger.info(f"会话重放完成: {len(self.records)} 个事件, 仿真 {self.duration:.1f}s, 耗时 {wall_time:.2f}s")
+        return manager
+
+    def _apply(self, manager: DeviceManager, record: SessionRecord):
+        """执行一条事件"""
+        kind = record.kind
+        device_id = record.device_id
+
+        if kind == SessionEvent.TICK:
+            fired = manager.update_all(record.value)
+            if self.tick_callback:
+                self.tick_callback(record.time, fired)
+        elif kind == SessionEvent.BLE_WRITE:
+            ble_server = manager.ble_servers.get(device_id)
+            if ble_server:
+                characteristic_uuid, data = record.value
+                ble_server.handle_write(characteristic_uuid, data)
+        elif kind == SessionEvent.DISTANCE:
+            manager.update_distance(device_id, record.value)
+        elif kind == SessionEvent.CREATE:
+            device = manager.create_device()
+            if device.device_id != device_id:
+                raise ValueError(f"重放设备ID不一致: 录制 {device_id}, 重放 {device.device_id}")
+        elif kind == SessionEvent.REMOVE:
+            manager.remove_device(device_id)
+        elif kind == SessionEvent.CONNECT:
+            manager.connect_device(device_id)
+        elif kind == SessionEvent.DISCONNECT:
+            manager.disconnect_device(device_id)
+        elif kind == SessionEvent.TOUCH:
+            manager.simulate_touch(device_id)
+        elif kind == SessionEvent.TRIGGER:
+            manager.trigger_device(device_id)
+        elif kind == SessionEvent.APPLY_MODE:
+            mode, params = record.value
+            manager.apply_game_mode(device_id, mode, params)
+        elif kind == SessionEvent.GAME_MODE:
+            manager.run_game_mode(device_id, record.value)
+        elif kind == SessionEvent.ANIMATION:
+            manager.start_animation(device_id, record.value)
+        elif kind == SessionEvent.RESET_STATS:
+            manager.reset_statistics()
+        elif kind == SessionEvent.SIGNAL_MODEL:
+            manager.set_signal_model(SignalModel(**record.value) if record.value else None)
+        elif kind == SessionEvent.TARGET_MODEL:
+            manager.set_target_model(TargetModel(**record.value))
@@ -0,0 +1,321 @@
+"""
+RizSimulator Session Store
+会话持久化 - 会话、设备、触发记录与模式切换写入 SQLite (WAL)。
+
+写入由后台线程独占的连接完成: 调用方只把整批列数组放入队列，写线程每 flush_interval 秒
+把期间到达的所有批次合并为一个事务提交 (group commit)，仿真帧不等待磁盘。
+查询使用调用线程自己的只读连接，WAL 模式下读写互不阻塞；只能读到已提交的数据，需要时先 flush。
+close() 关闭所有只读连接。写线程异常退出时唤醒所有等待的 flush，之后的写入与 flush 抛出该异常。
+"""
+
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from constants import STORE_FLUSH_INTERVAL
+from logger import get_logger
+
+logger = get_logger("SessionStore")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    athlete TEXT,
+    seed INTEGER,
+    started_at REAL,            -- 墙钟时间 (Unix 秒)
+    ended_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_athlete ON sessions (athlete, started_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_started ON sessions (started_at);
+
+CREATE TABLE IF NOT EXISTS devices (
+    session_id TEXT NOT NULL,
+    device_id INTEGER NOT NULL,
+    name TEXT,
+    mac TEXT,                   -- 跨会话识别同一设备
+    PRIMARY KEY (session_id, device_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_devices_mac ON devices (mac);
+
+CREATE TABLE IF NOT EXISTS triggers (
+    session_id TEXT NOT NULL,
+    device_id INTEGER NOT NULL,
+    mode INTEGER,
+    color INTEGER,              -- 0xRRGGBB
+    light_on_ns INTEGER,        -- 设备时钟
+    detect_ns INTEGER,
+    latency REAL,               -- 反应时间 (ms)，灯未点亮时为 NULL
+    distance INTEGER,
+    amplitude INTEGER,
+    sensor INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_triggers_device ON triggers (session_id, device_id, detect_ns);
+
+CREATE TABLE IF NOT EXISTS mode_changes (
+    session_id TEXT NOT NULL,
+    device_id INTEGER NOT NULL,
+    time REAL,                  -- 设备时钟 (秒)
+    mode INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_mode_changes_device ON mode_changes (session_id, device_id, time);
+"""
+
+_INSERT_SESSION = "INSERT OR REPLACE INTO sessions (id, athlete, seed, started_at) VALUES (?, ?, ?, ?)"
+_END_SESSION = "UPDATE sessions SET ended_at = ? WHERE id = ?"
+_INSERT_DEVICE = "INSERT OR REPLACE INTO devices VALUES (?, ?, ?, ?)"
+_INSERT_TRIGGER = "INSERT INTO triggers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_INSERT_MODE = "INSERT INTO mode_changes VALUES (?, ?, ?, ?)"
+
+_TRIGGER_COLUMNS = ('device_id', 'mode', 'light_on_ns', 'detect_ns', 'latency', 'distance', 'amplitude', 'sensor')
+
+_HISTORY_SELECT = """
+SELECT s.started_at, t.session_id, t.device_id, d.mac, t.mode, t.detect_ns, t.latency,
+       t.distance, t.amplitude, t.sensor
+FROM {source}
+JOIN triggers t ON t.session_id = d.session_id AND t.device_id = d.device_id
+WHERE {condition} AND s.started_at >= ? AND s.started_at < ?
+ORDER BY s.started_at, t.detect_ns
+"""
+_HISTORY_COLUMNS = ('started_at', 'session_id', 'device_id', 'mac', 'mode', 'detect_ns', 'latency',
+                    'distance', 'amplitude', 'sensor')
+_HISTORY_DTYPES = {'session_id': object, 'mac': object, 'started_at': np.float64, 'latency': np.float64}
+
+_CLOSE = object()
+
+# 队列项: (SQL, 各列)，列为等长的数组/列表或对所有行相同的标量，由写线程展开为行
+_Batch = Tuple[str, Tuple]
+
+
+def _rows(columns: Tuple) -> Iterable[tuple]:
+    return zip(*(column.tolist() if isinstance(column, np.ndarray) else
+                 column if isinstance(column, (list, tuple)) else itertools.repeat(column)
+                 for column in columns))
+
+
+class SessionStore:
+    """SQLite 会话存储（WAL + 后台线程组提交）"""
+
+    def __init__(self, path: Union[str, Path], flush_interval: float = STORE_FLUSH_INTERVAL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._readers = threading.local()
+        self._reader_connections: List[sqlite3.Connection] = []  # 所有线程的只读连接，close 时关闭
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._stopped = False  # 写线程已退出（不再处理队列）
+        self._writer = threading.Thread(target=self._run, name="SessionStoreWriter", daemon=True)
+        self._writer.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    # ===== 写入（任意线程，只入队） =====
+
+    def begin_session(self, seed: int = 0, athlete: Optional[str] = None,
+                      started_at: Optional[float] = None) -> str:
+        """新建会话，返回会话ID（started_at 默认为当前墙钟时间）"""
+        session_id = uuid.uuid4().hex
+        started_at = time.time() if started_at is None else started_at
+        self._put(_INSERT_SESSION, ([session_id], athlete, seed, started_at))
+        return session_id
+
+    def end_session(self, session_id: str, ended_at: Optional[float] = None):
+        self._put(_END_SESSION, ([time.time() if ended_at is None else ended_at], session_id))
+
+    def add_devices(self, session_id: str, devices: Sequence[Tuple[int, str, str]]):
+        """登记会话中的设备 [(device_id, name, mac)]"""
+        if devices:
+            device_ids, names, macs = zip(*devices)
+            self._put(_INSERT_DEVICE, (session_id, list(device_ids), list(names), list(macs)))
+
+    def add_triggers(self, session_id: str, columns: Dict[str, np.ndarray]):
+        """追加一批触发记录（列同 TriggerLog.columns，调用方不应再修改这些数组）"""
+        if len(columns['device_id']) == 0:
+            return
+        color = columns['color'].astype(np.int64)
+        packed = (color[:, 0] << 16) | (color[:, 1] << 8) | color[:, 2]
+        device_id, mode, light_on, detect, latency, distance, amplitude, sensor = (
+            columns[name] for name in _TRIGGER_COLUMNS)
+        self._put(_INSERT_TRIGGER, (session_id, device_id, mode, packed, light_on, detect,
+                                    latency, distance, amplitude, sensor))
+
+    def add_mode_changes(self, session_id: str, device_ids: np.ndarray, at: float, modes: np.ndarray):
+        """追加一批模式切换（同一时刻进入模式的设备）"""
+        if len(device_ids):
+            self._put(_INSERT_MODE, (session_id, device_ids, at, modes))
+
+    def _put(self, sql: str, columns: Tuple):
+        if self._error is not None:
+            raise self._error
+        if self._closed:
+            raise ValueError(f"会话存储已关闭: {self.path}")
+        self._queue.put((sql, columns))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待此前入队的数据提交，超时返回False；写线程异常退出时抛出其异常"""
+        done = threading.Event()
+        with self._lock:
+            if not self._stopped:
+                self._queue.put(done)
+            else:
+                done.set()
+        finished = done.wait(timeout)
+        if self._error is not None:
+            raise self._error
+        return finished
+
+    def close(self):
+        """提交剩余数据，结束写线程并关闭所有只读连接"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)
+        self._writer.join()
+        with self._lock:
+            for connection in self._reader_connections:
+                connection.close()
+            self._reader_connections.clear()
+        logger.info(f"关闭会话存储: {self.path} (写入 {self.rows_written} 行)")
+
+    # ===== 写线程 =====
+
+    def _run(self):
+        try:
+            connection = sqlite3.connect(self.path, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")  # WAL 下只在检查点时同步，掉电最多丢失最近的事务
+            connection.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            self._error = e
+            self._stopped = True
+            self._ready.set()
+            return
+        self._ready.set()
+
+        waiters: List[threading.Event] = []
+        try:
+            self._write_loop(connection, waiters)
+        except BaseException as e:
+            self._error = e
+            logger.error(f"会话存储写线程异常退出: {e!r}")
+        finally:
+            connection.close()
+            with self._lock:
+                self._stopped = True
+                while True:  # 唤醒本轮与仍在队列中的 flush 请求
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write_loop(self, connection: sqlite3.Connection, waiters: List[threading.Event]):
+        """收集批次并组提交，直到收到关闭请求（waiters 为本轮的 flush 请求，提交后清空）"""
+        running = True
+        while running:
+            batches: List[_Batch] = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _CLOSE:
+                    running = False
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break  # flush 请求立即提交
+                batches.append(item)
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            self._commit(connection, batches)
+            for waiter in waiters:
+                waiter.set()
+            waiters.clear()
+
+    def _commit(self, connection: sqlite3.Connection, batches: List[_Batch]):
+        """一个事务写入期间到达的所有批次"""
+        if not batches:
+            return
+        try:
+            connection.execute("BEGIN")
+            for sql, columns in batches:
+                self.rows_written += connection.executemany(sql, _rows(columns)).rowcount
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.error(f"会话存储写入失败，丢弃 {len(batches)} 批数据: {e}")
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+
+    # ===== 查询（调用线程的只读连接） =====
+
+    def _reader(self) -> sqlite3.Connection:
+        if self._closed:
+            raise ValueError(f"会话存储已关闭: {self.path}")
+        connection = getattr(self._readers, 'connection', None)
+        if connection is None:
+            # 只由创建它的线程查询，close() 在其他线程关闭，因此关闭同线程检查
+            connection = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True,
+                                         check_same_thread=False)
+            self._readers.connection = connection
+            with self._lock:
+                self._reader_connections.append(connection)
+        return connection
+
+    def _query_columns(self, sql: str, params: tuple) -> Dict[str, np.ndarray]:
+        rows = self._reader().execute(sql, params).fetchall()
+        columns = zip(*rows) if rows else [()] * len(_HISTORY_COLUMNS)
+        return {name: np.array(values, dtype=_HISTORY_DTYPES.get(name, np.int64))
+                for name, values in zip(_HISTORY_COLUMNS, columns)}
+
+    def device_history(self, mac: str, since: float = 0.0,
+                       until: float = float('inf')) -> Dict[str, np.ndarray]:
+        """某设备（按MAC识别）在 [since, until) 内开始的所有会话的触发记录，按时间排序"""
+        sql = _HISTORY_SELECT.format(source="devices d JOIN sessions s ON s.id = d.session_id",
+                                     condition="d.mac = ?")
+        return self._query_columns(sql, (mac, since, until))
+
+    def athlete_history(self, athlete: str, since: float = 0.0,
+                        until: float = float('inf')) -> Dict[str, np.ndarray]:
+        """某运动员在 [since, until) 内开始的所有会话的触发记录，按时间排序"""
+        sql = _HISTORY_SELECT.format(source="sessions s JOIN devices d ON d.session_id = s.id",
+                                     condition="s.athlete = ?")
+        return self._query_columns(sql, (athlete, since, until))
+
+    def sessions(self, athlete: Optional[str] = None) -> List[dict]:
+        """会话列表（按开始时间排序）及各会话的触发次数与平均反应时间"""
+        sql = ("SELECT s.id, s.athlete, s.seed, s.started_at, s.ended_at, "
+               "(SELECT COUNT(*) FROM triggers t WHERE t.session_id = s.id), "
+               "(SELECT AVG(latency) FROM triggers t WHERE t.session_id = s.id) "
+               "FROM sessions s" + (" WHERE s.athlete = ?" if athlete is not None else "") +
+               " ORDER BY s.started_at")
+        keys = ('id', 'athlete', 'seed', 'started_at', 'ended_at', 'triggers', 'average_reaction')
+        rows = self._reader().execute(sql, (athlete,) if athlete is not None else ()).fetchall()
+        return [dict(zip(keys, row)) for row in rows]
+
+    def mode_changes(self, session_id: str, device_id: Optional[int] = None) -> List[Tuple[int, float, int]]:
+        """会话中的模式切换 [(device_id, 时间, 模式)]"""
+        sql = "SELECT device_id, time, mode FROM mode_changes WHERE session_id = ?"
+        params: tuple = (session_id,)
+        if device_id is not None:
+            sql += " AND device_id = ?"
+            params += (device_id,)
+        return self._reader().execute(sql + " ORDER BY device_id, time", params).fetchall()
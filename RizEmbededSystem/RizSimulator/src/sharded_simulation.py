@@ -0,0 +1,304 @@
+"""
+RizSimulator Sharded Simulation
+多进程分片仿真 - 设备按分片分配到多个工作进程，每个分片的 FleetState 放在共享内存中，
+协调器按帧同步推进所有分片，读取LED状态时直接访问共享内存，无需序列化
+"""
+
+import argparse
+import gc
+import logging
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from clock import VirtualClock
+from fleet_state import FleetState, column_layout, columns_from_buffer
+from device_manager import DeviceManager
+from tof_stream import SignalModel
+from constants import SIM_STEP_SIZE, STATE_CONNECTED, STATE_ADVERTISING
+from logger import get_logger, set_log_level
+
+logger = get_logger("ShardedSimulation")
+
+
+def _shard_worker(conn: Connection, shm_name: str, capacity: int, first_id: int,
+                  device_count: int, seed: int, log_level: int,
+                  signal_model: Optional[SignalModel] = None):
+    """分片工作进程 - 在共享内存上运行一个 DeviceManager，按协调器命令推进"""
+    set_log_level(log_level)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    fleet = FleetState(capacity, columns=columns_from_buffer(shm.buf, capacity))
+    clock = VirtualClock()
+    manager = DeviceManager(max_devices=capacity, clock=clock, fleet=fleet, seed=seed,
+                            signal_model=signal_model)
+    manager.next_id = first_id
+    for _ in range(device_count):
+        manager.create_device()
+
+    def targets(device_id: Optional[int]) -> List[int]:
+        return list(manager.devices) if device_id is None else [device_id]
+
+    conn.send(None)
+    try:
+        while True:
+            command, args = conn.recv()
+            result = None
+
+            if command == "stop":
+                break
+            elif command == "step":
+                delta, = args
+                clock.advance(delta)
+                result = manager.update_all(delta)
+            elif command == "message":
+                device_id, message = args
+                for target in targets(device_id):
+                    manager.send_message_to_device(target, message)
+            elif command == "connect":
+                for target in targets(args[0]):
+                    manager.connect_device(target)
+            elif command == "disconnect":
+                for target in targets(args[0]):
+                    manager.disconnect_device(target)
+            elif command == "distance":
+                device_id, distance = args
+                for target in targets(device_id):
+                    manager.update_distance(target, distance)
+
+            conn.send(result)
+    finally:
+        # 共享内存上的数组视图全部释放后才能关闭映射
+        manager = fleet = None
+        gc.collect()
+        shm.close()
+        conn.close()
+
+
+@dataclass
+class _Shard:
+    """协调器侧的分片句柄"""
+    index: int
+    first_id: int
+    device_count: int
+    shm: shared_memory.SharedMemory
+    conn: Connection
+    process: multiprocessing.Process
+    columns: Dict[str, np.ndarray]  # 共享内存上的只读视图
+
+
+class ShardedSimulation:
+    """多进程分片仿真协调器
+
+    设备ID在分片间连续编号，分片 i 拥有 [first_id, first_id + device_count)。
+    step() 向所有分片广播推进命令后再统一收集结果，各分片在同一帧内并行计算。
+    step() 返回后所有分片都已空闲，此时读取共享内存得到的是一致的整帧状态。
+    分片内设备不支持增删，slot 即 device_id - first_id。
+    """
+
+    def __init__(self, device_count: int, shard_count: Optional[int] = None,
+                 step_size: float = SIM_STEP_SIZE, seed: int = 0,
+                 log_level: int = logging.WARNING, signal_model: Optional[SignalModel] = None):
+        if device_count <= 0:
+            raise ValueError(f"设备数必须大于0: {device_count}")
+        if step_size <= 0:
+            raise ValueError(f"仿真步长必须大于0: {step_size}")
+
+        shard_count = max(1, min(shard_count or os.cpu_count() or 1, device_count))
+        self.device_count = device_count
+        self.step_size = step_size
+        self.sim_time = 0.0
+        self.tick_count = 0
+        self.trigger_count = 0
+        self.shards: List[_Shard] = []
+
+        # spawn 避免在GUI进程中fork带线程的解释器
+        context = multiprocessing.get_context("spawn")
+        first_id = 1
+        try:
+            for index, count in enumerate(np.array_split(np.arange(device_count), shard_count)):
+                count = len(count)
+                _, nbytes = column_layout(count)
+                shm = shared_memory.SharedMemory(create=True, size=nbytes)
+                parent_conn, child_conn = context.Pipe()
+                process = context.Process(
+                    target=_shard_worker,
+                    args=(child_conn, shm.name, count, first_id, count, seed + index, log_level,
+                          signal_model),
+                    daemon=True,
+                )
+                process.start()
+                child_conn.close()
+
+                columns = columns_from_buffer(shm.buf, count)
+                for column in columns.values():
+                    column.flags.writeable = False
+                self.shards.append(_Shard(index, first_id, count, shm, parent_conn, process, columns))
+                first_id += count
+
+            for shard in self.shards:
+                shard.conn.recv()
+        except BaseException:
+            self.close()
+            raise
+
+        logger.info(f"分片仿真启动: {device_count} 个设备, {len(self.shards)} 个分片")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ===== 命令分发 =====
+
+    def _shard_of(self, device_id: int) -> _Shard:
+        """设备所在分片"""
+        for shard in self.shards:
+            if shard.first_id <= device_id < shard.first_id + shard.device_count:
+                return shard
+        raise KeyError(f"设备ID {device_id} 不存在")
+
+    def _call_all(self, command: str, *args) -> list:
+        """向所有分片发送命令并收集结果（先全部发送，各分片并行执行）"""
+        for shard in self.shards:
+            shard.conn.send((command, args))
+        return [shard.conn.recv() for shard in self.shards]
+
+    def _call(self, device_id: Optional[int], command: str, *args):
+        """device_id 为None时发往所有分片，否则只发往其所在分片"""
+        if device_id is None:
+            return self._call_all(command, None, *args)
+        shard = self._shard_of(device_id)
+        shard.conn.send((command, (device_id,) + args))
+        return shard.conn.recv()
+
+    # ===== 仿真推进 =====
+
+    def step(self, delta: Optional[float] = None) -> List[int]:
+        """所有分片推进一帧，返回本帧TOF检测触发的设备ID"""
+        delta = self.step_size if delta is None else delta
+        fired = [device_id for ids in self._call_all("step", delta) for device_id in ids]
+        self.sim_time += delta
+        self.tick_count += 1
+        self.trigger_count += len(fired)
+        return fired
+
+    def run(self, duration: float) -> dict:
+        """尽可能快地推进 duration 秒仿真时间，返回运行摘要"""
+        wall_start = time.perf_counter()
+        ticks = int(round(duration / self.step_size))
+        for _ in range(ticks):
+            self.step()
+        wall_time = time.perf_counter() - wall_start
+
+        sim_duration = ticks * self.step_size
+        return {
+            'shards': len(self.shards),
+            'ticks': ticks,
+            'sim_time': sim_duration,
+            'wall_time': wall_time,
+            'speedup': sim_duration / wall_time if wall_time > 0 else float('inf'),
+        }
+
+    # ===== BLE/传感器命令 =====
+
+    def broadcast(self, message: str):
+        """向所有设备发送BLE消息"""
+        self._call(None, "message", message)
+
+    def send_message(self, device_id: int, message: str):
+        """向单个设备发送BLE消息"""
+        self._call(device_id, "message", message)
+
+    def connect(self, device_id: Optional[int] = None):
+        """连接设备（None表示全部）"""
+        self._call(device_id, "connect")
+
+    def disconnect(self, device_id: Optional[int] = None):
+        """断开设备（None表示全部）"""
+        self._call(device_id, "disconnect")
+
+    def set_distance(self, device_id: Optional[int], distance: int):
+        """设置TOF距离 (mm)（None表示全部）"""
+        self._call(device_id, "distance", distance)
+
+    # ===== 共享内存读取 =====
+
+    def device_leds(self, device_id: int) -> np.ndarray:
+        """某设备48颗LED (48x3 只读视图，直接映射共享内存)"""
+        shard = self._shard_of(device_id)
+        return shard.columns['leds'][device_id - shard.first_id]
+
+    def column(self, name: str) -> List[np.ndarray]:
+        """各分片某一列的只读视图"""
+        return [shard.columns[name] for shard in self.shards]
+
+    def summary(self) -> dict:
+        """由共享内存直接统计的设备群摘要"""
+        led_on = sum(int(np.count_nonzero(c)) for c in self.column('led_on'))
+        conn_state = np.concatenate(self.column('conn_state'))
+        modes, mode_counts = np.unique(np.concatenate(self.column('mode')), return_counts=True)
+        return {
+            'total_devices': self.device_count,
+            'active_devices': led_on,
+            'connected': int(np.count_nonzero(conn_state == STATE_CONNECTED)),
+            'advertising': int(np.count_nonzero(conn_state == STATE_ADVERTISING)),
+            'by_mode': dict(zip(modes.tolist(), mode_counts.tolist())),
+            'total_triggers': self.trigger_count,
+            'sim_time': self.sim_time,
+        }
+
+    def close(self):
+        """停止所有工作进程并释放共享内存"""
+        for shard in self.shards:
+            try:
+                shard.conn.send(("stop", ()))
+            except (BrokenPipeError, OSError):
+                pass
+        for shard in self.shards:
+            shard.process.join(timeout=5)
+            if shard.process.is_alive():
+                shard.process.terminate()
+            shard.conn.close()
+            shard.columns = {}
+        gc.collect()
+        for shard in self.shards:
+            shard.shm.close()
+            shard.shm.unlink()
+        self.shards = []
+
+
+def main():
+    """无界面运行分片仿真并定期打印摘要"""
+    parser = argparse.ArgumentParser(description="RizSimulator 多进程分片仿真")
+    parser.add_argument("--devices", type=int, default=10000, help="设备数")
+    parser.add_argument("--shards", type=int, default=None, help="分片（进程）数，默认CPU核数")
+    parser.add_argument("--duration", type=float, default=10.0, help="仿真时长 (秒)")
+    parser.add_argument("--message", default="2", help="连接后广播的BLE消息")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--sample-rate", type=float, default=None,
+                        help="启用TF-Luna信号流并设置帧率 (Hz)，默认按距离阈值检测")
+    args = parser.parse_args()
+
+    signal_model = SignalModel(sample_rate=args.sample_rate) if args.sample_rate else None
+    with ShardedSimulation(args.devices, args.shards, seed=args.seed, signal_model=signal_model) as sim:
+        sim.connect()
+        sim.run(2.0)  # 等待连接动画结束
+        sim.broadcast(args.message)
+        sim.set_distance(None, 100)
+
+        seconds = int(args.duration)
+        for _ in range(seconds):
+            result = sim.run(1.0)
+            print(f"t={sim.sim_time:6.2f}s speedup={result['speedup']:6.1f}x {sim.summary()}")
+
+
+if __name__ == "__main__":
+    main()
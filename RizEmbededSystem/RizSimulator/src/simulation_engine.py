@@ -0,0 +1,153 @@
+"""
+RizSimulator Simulation Engine
+仿真引擎 - 不依赖PyQt驱动设备管理器，支持无界面快速仿真
+"""
+
+import time
+from enum import Enum
+from typing import Callable, List, Optional
+
+from clock import VirtualClock
+from device_manager import DeviceManager
+from constants import SIM_STEP_SIZE
+from logger import get_logger
+
+logger = get_logger("SimulationEngine")
+
+# 浮点累加误差容限 (秒)
+_TIME_EPSILON = 1e-9
+
+
+class SimulationMode(Enum):
+    """仿真运行模式"""
+    FIXED_STEP = "fixed_step"                    # 固定步长，按墙钟节拍推进
+    REAL_TIME = "real_time"                      # 可变步长，步长等于实际经过的墙钟时间
+    AS_FAST_AS_POSSIBLE = "as_fast_as_possible"  # 固定步长，不等待墙钟
+
+
+class SimulationEngine:
+    """仿真引擎
+
+    统一推进 DeviceManager 及其下的 DeviceController / TOFSensorController。
+    若设备管理器使用 VirtualClock，引擎每帧先推进虚拟时钟，从而实现确定性的超实时仿真。
+    非 REAL_TIME 模式的仿真时间与墙钟无关，设备管理器必须使用 VirtualClock（未传入时自动创建）。
+    GUI只是引擎的一个可选使用者：通过 add_tick_listener 注册回调即可在每帧后刷新显示。
+    """
+
+    def __init__(self, device_manager: Optional[DeviceManager] = None,
+                 mode: SimulationMode = SimulationMode.FIXED_STEP,
+                 step_size: float = SIM_STEP_SIZE):
+        if step_size <= 0:
+            raise ValueError(f"仿真步长必须大于0: {step_size}")
+
+        if device_manager is None:
+            clock = None if mode == SimulationMode.REAL_TIME else VirtualClock()
+            device_manager = DeviceManager(clock=clock)
+        elif mode != SimulationMode.REAL_TIME and not isinstance(device_manager.clock, VirtualClock):
+            raise ValueError(f"{mode.value} 模式要求设备管理器使用 VirtualClock，"
+                             f"当前为 {type(device_manager.clock).__name__}")
+
+        self.device_manager = device_manager
+        self.mode = mode
+        self.step_size = step_size
+
+        # 仿真时间
+        self.sim_time = 0.0
+        self.tick_count = 0
+        self.running = False
+
+        self._tick_listeners: List[Callable[[float], None]] = []
+        self._last_wall_time: Optional[float] = None
+
+    def add_tick_listener(self, callback: Callable[[float], None]):
+        """注册每帧回调，参数为本帧步长(秒)"""
+        self._tick_listeners.append(callback)
+
+    def remove_tick_listener(self, callback: Callable[[float], None]):
+        """移除每帧回调"""
+        if callback in self._tick_listeners:
+            self._tick_listeners.remove(callback)
+
+    def step(self, delta_time: Optional[float] = None) -> float:
+        """推进一帧，返回实际使用的步长"""
+        if delta_time is None:
+            delta_time = self._next_delta()
+
+        if isinstance(self.device_manager.clock, VirtualClock):
+            self.device_manager.clock.advance(delta_time)
+
+        self.device_manager.update_all(delta_time)
+
+        self.sim_time += delta_time
+        self.tick_count += 1
+
+        for callback in self._tick_listeners:
+            callback(delta_time)
+
+        return delta_time
+
+    def _next_delta(self) -> float:
+        """计算下一帧步长"""
+        if self.mode != SimulationMode.REAL_TIME:
+            return self.step_size
+
+        now = time.monotonic()
+        last = self._last_wall_time
+        self._last_wall_time = now
+        if last is None:
+            return self.step_size
+        return now - last
+
+    def run(self, duration: float) -> dict:
+        """运行指定的仿真时长（秒），返回运行摘要"""
+        if duration < 0:
+            raise ValueError(f"仿真时长不能为负: {duration}")
+
+        self.running = True
+        start_sim = self.sim_time
+        end_sim = start_sim + duration
+        start_ticks = self.tick_count
+        wall_start = time.monotonic()
+        self._last_wall_time = wall_start
+
+        logger.info(f"仿真开始: 模式={self.mode.value}, 时长={duration}s, "
+                    f"设备数={self.device_manager.get_device_count()}")
+
+        while self.running:
+            remaining = end_sim - self.sim_time
+            if remaining <= _TIME_EPSILON:
+                break
+
+            if self.mode == SimulationMode.AS_FAST_AS_POSSIBLE:
+                self.step(min(self.step_size, remaining))
+
+            elif self.mode == SimulationMode.FIXED_STEP:
+                # 按墙钟节拍推进，落后时连续补帧
+                target_wall = wall_start + (self.sim_time - start_sim)
+                wait = target_wall - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                self.step(min(self.step_size, remaining))
+
+            else:
+                time.sleep(self.step_size)
+                self.step(min(self._next_delta(), remaining))
+
+        self.running = False
+        wall_time = time.monotonic() - wall_start
+        sim_elapsed = self.sim_time - start_sim
+
+        summary = {
+            'mode': self.mode.value,
+            'ticks': self.tick_count - start_ticks,
+            'sim_time': sim_elapsed,
+            'wall_time': wall_time,
+            'speedup': sim_elapsed / wall_time if wall_time > 0 else float('inf'),
+        }
+        logger.info(f"仿真结束: {summary['ticks']} 帧, 仿真 {sim_elapsed:.2f}s, "
+                    f"耗时 {wall_time:.2f}s")
+        return summary
+
+    def stop(self):
+        """停止运行（可在tick回调中调用）"""
+        self.running = False
@@ -0,0 +1,101 @@
+"""
+RizSimulator Throughput Benchmark
+吞吐基准 - 测量 BLE接收队列每秒处理的写入数与会话存储每秒提交的触发记录数
+（墙钟计时，结果随机器负载变化，不在单元测试中断言）
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+from clock import VirtualClock
+from constants import INGEST_BATCH_SIZE, MANUAL_MODE
+from ble.ble_ingest import BLEIngestPipeline
+from device_manager import DeviceManager
+from session_store import SessionStore
+
+
+def ingest_throughput(devices: int = 100, rounds: int = 20, batch_size: int = INGEST_BATCH_SIZE) -> Dict:
+    """每个设备交替写入灭灯/亮灯命令 rounds 次，返回处理数与每秒写入数"""
+    manager = DeviceManager(clock=VirtualClock())
+    device_ids = [manager.create_device().device_id for _ in range(devices)]
+
+    async def drive():
+        pipeline = BLEIngestPipeline(manager, batch_size=batch_size)
+        pipeline.start()
+        start = time.perf_counter()
+        for i in range(rounds):
+            for device_id in device_ids:
+                await pipeline.put(device_id, b"13" if i % 2 == 0 else b"1")
+        await pipeline.close()
+        return pipeline, time.perf_counter() - start
+
+    pipeline, elapsed = asyncio.run(drive())
+    return {
+        "benchmark": "ingest",
+        "items": pipeline.processed,
+        "seconds": elapsed,
+        "per_second": pipeline.processed / elapsed,
+    }
+
+
+def trigger_batch(n: int, device_count: int = 3, seed: int = 0) -> Dict[str, np.ndarray]:
+    """生成一批随机触发记录（列同 TriggerLog.columns）"""
+    rng = np.random.default_rng(seed)
+    return {
+        'device_id': rng.integers(1, device_count + 1, n).astype(np.int32),
+        'mode': np.full(n, MANUAL_MODE, dtype=np.int32),
+        'color': rng.integers(0, 256, (n, 3)).astype(np.uint8),
+        'light_on_ns': np.arange(n, dtype=np.int64) * 1000,
+        'detect_ns': np.arange(n, dtype=np.int64) * 1000 + 500,
+        'latency': rng.uniform(100, 900, n),
+        'distance': rng.integers(0, 8000, n).astype(np.int32),
+        'amplitude': rng.integers(0, 1000, n).astype(np.int32),
+        'sensor': np.ones(n, dtype=np.int8),
+    }
+
+
+def store_throughput(batches: int = 200, batch_size: int = 1000,
+                     path: Optional[Union[str, Path]] = None) -> Dict:
+    """逐批写入触发记录直到全部提交，返回入队耗时与每秒提交的行数（path 为None时写入临时目录）"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = SessionStore(path if path is not None else Path(directory) / "sessions.db", flush_interval=0.05)
+        session_id = store.begin_session()
+        data = [trigger_batch(batch_size, seed=i) for i in range(batches)]
+
+        start = time.perf_counter()
+        for batch in data:
+            store.add_triggers(session_id, batch)
+        enqueued = time.perf_counter() - start
+        store.flush()
+        elapsed = time.perf_counter() - start
+        rows = store.sessions()[0]['triggers']
+        store.close()
+    return {
+        "benchmark": "store",
+        "items": rows,
+        "seconds": elapsed,
+        "enqueue_seconds": enqueued,
+        "per_second": rows / elapsed,
+    }
+
+
+def main():
+    """打印各项吞吐"""
+    parser = argparse.ArgumentParser(description="RizSimulator 吞吐基准")
+    parser.add_argument("--devices", type=int, default=100, help="接收队列基准的设备数")
+    parser.add_argument("--rounds", type=int, default=20, help="接收队列基准每个设备的写入数")
+    parser.add_argument("--batches", type=int, default=200, help="会话存储基准的批数（每批1000条触发记录）")
+    args = parser.parse_args()
+
+    for row in (ingest_throughput(args.devices, args.rounds), store_throughput(args.batches)):
+        print(f"{row['benchmark']:<10}{row['items']:>10} 条 {row['seconds']:>8.3f}s {row['per_second']:>12.0f} 条/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+RizSimulator TOF Batch Detection
+TOF批量检测内核 - 对整个设备群做一次向量化检测
+"""
+
+import numpy as np
+
+from fleet_state import FleetState
+from constants import CONSECUTIVE_READINGS
+
+
+def detect_batch(fleet: FleetState, now: float) -> np.ndarray:
+    """对所有设备执行一次TOF检测，返回本次触发的slot数组
+
+    与 TOFSensorController.check_detection 的单设备逻辑一致:
+    1. 冷却到期的设备解除冷却并清零连续计数
+    2. 检测激活且不在冷却期的设备: 振幅超过阈值则连续计数+1，否则清零
+    3. 连续计数达到 CONSECUTIVE_READINGS 的设备触发
+
+    触发后的冷却/统计/关灯由调用方逐个分发（只涉及触发的少数设备）。
+    """
+    n = fleet.size
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+
+    is_cooldown = fleet.is_cooldown[:n]
+    consecutive = fleet.consecutive[:n]
+
+    # 冷却到期
+    expired = is_cooldown & (fleet.cooldown_until[:n] <= now)
+    if expired.any():
+        is_cooldown[expired] = False
+        consecutive[expired] = 0
+
+    armed = fleet.in_use[:n] & fleet.detection_active[:n] & ~is_cooldown
+    above = fleet.amplitude[:n] > fleet.threshold[:n]
+
+    # 连续检测计数
+    np.add(consecutive, 1, out=consecutive, where=armed & above)
+    consecutive[armed & ~above] = 0
+
+    fired = np.flatnonzero(armed & (consecutive >= CONSECUTIVE_READINGS))
+    fleet.last_detection_time[fired] = now
+    return fired
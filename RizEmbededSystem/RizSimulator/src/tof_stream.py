@@ -0,0 +1,259 @@
+"""
+RizSimulator TOF Signal Stream
+TF-Luna 信号流 - 按传感器帧率为每个设备生成振幅帧，并逐帧送入固件动态基线检测器的移植版本
+（TF_Luna_UART::updateLidarData）。同一帧序号上所有设备的计算合并为一次向量化运算。
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+
+from fleet_state import FleetState
+from tof_uart import CaptureReplay
+from constants import (
+    TOF_SAMPLE_RATE, DYNAMIC_THRESHOLD_FACTOR, COOLDOWN_DURATION,
+    BASELINE_HISTORY_SIZE, MOVING_AVG_SIZE, BUFFER_AMPLITUDE_MIN, BUFFER_AMPLITUDE_MAX
+)
+
+# 越过阈值的百分比 (固件: (amplitude_threshold_factor - 1) * 100)
+_THRESHOLD_PERCENT = (DYNAMIC_THRESHOLD_FACTOR - 1) * 100.0
+
+
+@dataclass(frozen=True)
+class SignalModel:
+    """TF-Luna 振幅信号模型（振幅为传感器原始单位）"""
+    sample_rate: float = TOF_SAMPLE_RATE  # 帧率 (Hz)
+    ambient: float = 1000.0               # 无遮挡时的平均振幅
+    ambient_spread: float = 0.1           # 设备间环境振幅的相对差异
+    ambient_drift: float = 0.002          # 环境振幅随机游走 (相对值/√秒)
+    noise: float = 0.01                   # 每帧振幅噪声 (相对标准差)
+    hand_range: float = 500.0             # 手部开始影响振幅的距离 (mm)
+    hand_gain: float = 1.0                # 手部贴近时振幅的相对增量
+    approach_time: float = 0.03           # 振幅跟随手部移动的时间常数 (秒)
+
+    def __post_init__(self):
+        if self.sample_rate <= 0:
+            raise ValueError(f"帧率必须大于0: {self.sample_rate}")
+        if self.ambient <= 0:
+            raise ValueError(f"环境振幅必须大于0: {self.ambient}")
+        if self.hand_range <= 0 or self.approach_time <= 0:
+            raise ValueError("hand_range 与 approach_time 必须大于0")
+
+    @property
+    def period(self) -> float:
+        """帧间隔 (秒)"""
+        return 1.0 / self.sample_rate
+
+    def target(self, ambient: np.ndarray, distance: np.ndarray) -> np.ndarray:
+        """手在 distance (mm) 处时的稳态振幅"""
+        closeness = np.clip(1.0 - distance / self.hand_range, 0.0, 1.0)
+        return ambient * (1.0 + self.hand_gain * closeness)
+
+
+class TOFStream:
+    """设备群 TF-Luna 信号流与动态基线检测器
+
+    每个设备的检测周期对应固件一次 updateLidarData 调用: detection_active 置位时开始，
+    清空基线历史（基线值本身保留），之后按帧率逐帧处理:
+    1. 冷却结束后重新计数新帧，攒够 BASELINE_HISTORY_SIZE 帧且已处理帧数超过该值时重算动态基线
+    2. 振幅偏离基线的百分比超过阈值且不在冷却期: 重置冷却，下一帧确认触发（固件多读一帧后才置位）
+    3. 其余帧计入 framesProcessed，不在冷却期且振幅在有效范围内时写入环形缓冲
+    未激活检测的设备每个仿真帧只更新一次振幅用于显示。所有状态保存在 FleetState 的列中。
+    """
+
+    def __init__(self, fleet: FleetState, model: SignalModel, rng: np.random.Generator):
+        self.fleet = fleet
+        self.model = model
+        self.rng = rng
+        self._alpha = 1.0 - math.exp(-model.period / model.approach_time)  # 每帧的一阶跟随系数
+        self._last_time = None
+        self.sources: Dict[int, CaptureReplay] = {}  # slot -> 抓包回放，代替信号模型提供振幅
+
+    def step(self, now: float) -> np.ndarray:
+        """推进到 now，处理期间的全部传感器帧，返回本次触发的slot数组"""
+        fleet = self.fleet
+        slots = fleet.active_slots()
+        if len(slots) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        dt = 0.0 if self._last_time is None else max(0.0, now - self._last_time)
+        self._last_time = now
+        self._update_ambient(slots, dt)
+
+        # 检测周期开始/结束
+        armed = fleet.detection_active[slots]
+        started = slots[armed & ~fleet.tof_armed[slots]]
+        fleet.tof_armed[slots] = armed
+        if len(started):
+            self._start_cycle(started, now)
+
+        idle = slots[~armed]
+        if len(idle) and dt > 0:
+            self._update_idle(idle, dt, now)
+
+        active = slots[armed]
+        if len(active) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        # 每个设备到 now 为止的帧数（各设备帧相位不同）
+        period = self.model.period
+        first = fleet.tof_next_frame[active]
+        counts = np.maximum(np.floor((now - first) / period + 1e-9).astype(np.intp) + 1, 0)
+        fleet.tof_next_frame[active] = first + counts * period
+
+        running = np.ones(len(active), dtype=bool)
+        fired = []
+        for j in range(int(counts.max(initial=0))):
+            mask = running & (counts > j)
+            frame_fired = self._process_frame(active[mask], first[mask] + j * period)
+            if len(frame_fired):
+                fired.append(frame_fired)
+                running[np.isin(active, frame_fired)] = False
+
+        if not fired:
+            return np.empty(0, dtype=np.intp)
+        fired = np.concatenate(fired)
+        # 触发即结束本次检测周期（固件 updateLidarData 返回）
+        fleet.tof_armed[fired] = False
+        fleet.tof_pending[fired] = False
+        return fired
+
+    def moving_average(self, slots) -> tuple:
+        """滑动平均的 (距离mm, 振幅)，整数除法与固件 getMovingAverage 一致"""
+        slots = np.asarray(slots, dtype=np.intp)
+        fleet = self.fleet
+        return (fleet.dist_window[slots].sum(axis=-1) // MOVING_AVG_SIZE,
+                fleet.amp_window[slots].sum(axis=-1, dtype=np.int64) // MOVING_AVG_SIZE)
+
+    # ===== 信号模型 =====
+
+    def _update_ambient(self, slots: np.ndarray, dt: float):
+        """新设备初始化环境振幅，其余设备的环境振幅随机游走"""
+        fleet = self.fleet
+        model = self.model
+        new = slots[fleet.tof_ambient[slots] == 0]
+        if len(new):
+            spread = 1.0 + model.ambient_spread * self.rng.standard_normal(len(new))
+            fleet.tof_ambient[new] = np.maximum(model.ambient * spread, 1.0)
+            fleet.tof_level[new] = fleet.tof_ambient[new]
+        if dt > 0 and model.ambient_drift > 0:
+            drift = 1.0 + model.ambient_drift * math.sqrt(dt) * self.rng.standard_normal(len(slots))
+            fleet.tof_ambient[slots] = np.maximum(fleet.tof_ambient[slots] * drift, 1.0)
+
+    def _sample(self, slots: np.ndarray, alpha: float, times) -> np.ndarray:
+        """振幅向手部距离对应的稳态值跟随一步并叠加噪声，返回本帧振幅（回放抓包的设备取抓包帧）"""
+        fleet = self.fleet
+        model = self.model
+        level = fleet.tof_level[slots]
+        level += (model.target(fleet.tof_ambient[slots], fleet.distance[slots]) - level) * alpha
+        fleet.tof_level[slots] = level
+
+        noisy = level * (1.0 + model.noise * self.rng.standard_normal(len(slots)))
+        amplitude = np.clip(np.rint(noisy), 0, 0xFFFF).astype(np.int32)
+        if self.sources:
+            times = np.broadcast_to(times, len(slots))
+            for i in np.flatnonzero(np.isin(slots, list(self.sources))).tolist():
+                amplitude[i] = self.sources[int(slots[i])].amplitude_at(times[i])
+        fleet.amplitude[slots] = amplitude
+        return amplitude
+
+    def _update_idle(self, slots: np.ndarray, dt: float, now: float):
+        """未检测的设备: 整个仿真帧只采样一次"""
+        self._sample(slots, 1.0 - math.exp(-dt / self.model.approach_time), now)
+
+    # ===== 固件检测器 =====
+
+    def _start_cycle(self, slots: np.ndarray, now: float):
+        """开始检测周期: 清空基线历史与帧计数（冷却状态与基线值保留）"""
+        fleet = self.fleet
+        fleet.amp_history[slots] = 0
+        fleet.history_index[slots] = 0
+        fleet.history_filled[slots] = False
+        fleet.history_sum[slots] = 0
+        fleet.window_index[slots] = 0
+        fleet.tof_frames[slots] = 0
+        fleet.tof_pending[slots] = False
+        fleet.tof_next_frame[slots] = now
+
+        # 从未校准的设备先做一次基线校准（固件开机时的 takeBaseline）
+        uncalibrated = slots[fleet.baseline[slots] == 0]
+        if len(uncalibrated):
+            baseline = np.rint(fleet.tof_level[uncalibrated]).astype(np.int32)
+            for i, slot in enumerate(uncalibrated.tolist()):
+                if slot in self.sources:
+                    baseline[i] = self.sources[slot].amplitude_at(now)
+            self._set_baseline(uncalibrated, baseline)
+
+    def _set_baseline(self, slots: np.ndarray, baseline: np.ndarray):
+        fleet = self.fleet
+        baseline = np.maximum(baseline, 1)
+        fleet.baseline[slots] = baseline
+        fleet.threshold[slots] = (baseline * DYNAMIC_THRESHOLD_FACTOR).astype(np.int32)
+
+    def _dynamic_baseline(self, slots: np.ndarray) -> np.ndarray:
+        """computeDynamicBaseline: 环形缓冲均值，未填满时按已写入数量平均"""
+        fleet = self.fleet
+        count = np.where(fleet.history_filled[slots], BASELINE_HISTORY_SIZE, fleet.history_index[slots])
+        return np.where(count > 0, fleet.history_sum[slots] // np.maximum(count, 1), 0).astype(np.int32)
+
+    def _process_frame(self, slots: np.ndarray, times: np.ndarray) -> np.ndarray:
+        """对一组设备各处理一帧，返回本帧确认触发的slot"""
+        fleet = self.fleet
+        amplitude = self._sample(slots, self._alpha, times)
+        cooldown = fleet.cooldown_until[slots] > times
+
+        # 冷却结束后重新计数新帧
+        fresh = fleet.tof_fresh[slots]
+        fresh[fleet.tof_was_cooldown[slots] & ~cooldown] = 0
+        fresh += ~cooldown & (fresh < BASELINE_HISTORY_SIZE)
+        fleet.tof_fresh[slots] = fresh
+        fleet.tof_was_cooldown[slots] = cooldown
+
+        # 上一帧已越过阈值的设备在本帧确认触发
+        pending = fleet.tof_pending[slots]
+        live = ~pending
+
+        refresh = (live & ~cooldown & (fleet.tof_frames[slots] > BASELINE_HISTORY_SIZE)
+                   & (fresh >= BASELINE_HISTORY_SIZE))
+        if refresh.any():
+            self._set_baseline(slots[refresh], self._dynamic_baseline(slots[refresh]))
+
+        baseline = np.maximum(fleet.baseline[slots], 1)
+        percent = (amplitude - baseline) / baseline * 100.0
+
+        crossed = live & ~cooldown & (np.abs(percent) > _THRESHOLD_PERCENT)
+        if crossed.any():
+            fleet.tof_pending[slots[crossed]] = True
+            fleet.cooldown_until[slots[crossed]] = times[crossed] + COOLDOWN_DURATION / 1000
+
+        normal = live & ~crossed
+        fleet.tof_frames[slots[normal]] += 1
+        buffered = (normal & ~cooldown & (amplitude >= BUFFER_AMPLITUDE_MIN)
+                    & (amplitude <= BUFFER_AMPLITUDE_MAX))
+        if buffered.any():
+            self._push(slots[buffered], amplitude[buffered])
+
+        fleet.last_detection_time[slots[pending]] = times[pending]
+        return slots[pending]
+
+    def _push(self, slots: np.ndarray, amplitude: np.ndarray):
+        """updateBuffers: 写入基线历史与滑动平均缓冲并维护累加和
+
+        固件的 oldestIndex 在缓冲填满后始终等于 historyIndex，这里直接用写入位置取出被覆盖的值。
+        """
+        fleet = self.fleet
+        index = fleet.history_index[slots]
+        filled = fleet.history_filled[slots]
+        evicted = np.where(filled, fleet.amp_history[slots, index], 0)
+        fleet.history_sum[slots] += amplitude - evicted
+        fleet.amp_history[slots, index] = amplitude
+        index = (index + 1) % BASELINE_HISTORY_SIZE
+        fleet.history_index[slots] = index
+        fleet.history_filled[slots] = filled | (index == 0)
+
+        window = fleet.window_index[slots]
+        fleet.amp_window[slots, window] = amplitude
+        fleet.dist_window[slots, window] = fleet.distance[slots]
+        fleet.window_index[slots] = (window + 1) % MOVING_AVG_SIZE
@@ -0,0 +1,184 @@
+"""
+RizSimulator TF-Luna UART Capture
+TF-Luna 串口抓包解析 - 从原始UART数据中批量提取9字节帧，并可按帧率回放到设备
+
+帧格式 (TF_Luna_UART::parseFrame):
+    0x59 0x59 | 距离 u16 (cm) | 振幅 u16 | 温度 u16 (/8 - 256 ℃) | 校验和 (前8字节之和的低8位)
+"""
+
+import mmap
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from constants import TOF_SAMPLE_RATE
+
+FRAME_SIZE = 9
+FRAME_HEADER = 0x59
+CHUNK_SIZE = 16 * 1024 * 1024  # 每次向量化扫描的字节数，限制临时数组大小
+
+
+@dataclass(frozen=True, eq=False)
+class TOFFrames:
+    """解析出的帧（各列等长）"""
+    offset: np.ndarray       # 帧在抓包中的字节偏移 (int64)
+    distance: np.ndarray     # 距离 (cm, uint16)
+    amplitude: np.ndarray    # 振幅 (uint16)
+    temperature: np.ndarray  # 温度 (℃, int16，与固件相同的整数除法)
+    checksum_errors: int     # 帧头正确但校验失败、且不在有效帧内的候选数
+
+    def __len__(self) -> int:
+        return len(self.offset)
+
+
+def _resolve_overlaps(positions: np.ndarray, frame_size: int = FRAME_SIZE) -> np.ndarray:
+    """有效帧互相重叠时（载荷中恰好出现帧头且校验碰巧通过）按顺序贪心保留，返回保留掩码"""
+    keep = np.ones(len(positions), dtype=bool)
+    conflicts = np.flatnonzero(np.diff(positions) < frame_size)
+    if len(conflicts) == 0:
+        return keep
+
+    last_end = -1
+    previous = -2
+    for index in np.unique(np.concatenate([conflicts, conflicts + 1])).tolist():
+        if index != previous + 1:
+            last_end = -1  # 新的冲突段，前一帧与本帧不重叠
+        previous = index
+        if positions[index] < last_end:
+            keep[index] = False
+        else:
+            last_end = positions[index] + frame_size
+    return keep
+
+
+def _words(data: np.ndarray) -> np.ndarray:
+    """每个字节偏移处开始的8字节小端整数（步长为1的非对齐视图，不拷贝）"""
+    return np.ndarray((len(data) - 7,), dtype='<u8', buffer=data, strides=(1,))
+
+
+def _checksum(columns: np.ndarray) -> np.ndarray:
+    """前8字节逐列相加，uint8 自然取低8位"""
+    checksum = columns[:, 0] + columns[:, 1]
+    for i in range(2, 8):
+        checksum += columns[:, i]
+    return checksum
+
+
+def _scan_synchronized(data: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """快速路径: 整段数据是首帧起连续排列的有效帧时，按步长9直接校验，无需逐字节搜索帧头"""
+    head = data[:FRAME_SIZE + 1]
+    starts = np.flatnonzero((head[:-1] == FRAME_HEADER) & (head[1:] == FRAME_HEADER))
+    if len(starts) == 0:
+        return None
+
+    first = int(starts[0])
+    count = (len(data) - first) // FRAME_SIZE
+    rows = np.ndarray((count, FRAME_SIZE), dtype=np.uint8, buffer=data, offset=first,
+                      strides=(FRAME_SIZE, 1))
+    if not ((rows[:, 0] == FRAME_HEADER) & (rows[:, 1] == FRAME_HEADER)
+            & (_checksum(rows) == rows[:, 8])).all():
+        return None
+    words = np.ndarray((count,), dtype='<u8', buffer=data, offset=first, strides=(FRAME_SIZE,))
+    return first + FRAME_SIZE * np.arange(count, dtype=np.int64), words.copy()
+
+
+def _scan(data: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+    """扫描一段数据，返回 (有效帧起点, 有效帧前8字节 (u64), 校验失败数)"""
+    limit = len(data) - FRAME_SIZE + 1
+    if limit <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64), 0
+
+    synchronized = _scan_synchronized(data)
+    if synchronized is not None:
+        return synchronized[0], synchronized[1], 0
+
+    candidates = np.flatnonzero((data[:limit] == FRAME_HEADER) & (data[1:limit + 1] == FRAME_HEADER))
+    words = _words(data)[candidates]
+
+    valid = _checksum(words.view(np.uint8).reshape(-1, 8)) == data[candidates + 8]
+
+    positions = candidates[valid]
+    keep = _resolve_overlaps(positions)
+    positions = positions[keep]
+
+    # 校验失败且不落在任何有效帧内的候选才算错误（有效帧载荷中出现的 0x59 0x59 不计）
+    bad = candidates[~valid]
+    covered = np.zeros(len(bad), dtype=bool)
+    if len(positions):
+        owner = np.maximum(np.searchsorted(positions, bad, side='right') - 1, 0)
+        covered = (positions[owner] <= bad) & (bad < positions[owner] + FRAME_SIZE)
+    return positions, words[valid][keep], int(np.count_nonzero(~covered))
+
+
+def parse_frames(buffer, chunk_size: int = CHUNK_SIZE) -> TOFFrames:
+    """解析 bytes / memoryview / mmap 中的全部帧（按块扫描，不拷贝原始数据）"""
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    size = len(data)
+    offsets: List[np.ndarray] = []
+    chunks: List[np.ndarray] = []
+    errors = 0
+
+    start = 0
+    while size - start >= FRAME_SIZE:
+        end = min(start + chunk_size, size)
+        positions, words, chunk_errors = _scan(data[start:end])
+        offsets.append(positions + start)
+        chunks.append(words)
+        errors += chunk_errors
+        if end == size:
+            break
+        # 最后不完整的帧留给下一块；下一块不能从已保留的帧中间开始
+        next_start = end - FRAME_SIZE + 1
+        if len(positions):
+            next_start = max(next_start, start + int(positions[-1]) + FRAME_SIZE)
+        start = next_start
+    del data
+
+    offset = np.concatenate(offsets) if offsets else np.empty(0, dtype=np.int64)
+    words = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.uint64)
+    # 每帧前8字节按小端u16拆为: 帧头, 距离, 振幅, 温度
+    fields = words.view('<u2').reshape(-1, 4)
+    return TOFFrames(
+        offset=offset.astype(np.int64),
+        distance=fields[:, 1].copy(),
+        amplitude=fields[:, 2].copy(),
+        temperature=(fields[:, 3] >> 3).astype(np.int16) - 256,
+        checksum_errors=errors,
+    )
+
+
+def read_capture(path: Union[str, Path], chunk_size: int = CHUNK_SIZE) -> TOFFrames:
+    """用 mmap 解析抓包文件"""
+    path = Path(path)
+    if path.stat().st_size == 0:
+        return parse_frames(b"")
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return parse_frames(mapped, chunk_size)
+
+
+class CaptureReplay:
+    """按传感器帧率回放抓包帧（第 i 帧在 start_time + i / sample_rate 时刻到达）"""
+
+    def __init__(self, frames: TOFFrames, start_time: float, sample_rate: float = TOF_SAMPLE_RATE):
+        if len(frames) == 0:
+            raise ValueError("抓包中没有有效帧")
+        if sample_rate <= 0:
+            raise ValueError(f"帧率必须大于0: {sample_rate}")
+        self.frames = frames
+        self.start_time = start_time
+        self.sample_rate = sample_rate
+
+    @property
+    def end_time(self) -> float:
+        """最后一帧的到达时间"""
+        return self.start_time + (len(self.frames) - 1) / self.sample_rate
+
+    def index_at(self, times):
+        """各时刻已到达的最新帧序号（开始前为0，结束后停在最后一帧）"""
+        index = np.floor((np.asarray(times) - self.start_time) * self.sample_rate + 1e-9).astype(np.intp)
+        return np.clip(index, 0, len(self.frames) - 1)
+
+    def amplitude_at(self, times) -> np.ndarray:
+        return self.frames.amplitude[self.index_at(times)].astype(np.int32)
@@ -0,0 +1,211 @@
+"""
+RizSimulator Trigger Log
+触发日志 - 每次检测触发追加一行的列式存储（各列为按倍数扩容的NumPy数组），
+分组统计对整列排序后用 reduceat 一次完成，不逐行循环；可导出为 CSV / NPZ / Parquet
+"""
+
+import math
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from constants import TRIGGER_LOG_INITIAL_CAPACITY
+from logger import get_logger
+
+logger = get_logger("TriggerLog")
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+SENSOR_TOF = 1      # 与 sensor_mode 一致: 1=LiDAR
+SENSOR_MMWAVE = 2   # 2=MMWave
+
+# 列定义: (名称, 每行形状, dtype, 默认值)
+_COLUMNS = (
+    ('device_id', (), np.int32, 0),
+    ('mode', (), np.int32, -1),           # 点亮时的游戏模式 (-1 表示未知)
+    ('color', (3,), np.uint8, 0),         # 检测时第一颗点亮的LED颜色
+    ('light_on_ns', (), np.int64, -1),    # 点亮时间 (纳秒, 设备时钟)，-1 表示触发时灯未点亮
+    ('detect_ns', (), np.int64, 0),       # 检测时间 (纳秒, 设备时钟，触发帧的时间戳)
+    ('latency', (), np.float64, np.nan),  # 反应时间 (ms)，灯未点亮时为 NaN
+    ('distance', (), np.int32, 0),        # 检测距离 (mm)
+    ('amplitude', (), np.int32, 0),       # TOF振幅 / 雷达信号强度
+    ('sensor', (), np.int8, 0),           # SENSOR_TOF / SENSOR_MMWAVE
+)
+
+# 可分组的列（time 按检测时间分桶）
+_GROUP_KEYS = ('device_id', 'mode', 'sensor', 'time')
+
+
+class TriggerLog:
+    """只追加的列式触发日志
+
+    每列预留 capacity 行，写满时倍增，追加为均摊O(1)。column / columns 返回有效区间的视图，
+    扩容后旧视图不再更新，因此不应长期持有。
+    """
+
+    def __init__(self, capacity: int = TRIGGER_LOG_INITIAL_CAPACITY):
+        self.count = 0
+        self.capacity = 0
+        for name, shape, dtype, _ in _COLUMNS:
+            setattr(self, '_' + name, np.zeros((0,) + shape, dtype=dtype))
+        self._resize(max(1, capacity))
+
+    def _resize(self, capacity: int):
+        for name, shape, dtype, _ in _COLUMNS:
+            old = getattr(self, '_' + name)
+            new = np.zeros((capacity,) + shape, dtype=dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, '_' + name, new)
+        self.capacity = capacity
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, device_id: int, mode: int, color: Tuple[int, int, int], light_on_ns: int,
+               detect_ns: int, latency: Optional[float], distance: int, amplitude: int, sensor: int):
+        """追加一次触发（latency 为None表示灯未点亮）"""
+        if self.count == self.capacity:
+            self._resize(self.capacity * 2)
+        i = self.count
+        self._device_id[i] = device_id
+        self._mode[i] = mode
+        self._color[i] = color
+        self._light_on_ns[i] = light_on_ns
+        self._detect_ns[i] = detect_ns
+        self._latency[i] = np.nan if latency is None else latency
+        self._distance[i] = distance
+        self._amplitude[i] = amplitude
+        self._sensor[i] = sensor
+        self.count += 1
+
+    def extend(self, columns: Dict[str, np.ndarray]):
+        """批量追加（各列等长，缺少的列填默认值）"""
+        n = len(columns['device_id'])
+        if self.count + n > self.capacity:
+            capacity = self.capacity
+            while capacity < self.count + n:
+                capacity *= 2
+            self._resize(capacity)
+        for name, _, _, default in _COLUMNS:
+            getattr(self, '_' + name)[self.count:self.count + n] = columns.get(name, default)
+        self.count += n
+
+    def clear(self):
+        self.count = 0
+
+    def column(self, name: str) -> np.ndarray:
+        """某列的有效区间（视图）"""
+        return getattr(self, '_' + name)[:self.count]
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """所有列的有效区间（视图）"""
+        return {name: self.column(name) for name, _, _, _ in _COLUMNS}
+
+    def group_by(self, by: str, bucket: Optional[float] = None,
+                 where: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """按列分组统计触发次数与反应时间
+
+        by 为 device_id / mode / sensor，或 time（按检测时间每 bucket 秒分桶，key 为桶开始时刻；
+        宽度取整到纳秒，不足1纳秒时报错）；where 为可选的行掩码。返回各组的 key、count（触发次数）、reactions（有反应时间的次数）
+        与反应时间的 mean / min / max (ms，组内没有反应时间时为 NaN)。
+        """
+        if by not in _GROUP_KEYS:
+            raise ValueError(f"不支持的分组列: {by}，可选 {_GROUP_KEYS}")
+        if by == 'time':
+            width_ns = round(bucket * 1e9) if bucket is not None and math.isfinite(bucket) else 0
+            if width_ns < 1:
+                raise ValueError(f"按时间分组需要至少1纳秒的分桶宽度 (秒): {bucket}")
+            keys = self.column('detect_ns') // width_ns
+        else:
+            keys = self.column(by)
+        latency = self.column('latency')
+        if where is not None:
+            keys, latency = keys[where], latency[where]
+
+        if len(keys) == 0:
+            starts = np.zeros(0, dtype=np.intp)
+        else:
+            # 键的取值范围不超过16位时按 uint16 排序（NumPy 对16位整数使用基数排序，O(n)）
+            low = keys.min()
+            if keys.max() - low < 1 << 16:
+                order = np.argsort((keys - low).astype(np.uint16), kind='stable')
+            else:
+                order = np.argsort(keys, kind='stable')
+            keys, latency = keys[order], latency[order]
+            starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        valid = ~np.isnan(latency)
+        counts = np.diff(np.append(starts, len(keys)))
+
+        if len(starts):
+            reactions = np.add.reduceat(valid.astype(np.int64), starts)
+            total = np.add.reduceat(np.where(valid, latency, 0.0), starts)
+            fastest = np.fmin.reduceat(latency, starts)
+            slowest = np.fmax.reduceat(latency, starts)
+        else:
+            reactions = np.zeros(0, dtype=np.int64)
+            total = fastest = slowest = np.zeros(0)
+        mean = np.divide(total, reactions, out=np.full(len(starts), np.nan), where=reactions > 0)
+
+        group_keys = keys[starts]
+        if by == 'time':
+            group_keys = group_keys * (width_ns / 1e9)
+        return {'key': group_keys, 'count': counts, 'reactions': reactions,
+                'mean': mean, 'min': fastest, 'max': slowest}
+
+    # ===== 导出 =====
+
+    def _flat_columns(self) -> Dict[str, np.ndarray]:
+        """颜色拆为 color_r / color_g / color_b 三列"""
+        columns = self.columns()
+        color = columns.pop('color')
+        for i, channel in enumerate('rgb'):
+            columns[f'color_{channel}'] = color[:, i]
+        return columns
+
+    def export(self, path: Union[str, Path]):
+        """按扩展名导出 (.csv / .npz / .parquet)"""
+        path = Path(path)
+        exporters = {'.csv': self.to_csv, '.npz': self.to_npz, '.parquet': self.to_parquet}
+        exporter = exporters.get(path.suffix.lower())
+        if exporter is None:
+            raise ValueError(f"不支持的导出格式: {path.suffix}，可选 {tuple(exporters)}")
+        exporter(path)
+
+    def to_csv(self, path: Union[str, Path]):
+        """导出为CSV（灯未点亮时反应时间为 nan）"""
+        columns = self._flat_columns()
+        table = np.empty(self.count, dtype=[(name, column.dtype) for name, column in columns.items()])
+        for name, column in columns.items():
+            table[name] = column
+        fmt = ['%.6f' if column.dtype.kind == 'f' else '%d' for column in columns.values()]
+        with open(path, 'w', newline='') as f:
+            np.savetxt(f, table, fmt=fmt, delimiter=',', header=','.join(columns), comments='')
+        logger.info(f"导出 {self.count} 条触发记录: {path}")
+
+    def to_npz(self, path: Union[str, Path]):
+        """导出为压缩的NPZ（保持各列原始dtype，可由 load_npz 读回）"""
+        np.savez_compressed(path, **self.columns())
+        logger.info(f"导出 {self.count} 条触发记录: {path}")
+
+    def to_parquet(self, path: Union[str, Path]):
+        """导出为Parquet（需要 pyarrow）"""
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("pyarrow未安装，无法导出Parquet。运行: pip install pyarrow")
+        table = pyarrow.table(self._flat_columns())
+        pyarrow.parquet.write_table(table, str(path))
+        logger.info(f"导出 {self.count} 条触发记录: {path}")
+
+    @classmethod
+    def load_npz(cls, path: Union[str, Path]) -> 'TriggerLog':
+        """读取 to_npz 导出的文件"""
+        with np.load(path) as data:
+            columns = {name: data[name] for name, _, _, _ in _COLUMNS}
+        log = cls(capacity=max(1, len(columns['device_id'])))
+        log.extend(columns)
+        return log
@@ -74,10 +74,9 @@ class DeviceWidget(QWidget):
         """更新显示"""
         # 更新LED
         if self.device.led_state.is_on:
-            # 使用内圈第一个LED的颜色（简化版）
-            if self.device.led_state.inner_ring:
-                color = self.device.led_state.inner_ring[0]
-                self.led_widget.set_all_leds(color)
+            # 逐像素显示（动画帧按LED变化）
+            led_state = self.device.led_state
+            self.led_widget.set_rings(led_state.inner_ring, led_state.outer_ring)
         else:
             self.led_widget.clear()
 
@@ -4,7 +4,7 @@ LED Ring Widget
 """
 
 import math
-from typing import Tuple
+from typing import List, Tuple
 from PyQt6.QtWidgets import QWidget
 from PyQt6.QtCore import Qt, QPointF, QRectF, pyqtSignal
 from PyQt6.QtGui import QPainter, QColor, QPen, QBrush, QRadialGradient
@@ -42,6 +42,13 @@ class LEDRingWidget(QWidget):
         self.is_on = any(c != (0, 0, 0) for c in self.inner_ring_colors + self.outer_ring_colors)
         self.update()
 
+    def set_rings(self, inner_colors: List[Tuple[int, int, int]], outer_colors: List[Tuple[int, int, int]]):
+        """逐颗设置内外圈颜色"""
+        self.inner_ring_colors = list(inner_colors)
+        self.outer_ring_colors = list(outer_colors)
+        self.is_on = any(c != (0, 0, 0) for c in self.inner_ring_colors + self.outer_ring_colors)
+        self.update()
+
     def set_inner_ring(self, color: Tuple[int, int, int]):
         """设置内圈颜色"""
         self.inner_ring_colors = [color] * INNER_RING_COUNT
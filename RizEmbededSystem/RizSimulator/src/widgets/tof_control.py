@@ -180,7 +180,7 @@ class TOFControlWidget(QWidget):
         self.distance_value_label.setText(f"{tof.distance} mm")
 
         # 更新振幅
-        self.amplitude_label.setText(str(tof.amplitude))
+        self.amplitude_label.setText(f"{tof.amplitude} (均值 {tof.smoothed_amplitude})")
         if tof.amplitude > AMPLITUDE_THRESHOLD:
             self.amplitude_label.setStyleSheet("font-weight: bold; color: red;")
         else:
@@ -229,6 +229,7 @@ class TOFControlWidget(QWidget):
         """重置基线"""
         if self.device:
             self.device.tof_state.baseline_history.clear()
+            self.device.tof_state.amplitude_window.clear()
             self.device.tof_state.baseline = 0
             self.update_display()
 
@@ -0,0 +1,43 @@
+"""
+RizSimulator Window Mode
+窗口模式 (docs/PRD_Window_Mode.md) - 橙色等待区之后是绿色最佳窗口，只有窗口内的检测有效。
+
+检测时刻取传感器帧的时间戳（TF-Luna / 雷达帧在两次仿真步之间的实际时刻，手动触碰为时钟读数），
+与窗口边界按秒级浮点数比较，不受仿真步长（GUI 16ms）影响。倒计时结束在每帧的传感器检测之后批量处理，
+因此同一帧内早于结束时刻的检测仍计为命中。
+"""
+
+import numpy as np
+
+from fleet_state import FleetState
+from constants import WINDOW_TOTAL_MIN, WINDOW_TOTAL_MAX, WINDOW_GOOD_MIN
+
+WINDOW_EARLY = 0    # 等待区内触发 (window_miss)，倒计时继续
+WINDOW_HIT = 1      # 最佳窗口内触发 (window)
+WINDOW_LATE = 2     # 倒计时结束后才触发或未触发 (window_timeout)
+
+WINDOW_MESSAGES = {
+    WINDOW_EARLY: "window_miss",
+    WINDOW_HIT: "window",
+    WINDOW_LATE: "window_timeout",
+}
+
+
+def validate_window(total: int, good: int):
+    """固件参数验证: 总时长 2000-10000ms，最佳窗口不小于1000ms且小于总时长"""
+    if not WINDOW_TOTAL_MIN <= total <= WINDOW_TOTAL_MAX:
+        raise ValueError(f"窗口模式总时长超出范围 [{WINDOW_TOTAL_MIN}, {WINDOW_TOTAL_MAX}]: {total}")
+    if good < WINDOW_GOOD_MIN or good >= total:
+        raise ValueError(f"最佳窗口时长必须在 [{WINDOW_GOOD_MIN}, {total}) 内: {good}")
+
+
+def classify(times, good_start, end) -> np.ndarray:
+    """按检测时刻分类: 早于 good_start 为过早，[good_start, end] 为命中，晚于 end 为超时"""
+    times = np.asarray(times, dtype=np.float64)
+    return np.where(times < good_start, WINDOW_EARLY, np.where(times <= end, WINDOW_HIT, WINDOW_LATE))
+
+
+def expired_slots(fleet: FleetState, now: float) -> np.ndarray:
+    """倒计时已结束但尚未处理的设备"""
+    n = fleet.size
+    return np.flatnonzero(fleet.win_active[:n] & (fleet.win_end[:n] < now))
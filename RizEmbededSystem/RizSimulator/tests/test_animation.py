@@ -0,0 +1,258 @@
+"""
+Test Animation Compiler
+动画帧表测试
+"""
+
+import math
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from animation import compile_animation, AnimationPlayer, INIT_COLOR_RANGES
+from clock import VirtualClock
+from constants import (
+    ANIMATION_CACHE_SIZE, CONFIG_BUZZER_TIME, COLOR_TENNIS, REST_READY_BUZZER_TIME, COLOR_WHITE, COLOR_ORANGE, COLOR_NEON_GREEN, COLOR_RANDOM_OUTER,
+    COLOR_CHERRY_RED, RANDOM_WIPE_STEP, RANDOM_MODE, RHYTHM_MODE, TIMED_MODE
+)
+from device_manager import DeviceManager
+from fleet_state import FleetState
+from simulation_engine import SimulationEngine, SimulationMode
+
+
+def test_tables_cached_by_parameters():
+    """测试同参数共享同一张帧表"""
+    assert compile_animation("rest", 480) is compile_animation("rest", 480)
+    assert compile_animation("rest", 480) is not compile_animation("rest", 240)
+    assert compile_animation("init", 3) is not compile_animation("init", 4)
+
+
+def test_tables_are_read_only():
+    """测试帧表只读"""
+    table = compile_animation("init", 0)
+    with pytest.raises(ValueError):
+        table.frames[0, 0, 0] = 1
+
+
+def test_init_mirrors_random_green_theme():
+    """测试开机动画内圈第i颗与第47-i颗同色，颜色落在绿色主题区间内，最后全灭"""
+    table = compile_animation("init", 1)
+    full = table.frames[23]
+
+    assert np.array_equal(full[:24], full[24:][::-1])
+    ranges = np.asarray(INIT_COLOR_RANGES)
+    in_range = ((full[:24, None] >= ranges[None, :, :, 0]) &
+                (full[:24, None] < ranges[None, :, :, 1])).all(axis=2).any(axis=1)
+    assert in_range.all()
+    assert table.frames[5][6:24].sum() == 0
+    assert not table.led_on[-1]
+    assert table.duration == pytest.approx(0.98)
+
+
+def test_wipe_pixels():
+    """测试逐颗点亮与双色外圈"""
+    table = compile_animation("random")
+    assert table.frame_index(RANDOM_WIPE_STEP * 3 / 1000) == 3
+    frame = table.frames[3]
+    assert tuple(frame[3]) == COLOR_NEON_GREEN
+    assert tuple(frame[27]) == COLOR_RANDOM_OUTER
+    assert frame[4].sum() == 0
+    assert math.isinf(table.duration)
+
+    r, g, b = COLOR_CHERRY_RED
+    closing = compile_animation("closing")
+    assert tuple(closing.frames[0][30]) == (b, r, g)
+    assert closing.led_on.tolist() == [True, False] * 3
+
+    connected = compile_animation("connected")
+    assert tuple(connected.frames[-1][23]) == COLOR_TENNIS
+    assert connected.frames[-1][24:].sum() == 0
+
+
+def test_timed_countdown_pixels():
+    """测试计时倒计时内圈正向、外圈反向按比例熄灭"""
+    table = compile_animation("timed", COLOR_ORANGE, 2400)
+
+    assert table.frame_index(0.0) == 0
+    assert (table.frames[0] == COLOR_ORANGE).all()
+    index = table.frame_index(0.5)  # 500 * 24 / 2400 = 5
+    assert index == 5
+    frame = table.frames[index]
+    assert frame[:5].sum() == 0 and tuple(frame[5]) == COLOR_ORANGE
+    assert frame[43:].sum() == 0 and tuple(frame[42]) == COLOR_ORANGE
+    assert table.frame_index(2.4) == -1
+
+
+def test_player_renders_groups():
+    """测试批量播放器按帧表分组渲染"""
+    fleet = FleetState(capacity=8)
+    slots = [fleet.allocate(i) for i in range(6)]
+    player = AnimationPlayer(fleet)
+    for slot in slots[:3]:
+        player.start(slot, compile_animation("random"), 0.0)
+    for slot in slots[3:5]:
+        player.start(slot, compile_animation("closing"), 0.0)
+
+    assert player.render(0.012) == 5
+    assert tuple(fleet.leds[slots[0], 2]) == COLOR_NEON_GREEN
+    assert fleet.leds[slots[0], 3].sum() == 0
+    assert fleet.led_on[slots[:5]].all() and not fleet.led_on[slots[5]]
+    assert fleet.counters.led_on == 5
+
+    assert player.render(0.013) == 0
+    assert player.render(0.5) == 5
+    assert fleet.counters.led_on == 3
+
+    player.stop(slots[0])
+    assert player.render(1.0) == 2
+
+
+def test_player_reuses_table_ids():
+    """测试不再播放的帧表编号被回收复用，登记的帧表数不随参数种类无限增长"""
+    fleet = FleetState(capacity=8)
+    playing, other = fleet.allocate(0), fleet.allocate(1)
+    player = AnimationPlayer(fleet)
+    closing = compile_animation("closing")
+    player.start(playing, closing, 0.0)
+    for blink_break in range(1000):
+        player.start(other, compile_animation("rest", 100 + blink_break), 0.0)
+    player.stop(other)
+
+    assert len(player._tables) <= ANIMATION_CACHE_SIZE
+    assert player._tables[fleet.anim_id[playing]] is closing
+    assert player.render(0.012) == 1 and fleet.led_on[playing] and not fleet.led_on[other]
+
+
+def test_device_plays_table():
+    """测试设备按帧表播放并在结束后熄灭"""
+    manager = DeviceManager(clock=VirtualClock())
+    devices = [manager.create_device() for _ in range(2)]
+    engine = SimulationEngine(manager, mode=SimulationMode.AS_FAST_AS_POSSIBLE)
+    for device in devices:
+        manager.get_controller(device.device_id).start_connected_animation()
+
+    engine.run(0.2)
+    tables = {manager.get_controller(d.device_id).animation_table for d in devices}
+    assert len(tables) == 1
+    assert devices[0].led_state.inner_ring[0] == COLOR_TENNIS
+    assert devices[0].led_state.inner_ring[-1] == (0, 0, 0)
+    assert devices[0].led_state.is_on
+
+    engine.run(2.0)
+    assert not devices[0].led_state.is_on
+
+
+def test_random_mode_holds_until_detection():
+    """测试随机模式点亮后常亮，直到检测触发"""
+    manager = DeviceManager(clock=VirtualClock())
+    device = manager.create_device()
+    engine = SimulationEngine(manager, mode=SimulationMode.AS_FAST_AS_POSSIBLE)
+    device.config.game_mode = RANDOM_MODE
+    manager.send_message_to_device(device.device_id, "2")
+
+    engine.run(1.0)
+    assert device.led_state.is_on
+    assert device.led_state.inner_ring[-1] == COLOR_NEON_GREEN
+
+    manager.get_tof_controller(device.device_id).simulate_touch()
+    manager.get_controller(device.device_id).turn_light_off()
+    engine.run(0.1)
+    assert not device.led_state.is_on
+
+
+def test_timed_mode_notifies_on_expiry():
+    """测试计时模式倒计时结束后熄灭并通知"""
+    manager = DeviceManager(clock=VirtualClock())
+    device = manager.create_device()
+    controller = manager.get_controller(device.device_id)
+    notifications = []
+    controller.notification_callback = notifications.append
+    engine = SimulationEngine(manager, mode=SimulationMode.AS_FAST_AS_POSSIBLE)
+
+    device.able_to_turn_on = True
+    controller.handle_game_mode(TIMED_MODE)
+    engine.run(device.config.timed_break / 1000 + 0.05)
+
+    assert not device.led_state.is_on
+    assert notifications == ["timed_countdown:0"]
+
+
+def test_rhythm_countdown_and_buzzer():
+    """测试节奏模式按 rhythm_timer 倒计时熄灭（无通知），蜂鸣时长取 rhythm_buzzer_time 且不受蜂鸣器开关控制"""
+    manager = DeviceManager(clock=VirtualClock())
+    device = manager.create_device()
+    controller = manager.get_controller(device.device_id)
+    notifications = []
+    controller.notification_callback = notifications.append
+    engine = SimulationEngine(manager, mode=SimulationMode.AS_FAST_AS_POSSIBLE)
+
+    config = device.config
+    config.buzzer_enabled = False
+    config.rhythm_timer, config.rhythm_buzzer_time = 1000, 300
+    manager.apply_game_mode(device.device_id, RHYTHM_MODE)
+    assert device.buzzer_active and controller.buzzer_duration == 300
+    assert controller.next_deadline() == pytest.approx(device.clock.now() + 0.3)
+
+    engine.run(0.9)
+    assert device.led_state.is_on and not device.buzzer_active
+    engine.run(0.2)
+    assert not device.led_state.is_on and not device.tof_state.detection_active
+    assert controller.countdown_deadline is None and notifications == []
+
+    # rhythm_timer 为0时常亮直到检测，蜂鸣时长为0时不蜂鸣
+    config.rhythm_timer = config.rhythm_buzzer_time = 0
+    manager.apply_game_mode(device.device_id, RHYTHM_MODE)
+    engine.run(5.0)
+    assert device.led_state.is_on and not device.buzzer_active
+    assert controller.next_deadline() is None
+
+
+def test_config_after_rest():
+    """测试休息动画结束后配置白光正常显示"""
+    manager = DeviceManager(clock=VirtualClock())
+    device = manager.create_device()
+    engine = SimulationEngine(manager, mode=SimulationMode.AS_FAST_AS_POSSIBLE)
+
+    manager.send_message_to_device(device.device_id, "14")
+    engine.run(1.0)
+
+    assert device.led_state.brightness == 1.0
+    manager.send_message_to_device(device.device_id, "config:1")
+    assert device.led_state.inner_ring[0] == COLOR_WHITE
+
+
+def test_rest_ends_with_ready_beep():
+    """测试休息动画结束熄灭后蜂鸣100ms提示就绪（不受蜂鸣器开关控制）"""
+    manager = DeviceManager(clock=VirtualClock())
+    device = manager.create_device()
+    controller = manager.get_controller(device.device_id)
+    engine = SimulationEngine(manager, mode=SimulationMode.AS_FAST_AS_POSSIBLE, step_size=0.001)
+    device.config.buzzer_enabled = False
+
+    manager.send_message_to_device(device.device_id, "14")
+    assert not device.buzzer_active
+    engine.run(device.config.blink_break / 1000 + 0.002)
+    assert not device.led_state.is_on
+    assert device.buzzer_active and controller.buzzer_duration == REST_READY_BUZZER_TIME == 100
+    engine.run(0.1)
+    assert not device.buzzer_active
+
+
+def test_config_always_beeps():
+    """测试配置白光总是蜂鸣400ms，不受蜂鸣器开关与 buzzer_time 影响"""
+    manager = DeviceManager(clock=VirtualClock())
+    device = manager.create_device()
+    controller = manager.get_controller(device.device_id)
+    device.config.buzzer_enabled = False
+    device.config.buzzer_time = 2000
+
+    manager.send_message_to_device(device.device_id, "config:2")
+    assert device.buzzer_active and controller.buzzer_duration == CONFIG_BUZZER_TIME == 400
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
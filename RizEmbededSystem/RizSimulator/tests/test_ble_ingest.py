@@ -0,0 +1,122 @@
+"""
+Test BLE Ingest
+BLE接收队列的设备内顺序、反压、跨线程写入与吞吐测试
+"""
+
+import asyncio
+import threading
+import pytest
+import sys
+from pathlib import Path
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from ble.ble_ingest import BLEIngestPipeline
+from clock import VirtualClock
+from constants import MANUAL_MODE
+from device_manager import DeviceManager
+from throughput_benchmark import ingest_throughput
+
+
+def _manager(count: int) -> DeviceManager:
+    manager = DeviceManager(clock=VirtualClock())
+    for _ in range(count):
+        manager.create_device()
+    return manager
+
+
+def test_order_preserved_per_device():
+    """测试同一设备的写入按到达顺序处理，各设备轮转交错处理"""
+    manager = _manager(3)
+    received = []
+    for device_id, server in manager.ble_servers.items():
+        server.on_message_callback = lambda msg, d=device_id: received.append((d, msg))
+
+    async def drive():
+        pipeline = BLEIngestPipeline(manager, batch_size=4)
+        pipeline.start()
+        for i in range(20):
+            for device_id in manager.devices:
+                assert pipeline.submit(device_id, str(i).encode())
+        assert pipeline.pending == 60
+        await pipeline.join()
+        await pipeline.close()
+        return pipeline
+
+    pipeline = asyncio.run(drive())
+    assert (pipeline.pending, pipeline.processed, pipeline.dropped) == (0, 60, 0)
+    for device_id in manager.devices:
+        assert [msg for d, msg in received if d == device_id] == [str(i) for i in range(20)]
+    assert [d for d, _ in received[:3]] == [1, 2, 3]
+
+
+def test_backpressure():
+    """测试队列满时 submit 拒绝写入、put 等待空间，移除设备后丢弃其余写入"""
+    manager = _manager(2)
+
+    async def drive():
+        pipeline = BLEIngestPipeline(manager, queue_length=4, batch_size=2)
+        results = [pipeline.submit(1, b"13") for _ in range(6)]
+        assert results == [True] * 4 + [False] * 2
+        assert pipeline.is_full(1) and pipeline.backlog(1) == 4 and not pipeline.is_full(2)
+
+        pipeline.start()
+        await pipeline.put(1, b"1")  # 等到工作协程处理一批
+        assert pipeline.backlog(1) <= 4
+
+        for _ in range(3):
+            pipeline.submit(2, b"1")
+        manager.remove_device(2)
+        await pipeline.close()
+        return pipeline
+
+    pipeline = asyncio.run(drive())
+    assert pipeline.dropped == 2 + 3
+    assert pipeline.processed == 5
+    assert manager.devices[1].led_state.is_on
+
+
+def test_threaded_producers():
+    """测试其他线程经 put_threadsafe 写入，亮灯/灭灯命令交替处理，系统延迟包含排队时间"""
+    manager = _manager(100)
+    device_ids = list(manager.devices)
+
+    async def drive():
+        pipeline = BLEIngestPipeline(manager)
+        pipeline.start()
+
+        def produce():
+            for device_id in device_ids:
+                pipeline.put_threadsafe(device_id, b"1").result()
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        while producer.is_alive():
+            await asyncio.sleep(0.001)
+        await pipeline.join()
+
+        for i in range(20):
+            for device_id in device_ids:
+                await pipeline.put(device_id, b"13" if i % 2 == 0 else b"1")
+        await pipeline.close()
+        return pipeline
+
+    pipeline = asyncio.run(drive())
+    assert (pipeline.processed, pipeline.dropped, pipeline.pending) == (2100, 0, 0)
+    assert all(device.led_state.is_on for device in manager.devices.values())
+    assert all(device.config.prev_game_mode == MANUAL_MODE for device in manager.devices.values())
+    assert manager.system_latency.count > 0
+
+    with pytest.raises(RuntimeError):
+        BLEIngestPipeline(manager).put_threadsafe(1, b"1")
+
+
+def test_throughput_benchmark():
+    """测试吞吐基准报告处理数（每秒条数随机器负载变化，不作断言）"""
+    row = ingest_throughput(devices=5, rounds=4)
+    assert row["items"] == 20 and row["per_second"] > 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,147 @@
+"""
+Test BLE Protocol
+BLE命令解析（8字段协议、字节串解析、解析缓存）测试
+"""
+
+import random
+import pytest
+import sys
+from pathlib import Path
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from ble.ble_server import BLECommand, BLEMessageParser, is_binary
+from clock import VirtualClock
+from codec_benchmark import SAMPLE_COMMANDS, run_benchmark
+from constants import (
+    BLE_BINARY_MAGIC, BLE_COMMAND_CACHE_SIZE, CONFIG_MODE, DOUBLE_MODE, MANUAL_MODE, RHYTHM_MODE,
+    TERMINATE_MODE, TIMED_MODE
+)
+from device_manager import DeviceManager
+
+
+def test_full_protocol_fields():
+    """测试标准8字段、节奏、窗口、双击简写与配置格式各字段的解析"""
+    parse = BLEMessageParser.parse_command
+    assert parse("3,1000,5000,1,500,1,0,0") == BLECommand(
+        TIMED_MODE, blink_break=1000, timed_break=5000, buzzer=1, buzzer_time=500, buffer=1,
+        double_index=0, process=0)
+    assert parse(b"4,999,999,999,999,999,2,999").double_index == 2
+    assert parse("4,1") == BLECommand(DOUBLE_MODE, double_index=1)
+    assert parse("5,255,0,0,1000,500,1,999") == BLECommand(
+        RHYTHM_MODE, red=255, green=0, blue=0, timer=1000, buzzer=500, sensor_mode=1)
+    assert parse(" config:4\r\n") == parse("100,4") == BLECommand(CONFIG_MODE, blink_count=4)
+    assert parse("1") == BLECommand(MANUAL_MODE)
+    assert parse("-1,5,6").mode == -1
+
+    for malformed in ["", "abc", "1,,2", "config:", "config:3:4", "5,1.5,0", "1-2"]:
+        assert parse(malformed) == BLECommand(TERMINATE_MODE), malformed
+
+    # 字段首尾的空白允许，数字中间的空白按格式错误处理
+    assert parse(" 4 , 1 \r\n") == BLECommand(DOUBLE_MODE, double_index=1)
+    assert parse("config: 3 ") == BLECommand(CONFIG_MODE, blink_count=3)
+    for malformed in ["1 2", "99 9", "1\x002", "4,1 2", "config:1 2", "- 1"]:
+        assert parse(malformed) == BLECommand(TERMINATE_MODE), malformed
+
+    # parse_message 只包含消息中出现的参数
+    assert BLEMessageParser.parse_message("4,1") == {"mode": DOUBLE_MODE, "double_index": 1}
+
+
+def test_matches_split_reference():
+    """测试字节串解析与解码后按逗号分割、int() 转换的结果一致"""
+    rng = random.Random(0)
+    for _ in range(2000):
+        count = rng.choice([1, 2, 8])
+        fields = [rng.choice([1, 2, 3, 4, 6, 11, 13])] + [rng.randrange(0, 100000) for _ in range(count - 1)]
+        message = ",".join(map(str, fields))
+        command = BLEMessageParser.parse_command(message.encode())
+        parts = [int(part) for part in message.split(",")]
+        assert command.mode == parts[0]
+        if count == 8:
+            assert (command.blink_break, command.timed_break, command.buzzer, command.buzzer_time,
+                    command.buffer, command.double_index, command.process) == tuple(parts[1:])
+
+
+def test_parse_cache():
+    """测试相同消息命中缓存并共享同一命令对象，缓存大小有上限"""
+    first = BLEMessageParser.parse_command(b"1,999,999,999,999,999,999,999")
+    hits = BLEMessageParser.cache_info().hits
+    assert BLEMessageParser.parse_command("1,999,999,999,999,999,999,999") is first
+    assert BLEMessageParser.cache_info().hits == hits + 1
+
+    for i in range(BLE_COMMAND_CACHE_SIZE * 2):
+        BLEMessageParser.parse_command(f"100,{i}")
+    assert BLEMessageParser.cache_info().currsize == BLE_COMMAND_CACHE_SIZE
+
+
+def test_standard_fields_applied():
+    """测试标准8字段消息写入设备配置（buffer 按固件加1）"""
+    manager = DeviceManager(clock=VirtualClock())
+    device = manager.create_device()
+    manager.send_message_to_device(device.device_id, "3,1000,5000,0,300,9,0,80")
+    config = device.config
+    assert (config.blink_break, config.timed_break, config.buzzer_time, config.buffer_time, config.process) == \
+        (1000, 5000, 300, 10, 80)
+    assert not config.buzzer_enabled
+    assert config.prev_game_mode == TIMED_MODE
+
+
+def test_rhythm_fields_applied():
+    """测试节奏模式消息的倒计时与蜂鸣时长写入设备配置，倒计时结束后熄灭"""
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock)
+    device = manager.create_device()
+    manager.send_message_to_device(device.device_id, "5,0,0,255,1500,200,1,0")
+    config = device.config
+    assert (config.blue_value, config.rhythm_timer, config.rhythm_buzzer_time) == (255, 1500, 200)
+    assert device.buzzer_active
+
+    clock.advance(1.6)
+    manager.update_all(1.6)
+    assert not device.led_state.is_on
+
+
+def test_binary_codec_roundtrip():
+    """测试二进制格式与文本格式解码结果相同，按首字节自动识别，版本与长度不符时拒绝"""
+    for name, mode, params in SAMPLE_COMMANDS + (("double", DOUBLE_MODE, {"double_index": 2}),):
+        text = BLEMessageParser.create_message(mode, **params)
+        binary = BLEMessageParser.create_message(mode, binary=True, **params)
+        assert is_binary(binary) and not is_binary(text.encode())
+        assert BLEMessageParser.parse_command(binary) == BLEMessageParser.parse_command(text), name
+        assert BLEMessageParser.parse_message(binary) == BLEMessageParser.parse_message(text), name
+
+    timed = BLEMessageParser.create_message(TIMED_MODE, binary=True, timed_break=5000)
+    assert len(timed) == 18 and timed[0] == BLE_BINARY_MAGIC
+    assert BLEMessageParser.parse_command(bytes([BLE_BINARY_MAGIC, 2]) + timed[2:]).mode is None
+    assert BLEMessageParser.parse_command(timed[:-1]).mode is None
+    with pytest.raises(ValueError):
+        BLEMessageParser.create_message(TIMED_MODE, binary=True, timed_break=70000)
+
+
+def test_binary_messages_drive_devices():
+    """测试设备管理器直接处理二进制消息（单发与广播）"""
+    manager = DeviceManager(clock=VirtualClock())
+    devices = [manager.create_device() for _ in range(3)]
+    message = BLEMessageParser.create_message(RHYTHM_MODE, binary=True, red=1, green=2, blue=3)
+    manager.send_message_to_device(devices[0].device_id, message)
+    assert devices[0].led_state.is_on
+    assert (devices[0].config.red_value, devices[0].config.blue_value) == (1, 3)
+
+    assert manager.broadcast(BLEMessageParser.create_message(TERMINATE_MODE, binary=True)) == 3
+    assert manager.broadcast(message) == 3
+    assert all(device.led_state.is_on for device in devices)
+
+
+def test_codec_benchmark():
+    """测试基准报告: 8字段命令二进制格式更短，且只占一个链路层数据包"""
+    rows = {row["command"]: row for row in run_benchmark(repeat=10)}
+    assert set(rows) == {name for name, _, _ in SAMPLE_COMMANDS}
+    for name in ("manual", "timed", "window"):
+        assert rows[name]["binary_bytes"] < rows[name]["text_bytes"]
+        assert rows[name]["binary_packets"] == 1 < rows[name]["text_packets"]
+    assert all(row["binary_decode_us"] > 0 for row in rows.values())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
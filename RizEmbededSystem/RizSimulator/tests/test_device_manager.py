@@ -0,0 +1,187 @@
+"""
+Test Device Manager
+设备管理器测试
+"""
+
+import random
+import pytest
+import sys
+from pathlib import Path
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+import numpy as np
+
+from clock import VirtualClock
+from constants import STATE_CONNECTED, STATE_ADVERTISING, STATE_DISCONNECTED, RANDOM_MODE, RHYTHM_MODE
+from device_manager import DeviceManager
+from session_replay import SessionReplayer
+
+
+def _brute_force_summary(manager: DeviceManager) -> dict:
+    devices = list(manager.devices.values())
+    by_state, by_mode = {}, {}
+    for d in devices:
+        by_state[d.connection_state] = by_state.get(d.connection_state, 0) + 1
+        by_mode[d.config.game_mode] = by_mode.get(d.config.game_mode, 0) + 1
+    return {
+        'active_devices': sum(1 for d in devices if d.led_state.is_on),
+        'total_triggers': sum(d.stats.trigger_count for d in devices),
+        'by_state': by_state,
+        'by_mode': by_mode,
+    }
+
+
+def test_summary_counters_match_full_scan():
+    """测试增量计数器与全量扫描结果一致"""
+    rng = random.Random(1)
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock)
+    for _ in range(30):
+        manager.create_device()
+
+    messages = ["1", "2", "4,1", "5,10,20,30,0,0,1", "13", "14", "config:2"]
+    for _ in range(500):
+        device_id = rng.choice(list(manager.devices))
+        action = rng.randrange(6)
+        if action == 0:
+            manager.connect_device(device_id)
+        elif action == 1:
+            manager.disconnect_device(device_id)
+        elif action == 2:
+            device = manager.devices[device_id]
+            device.config.game_mode = rng.choice([1, 2, 4, 5])
+            manager.send_message_to_device(device_id, rng.choice(messages))
+        elif action == 3:
+            tof = manager.get_tof_controller(device_id)
+            tof.device.tof_state.detection_active = True
+            tof.simulate_touch()
+        elif action == 4 and len(manager.devices) > 5:
+            manager.remove_device(device_id)
+        else:
+            manager.create_device()
+        clock.advance(0.05)
+        manager.update_all(0.05)
+
+    summary = manager.get_summary()
+    expected = _brute_force_summary(manager)
+    for key, value in expected.items():
+        assert summary[key] == value, key
+    assert summary['connected'] == expected['by_state'].get(STATE_CONNECTED, 0)
+    assert summary['advertising'] == expected['by_state'].get(STATE_ADVERTISING, 0)
+
+
+def test_reset_stats_updates_totals():
+    """测试重置统计同步更新总触发数"""
+    manager = DeviceManager(clock=VirtualClock())
+    device = manager.create_device()
+    device.tof_state.detection_active = True
+    manager.get_tof_controller(device.device_id).simulate_touch()
+    assert manager.get_summary()['total_triggers'] == 1
+
+    device.stats.reset()
+    assert manager.get_summary()['total_triggers'] == 0
+
+
+def test_remove_all_devices():
+    """测试移除所有设备"""
+    manager = DeviceManager()
+    for _ in range(3):
+        manager.create_device()
+    manager.stop_all_advertising()
+
+    manager.remove_all_devices()
+
+    summary = manager.get_summary()
+    assert summary['total_devices'] == 0
+    assert summary['by_state'] == {}
+    assert manager.fleet.counters.by_state[STATE_DISCONNECTED] == 0
+
+
+def test_large_fleet():
+    """测试超过GUI上限的大规模设备群"""
+    manager = DeviceManager()
+    for _ in range(2000):
+        manager.create_device()
+
+    assert manager.get_advertising_count() == 2000
+
+
+def test_broadcast_matches_individual_messages():
+    """测试广播与逐个发送同一消息结果相同，支持设备ID列表与筛选函数"""
+    managers = [DeviceManager(clock=VirtualClock(), seed=5) for _ in range(2)]
+    for manager in managers:
+        for _ in range(50):
+            manager.create_device()
+
+    for message in ["5,10,20,30,0,0,1", "13", "2", "4,3", "config:2"]:
+        for device_id in managers[0].devices:
+            managers[0].send_message_to_device(device_id, message)
+        assert managers[1].broadcast(message) == 50
+        assert np.array_equal(managers[0].fleet.leds, managers[1].fleet.leds)
+        assert np.array_equal(managers[0].fleet.fsm_state, managers[1].fleet.fsm_state)
+    assert managers[1].devices[7].config.double_mode_index == 3
+
+    manager = managers[1]
+    manager.broadcast("13")
+    assert manager.broadcast("1", [3, 3, 4, 999]) == 2
+    assert manager.get_summary()['active_devices'] == 2
+    assert manager.broadcast("1", lambda device: device.device_id % 10 == 0) == 5
+    assert manager.broadcast("7,100,5000,1,100,1,0,100") == 0  # 窗口参数不合法
+    assert manager.get_summary()['active_devices'] == 7
+
+
+def test_broadcast_stagger(tmp_path):
+    """测试错开执行的广播按偏移依次点亮，移除的设备跳过，录制后重放结果相同"""
+    path = tmp_path / "session.rizses"
+    manager = DeviceManager(clock=VirtualClock(), seed=9)
+    manager.start_recording(path)
+    ids = [manager.create_device().device_id for _ in range(5)]
+
+    assert manager.broadcast("5,1,2,3,0,0,1", ids, stagger=0.1) == 5
+    lit = []
+    for _ in range(30):
+        lit.append(sum(manager.devices[d].led_state.is_on for d in ids if d in manager.devices))
+        if len(lit) == 10:
+            manager.remove_device(ids[-1])
+        manager.clock.advance(0.016)
+        manager.update_all(0.016)
+    assert lit[0] == 1 and lit[-1] == 4
+    assert lit == sorted(lit)
+    assert manager.devices[ids[1]].config.red_value == 1
+
+    manager.broadcast("13", ids[:2])
+    manager.broadcast(str(RANDOM_MODE), ids[:2], stagger=[0.05, 0.0])
+    with pytest.raises(ValueError):
+        manager.broadcast("1", ids[:2], stagger=[0.1])
+    for _ in range(5):
+        manager.clock.advance(0.016)
+        manager.update_all(0.016)
+    assert manager.devices[ids[0]].config.prev_game_mode == RANDOM_MODE
+    manager.stop_recording()
+
+    replayed = SessionReplayer(path).replay()
+    assert np.array_equal(replayed.fleet.leds, manager.fleet.leds)
+    assert [replayed.devices[d].config.prev_game_mode for d in ids[:4]] == [RANDOM_MODE] * 2 + [RHYTHM_MODE] * 2
+
+
+
+def test_broadcast_offsets_follow_targets():
+    """测试 stagger 可为NumPy标量；未知与重复的设备ID连同其偏移一起跳过，其余偏移仍与目标对应"""
+    manager = DeviceManager(clock=VirtualClock())
+    ids = [manager.create_device().device_id for _ in range(3)]
+
+    assert manager.broadcast("1", ids, np.int64(1)) == 3
+    assert [manager.devices[d].led_state.is_on for d in ids] == [True, False, False]
+    manager.broadcast("13", ids)
+
+    assert manager.broadcast("1", [999, ids[2], ids[2], ids[0]], stagger=[0.0, 0.0, 0.5, 0.5]) == 2
+    assert [manager.devices[d].led_state.is_on for d in ids] == [False, False, True]
+    manager.clock.advance(0.5)
+    manager.update_all(0.5)
+    assert [manager.devices[d].led_state.is_on for d in ids] == [True, False, True]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
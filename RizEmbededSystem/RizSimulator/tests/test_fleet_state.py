@@ -0,0 +1,82 @@
+"""
+Test Fleet State
+设备群状态存储测试
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from constants import LED_COUNT, COLOR_ORANGE
+from device_manager import DeviceManager
+from fleet_state import FleetState
+from models import RizDevice
+
+
+def test_allocate_grows_capacity():
+    """测试容量自动扩容且已有数据不丢失"""
+    fleet = FleetState(capacity=2)
+    slots = [fleet.allocate(i) for i in range(5)]
+    fleet.distance[slots[0]] = 123
+
+    assert fleet.capacity >= 5
+    assert fleet.leds.shape[1:] == (LED_COUNT, 3)
+    assert fleet.distance[slots[0]] == 123
+    assert list(fleet.active_slots()) == slots
+
+
+def test_release_reuses_slot():
+    """测试释放后复用slot并恢复默认值"""
+    fleet = FleetState(capacity=4)
+    slot = fleet.allocate(1)
+    fleet.leds[slot] = 255
+    fleet.release(slot)
+
+    assert fleet.allocate(2) == slot
+    assert fleet.leds[slot].sum() == 0
+    assert fleet.device_id[slot] == 2
+
+
+def test_device_views_write_through():
+    """测试设备视图直接读写数组"""
+    manager = DeviceManager()
+    device = manager.create_device()
+
+    device.led_state.set_inner(COLOR_ORANGE)
+    device.tof_state.distance = 250
+    device.config.game_mode = 5
+
+    assert tuple(manager.fleet.leds[device.slot, 0]) == COLOR_ORANGE
+    assert device.led_state.outer_ring[0] == (0, 0, 0)
+    assert manager.fleet.distance[device.slot] == 250
+    assert manager.fleet.mode[device.slot] == 5
+
+
+def test_bulk_fill_leds():
+    """测试批量点亮"""
+    manager = DeviceManager()
+    devices = [manager.create_device() for _ in range(3)]
+
+    manager.fleet.fill_leds([d.slot for d in devices[:2]], (1, 2, 3))
+
+    assert devices[0].led_state.is_on and devices[1].led_state.is_on
+    assert not devices[2].led_state.is_on
+    assert devices[1].led_state.inner_ring[5] == (1, 2, 3)
+
+
+def test_standalone_device():
+    """测试不经过管理器创建的设备"""
+    device = RizDevice(device_id=7)
+    device.led_state.set_all((9, 9, 9))
+
+    assert device.led_state.is_on is False
+    assert np.all(device.led_state.pixels == 9)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
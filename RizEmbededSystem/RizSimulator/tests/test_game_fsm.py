@@ -0,0 +1,122 @@
+"""
+Test Game FSM
+游戏模式状态机、事件队列与批量模式切换测试
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from clock import VirtualClock
+from constants import (
+    CMD_QUEUE_LENGTH, CONFIG_MODE, MANUAL_MODE, PROCESSED_MODE, RESTTIMESUP_MODE,
+    RHYTHM_MODE, TERMINATE_MODE, TIMED_MODE
+)
+from device_manager import DeviceManager
+from fleet_state import FleetState
+from game_fsm import (
+    EVENT_ARM, EVENT_EFFECT, EVENT_GAME, EVENT_OFF, GameFSM,
+    STATE_EFFECT, STATE_IDLE, STATE_READY, STATE_RUNNING
+)
+
+
+def test_transition_table_and_queue_order():
+    """测试按队列顺序逐轮查表: 未就绪时忽略游戏模式，进入动作只对转换成功的事件执行"""
+    fleet = FleetState(capacity=4)
+    slots = [fleet.allocate(i) for i in range(3)]
+    fsm = GameFSM(fleet)
+    entered = []
+    for slot in slots:
+        fsm.attach(slot, lambda mode, slot=slot: entered.append((slot, mode)))
+
+    fleet.fsm_state[slots] = STATE_IDLE
+    fsm.post(slots[0], EVENT_GAME, MANUAL_MODE)   # 未就绪，忽略
+    fsm.post(slots[1], EVENT_ARM)
+    fsm.post(slots[1], EVENT_GAME, RHYTHM_MODE)
+    fsm.post(slots[1], EVENT_GAME, MANUAL_MODE)   # 已在运行，忽略
+    fsm.post(slots[2], EVENT_EFFECT, CONFIG_MODE)
+    fsm.post(slots[2], EVENT_OFF)
+    fsm.dispatch()
+
+    assert fleet.fsm_state[slots].tolist() == [STATE_IDLE, STATE_RUNNING, STATE_IDLE]
+    assert entered == [(slots[2], CONFIG_MODE), (slots[1], RHYTHM_MODE)]
+    assert fleet.fsm_game[slots].tolist() == [-1, RHYTHM_MODE, -1]
+    assert fleet.fsm_pending[slots].tolist() == [0, 0, 0]
+
+    # 队列写满时丢弃新事件
+    assert fsm.post(slots[0], EVENT_ARM) == 0
+    for _ in range(CMD_QUEUE_LENGTH - 1):
+        fsm.post(slots[0], EVENT_ARM)
+    assert fsm.post(slots[0], EVENT_OFF) == 1
+    fsm.dispatch()
+    assert fsm.state(slots[0]) == STATE_READY
+
+
+def test_controller_replaces_flags():
+    """测试控制器由状态机代替 able_to_turn_on / prev_game_mode 标志"""
+    manager = DeviceManager(clock=VirtualClock())
+    device = manager.create_device()
+    controller = manager.get_controller(device.device_id)
+    assert device.able_to_turn_on
+
+    controller.handle_game_mode(MANUAL_MODE)
+    assert device.led_state.is_on
+    assert manager.fsm.state(device.slot) == STATE_RUNNING
+    assert device.config.prev_game_mode == MANUAL_MODE
+
+    # 灯灭后必须收到新命令才能再次点亮
+    controller.turn_light_off()
+    assert not device.able_to_turn_on
+    controller.handle_game_mode(MANUAL_MODE)
+    assert not device.led_state.is_on
+    controller.handle_game_mode(RHYTHM_MODE, arm=True)
+    assert device.led_state.is_on
+    assert device.config.prev_game_mode == RHYTHM_MODE
+
+    # 已处理的模式不再执行，未知模式被忽略
+    controller.handle_game_mode(PROCESSED_MODE, arm=True)
+    controller.handle_game_mode(42, arm=True)
+    assert manager.fsm.state(device.slot) == STATE_RUNNING
+
+    # 终止在进入动作中关灯，关灯事件由同一次分发处理
+    controller.handle_game_mode(TERMINATE_MODE)
+    assert manager.fsm.state(device.slot) == STATE_IDLE
+    assert not device.led_state.is_on
+
+    # 效果模式总是执行，期间不响应游戏模式
+    manager.run_game_mode(device.device_id, RESTTIMESUP_MODE)
+    assert manager.fsm.state(device.slot) == STATE_EFFECT
+    manager.apply_game_mode(device.device_id, TIMED_MODE)
+    assert device.config.prev_game_mode == RHYTHM_MODE
+
+
+def test_batch_mode_change():
+    """测试批量切换: 一次查表完成整批设备的状态转换，灯亮的设备不受影响"""
+    manager = DeviceManager(clock=VirtualClock())
+    devices = [manager.create_device() for _ in range(2000)]
+    busy = devices[:100]
+    for device in busy:
+        manager.run_game_mode(device.device_id, CONFIG_MODE)
+
+    ids = [device.device_id for device in devices]
+    manager.apply_game_mode_batch(ids, RHYTHM_MODE, {"rgb": (0, 0, 255)})
+    slots = np.array([device.slot for device in devices])
+    assert manager.fleet.led_on[slots].all()
+    assert manager.fsm.count(STATE_RUNNING) == 1900
+    assert manager.fsm.count(STATE_EFFECT) == 100
+    assert (manager.fleet.leds[slots[100:], 0] == (0, 0, 255)).all()
+    assert (manager.fleet.leds[slots[:100], 0] == (255, 255, 255)).all()
+    assert manager.get_summary()['by_mode'] == {RHYTHM_MODE: 2000}
+
+    manager.apply_game_mode_batch(ids, TERMINATE_MODE)
+    assert manager.fsm.count(STATE_IDLE) == 2000
+    assert manager.get_summary()['active_devices'] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
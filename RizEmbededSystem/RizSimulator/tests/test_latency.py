@@ -0,0 +1,158 @@
+"""
+Test Latency
+点亮 -> 检测反应时间、系统处理延迟与延迟序列测试
+"""
+
+import time
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from clock import MonotonicClock, VirtualClock
+from constants import MANUAL_MODE, MOVEMENT_MODE, RHYTHM_MODE
+from device_manager import DeviceManager
+from latency import LatencySeries, LatencySketch, bucket_index, bucket_values, merge_sketches
+from mmwave import TargetModel
+
+
+def _same_counts(a: LatencySketch, b: LatencySketch) -> bool:
+    return np.array_equal(np.trim_zeros(a.counts, 'b'), np.trim_zeros(b.counts, 'b'))
+
+
+def test_reaction_measured_from_light_on():
+    """测试反应时间为点亮到检测的时间，而不是两次触发的间隔；灯灭时的触发不计入"""
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock)
+    device = manager.create_device()
+    tof = manager.get_tof_controller(device.device_id)
+
+    for wait, delay in [(0.0, 0.3), (5.0, 0.25)]:
+        clock.advance(wait)
+        manager.update_all(wait)  # 冷却结束
+        manager.send_message_to_device(device.device_id, "1")
+        clock.advance(delay)
+        manager.trigger_device(device.device_id)
+
+    assert (device.stats.reactions.minimum, device.stats.reactions.maximum) == pytest.approx((250, 300))
+    assert device.stats.average_reaction == pytest.approx(275)
+    assert device.stats.fastest_reaction == pytest.approx(250)
+
+    # 灯灭后强制触发: 计入触发次数，不计入反应时间
+    device.tof_state.detection_active = True
+    clock.advance(5.0)
+    manager.update_all(5.0)
+    tof.simulate_touch()
+    summary = manager.get_summary()
+    assert (summary['total_triggers'], device.stats.reaction_count) == (3, 2)
+    assert summary['average_response_time'] == pytest.approx(275)
+
+    device.stats.reset()
+    assert manager.get_summary()['average_response_time'] == 0
+    assert len(device.stats.reactions) == 0
+
+
+def test_radar_reaction_uses_frame_time():
+    """测试雷达按触发帧的时间戳计算反应时间，不按仿真步长取整"""
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock, seed=3)
+    manager.set_target_model(TargetModel(reaction_time=1.0, reaction_spread=0.0, noise=0.0))
+    device = manager.create_device()
+    clock.advance(0.1)
+    manager.apply_game_mode(device.device_id, MOVEMENT_MODE)
+    for _ in range(40):
+        clock.advance(0.2503)
+        manager.update_all(0.2503)
+
+    assert device.stats.reaction_count == 1
+    expected = (device.tof_state.last_detection_time - 0.1) * 1000
+    assert device.stats.reactions.total == pytest.approx(expected)
+    assert manager.get_latency_report()['reaction']['p50'] == pytest.approx(expected, rel=0.02)
+
+
+def test_system_latency_from_ble_write():
+    """测试BLE写入到LED变化的系统延迟按真实时间记录，被忽略的命令不计入"""
+    manager = DeviceManager(clock=MonotonicClock())
+    device = manager.create_device()
+
+    start = time.perf_counter_ns()
+    manager.send_message_to_device(device.device_id, "1")
+    elapsed = (time.perf_counter_ns() - start) / 1e6
+    assert device.led_state.is_on
+    assert device.stats.system_latency.count == 1
+    assert 0 <= device.stats.system_latency.maximum <= elapsed
+
+    manager.send_message_to_device(device.device_id, "1")  # 灯亮着，状态机忽略
+    assert manager.system_latency.count == 1
+    assert manager.get_summary()['average_system_latency'] == pytest.approx(device.stats.system_latency.mean)
+    assert device.stats.reaction_count == 0
+
+    # 单调时钟的纳秒读数与秒读数同一基准
+    clock = MonotonicClock()
+    assert abs(clock.now_ns() / 1e9 - clock.now()) < 0.01
+
+
+def test_sketch_percentiles_within_relative_error():
+    """测试直方图分位数的相对误差与桶边界，合并结果与整体写入一致"""
+    rng = np.random.default_rng(0)
+    samples = rng.lognormal(np.log(400), 0.5, 20000)
+    sketch, halves = LatencySketch(), [LatencySketch(), LatencySketch()]
+    for i, value in enumerate(samples):
+        sketch.record(value)
+        halves[i % 2].record(value)
+
+    exact = np.percentile(samples, [50, 95, 99, 99.9])
+    assert sketch.percentiles([50, 95, 99, 99.9]) == pytest.approx(exact, rel=0.02)
+
+    merged = merge_sketches(halves)
+    assert merged.count == 20000
+    assert _same_counts(merged, sketch)
+    merged.subtract(halves[0])
+    assert _same_counts(merged, halves[1])
+
+    # 小于64us逐微秒一个桶，此后每个2的幂区间32个桶
+    assert [bucket_index(v) for v in [0.0, 0.063, 0.064, 0.066, 0.128, 300.0]] == [0, 63, 64, 65, 96, 452]
+    assert bucket_values([63, 64, 96]).tolist() == [0.063, 0.0645, 0.1295]
+
+    series = LatencySeries()
+    series.record(300.0)
+    summary = series.summary()
+    assert (summary['p50'], summary['p99'], summary['mean']) == (300.0, 300.0, 300.0)
+    assert LatencySeries().summary()['p99'] == 0.0
+
+
+def test_fleet_sketch_by_mode_and_removal():
+    """测试设备群直方图等于设备直方图之和，按游戏模式分组，重置/移除设备时逐桶扣除"""
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock)
+    devices = [manager.create_device() for _ in range(3)]
+    for i, device in enumerate(devices):
+        for mode, delay in [(MANUAL_MODE, 0.2 + 0.1 * i), (RHYTHM_MODE, 0.5)]:
+            manager.apply_game_mode(device.device_id, mode)
+            clock.advance(delay)
+            manager.trigger_device(device.device_id)
+            clock.advance(5.0)
+            manager.update_all(5.0)
+
+    counters = manager.fleet.counters
+    merged = merge_sketches(device.stats.reactions.sketch for device in devices)
+    assert _same_counts(counters.reactions, merged)
+    report = manager.get_latency_report()
+    assert report['reaction']['count'] == 6
+    assert report['reaction_by_mode'][MANUAL_MODE]['p50'] == pytest.approx(300, rel=0.02)
+    assert report['reaction_by_mode'][RHYTHM_MODE]['p99'] == pytest.approx(500, rel=0.02)
+    assert manager.get_summary()['response_time_p95'] == pytest.approx(500, rel=0.02)
+
+    devices[0].stats.reset()
+    manager.remove_device(devices[1].device_id)
+    assert counters.reactions.count == 2
+    assert counters.reactions_by_mode[MANUAL_MODE].percentile(50) == pytest.approx(400, rel=0.02)
+    assert _same_counts(counters.reactions, devices[2].stats.reactions.sketch)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,163 @@
+"""
+Test MMWave Radar
+毫米波雷达帧解析、固件判定与设备群批量检测测试
+"""
+
+import random
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from clock import VirtualClock
+from constants import MOVEMENT_MODE, TIMED_MODE, TERMINATE_MODE, MMWAVE_FRAME_RATE
+from device_manager import DeviceManager
+from mmwave import (
+    FRAME_SIZE, TargetModel, encode_frames, in_range, motion_counts, parse_frames, read_capture
+)
+
+
+def test_encode_parse_roundtrip():
+    """测试编码的帧与固件解析一致: 距离/信号强度为大端，校验和为前17字节之和"""
+    data = encode_frames([0, 1, 2], [300, 0x1234, 80], [50, 200, 0xABCD])
+    assert len(data) == 3 * FRAME_SIZE
+    assert data[:2] == b"\x55\xA5"
+    assert data[FRAME_SIZE + 9:FRAME_SIZE + 11] == b"\x12\x34"
+    assert data[17] == sum(data[:17]) & 0xFF
+
+    frames = parse_frames(data)
+    assert frames.offset.tolist() == [0, FRAME_SIZE, 2 * FRAME_SIZE]
+    assert frames.presence.tolist() == [0, 1, 2]
+    assert frames.distance.tolist() == [300, 0x1234, 80]
+    assert frames.signal.tolist() == [50, 200, 0xABCD]
+    assert frames.checksum_errors == 0
+
+
+def test_resync_and_checksum(tmp_path):
+    """测试在垃圾字节后重新同步帧头，校验失败的帧被丢弃并计数"""
+    rng = random.Random(4)
+    data = bytearray()
+    expected = []
+    for _ in range(300):
+        if rng.random() < 0.2:
+            data += bytes(rng.randrange(256) for _ in range(rng.randrange(1, 20)))
+        frame = bytearray(encode_frames(rng.randrange(3), rng.randrange(500), rng.randrange(1000)))
+        if rng.random() < 0.05:
+            frame[17] ^= 0xFF
+        else:
+            expected.append(len(data))
+        data += frame
+
+    frames = parse_frames(bytes(data))
+    assert frames.offset.tolist() == expected
+    assert frames.checksum_errors >= 300 - len(expected)
+
+    path = tmp_path / "radar.bin"
+    path.write_bytes(bytes(data))
+    assert len(read_capture(path)) == len(expected)
+    assert len(parse_frames(b"\x55\xA5")) == 0
+
+
+def test_firmware_in_range_rules():
+    """测试 detectionTask 判定: 强信号直接触发，连续3帧有目标时70%信号即可，距离须在10-150cm"""
+    presence = np.array([1, 1, 2, 0, 2, 2])
+    assert motion_counts(presence).tolist() == [1, 2, 3, 0, 1, 2]
+    assert motion_counts(np.array([3, 1]), start=2).tolist() == [2, 3]
+
+    assert in_range(1, 100, 150, 0, 150)
+    assert not in_range(0, 100, 500, 5, 150)       # 无目标
+    assert not in_range(2, 160, 500, 5, 150)       # 超出距离
+    assert not in_range(2, 5, 500, 5, 150)
+    assert not in_range(1, 100, 105, 2, 150)       # 连续帧不足
+    assert in_range(1, 100, 105, 3, 150)
+
+
+def test_controller_feed_uart():
+    """测试串口数据分段送入控制器: 跨段的帧被拼接，首个进入范围的帧触发"""
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock, seed=1)
+    device = manager.create_device()
+    manager.apply_game_mode(device.device_id, MOVEMENT_MODE)
+    controller = manager.get_mmwave_controller(device.device_id)
+
+    far = encode_frames([2] * 5, 200, 60)
+    near = encode_frames([1, 1], [140, 120], [110, 130])
+    stream = far + near
+    assert not controller.feed(stream[:40])
+    assert device.mmwave_state.motion_frames == 2
+    assert not controller.feed(stream[40:FRAME_SIZE * 5 + 7])
+    assert device.mmwave_state.distance == 200
+
+    assert controller.feed(stream[FRAME_SIZE * 5 + 7:])
+    assert device.mmwave_state.distance == 140 and device.mmwave_state.motion_frames == 6
+    assert not device.mmwave_state.detection_active
+    assert device.stats.trigger_count == 1
+
+    # 由串口驱动的设备不再生成合成目标
+    device.mmwave_state.detection_active = True
+    clock.advance(5.0)
+    assert manager.update_all(5.0) == []
+
+
+def test_fleet_detection_batched():
+    """测试设备群雷达批量检测: 节奏/计时模式按 sensor_mode 启动雷达，移动模式总是启动"""
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock, seed=7)
+    devices = [manager.create_device() for _ in range(30)]
+    for device in devices[:10]:
+        manager.send_message_to_device(device.device_id, "5,0,255,0,0,0,2")
+    for device in devices[10:20]:
+        device.config.sensor_mode = 3
+        device.config.timed_break = 10000
+        manager.apply_game_mode(device.device_id, TIMED_MODE)
+    for device in devices[20:]:
+        manager.apply_game_mode(device.device_id, MOVEMENT_MODE)
+    assert manager.fleet.mmw_active[:30].all()
+
+    fired = []
+    for _ in range(300):
+        clock.advance(0.016)
+        fired += manager.update_all(0.016)
+
+    assert sorted(fired) == [device.device_id for device in devices]
+    for device in devices:
+        assert not device.led_state.is_on
+        assert device.stats.trigger_count == 1
+        assert 10 <= device.mmwave_state.distance <= 150
+
+
+def test_terminate_stops_radar_and_replay_is_deterministic():
+    """测试终止模式停止雷达；相同种子下触发时刻相同，目标模型参数影响触发时刻"""
+    def run(seed, model=None):
+        clock = VirtualClock()
+        manager = DeviceManager(clock=clock, seed=seed)
+        if model is not None:
+            manager.set_target_model(model)
+        devices = [manager.create_device() for _ in range(5)]
+        for device in devices:
+            manager.apply_game_mode(device.device_id, MOVEMENT_MODE)
+        manager.run_game_mode(devices[0].device_id, TERMINATE_MODE)
+        times = {}
+        for _ in range(400):
+            clock.advance(0.016)
+            for device_id in manager.update_all(0.016):
+                times[device_id] = round(clock.now(), 3)
+        return times
+
+    times = run(5)
+    assert 1 not in times and len(times) == 4
+    assert run(5) == times
+    slow = run(5, TargetModel(speed=50.0))
+    assert all(slow[device_id] > times[device_id] for device_id in times)
+
+    with pytest.raises(ValueError):
+        TargetModel(stop_distance=400.0)
+    assert TargetModel().period == pytest.approx(1 / MMWAVE_FRAME_RATE)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
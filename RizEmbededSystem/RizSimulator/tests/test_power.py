@@ -0,0 +1,99 @@
+"""
+Test Power Model
+电池放电曲线与设备群功耗积分测试
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from clock import VirtualClock
+from constants import (
+    LED_COUNT, RGB_INTENSITY, RGB_REST_INTENSITY, RESTTIMESUP_MODE, RHYTHM_MODE
+)
+from device_manager import DeviceManager
+from power import BatteryModel, adc_from_voltage, raw_percentage, voltage_from_soc
+
+
+def test_firmware_lookup_tables():
+    """测试与固件查找表一致: getRawPercentage 整数插值与端点，_vs 放电曲线"""
+    assert raw_percentage([2000, 2018, 2123, 2065, 2323, 2500]).tolist() == [0, 0, 44, 13, 100, 100]
+    assert voltage_from_soc([0.0, 0.5, 1.0]) == pytest.approx([3.65, 3.9, 4.2])
+    assert adc_from_voltage(3.76) == 2123
+
+    # 电压越低，上报电量越低
+    percent = raw_percentage(adc_from_voltage(voltage_from_soc(np.linspace(0, 1, 50))))
+    assert (np.diff(percent) >= 0).all()
+
+
+def test_current_from_frame_buffer():
+    """测试电流由实际LED帧缓冲、全局亮度、蜂鸣器与雷达状态计算"""
+    model = BatteryModel()
+    manager = DeviceManager(clock=VirtualClock(), battery_model=model)
+    idle, lit = manager.create_device(), manager.create_device()
+    base = model.mcu + model.tof + model.led_idle * LED_COUNT
+
+    lit.config.rhythm_buzzer_time = 0  # 节奏模式蜂鸣不受 buzzer_enabled 控制
+    manager.apply_game_mode(lit.device_id, RHYTHM_MODE, {"rgb": (255, 0, 0)})
+    slots = np.array([idle.slot, lit.slot])
+    led = model.led_channel * LED_COUNT * RGB_INTENSITY / 255
+    assert manager.power.current(slots) == pytest.approx([base, base + led])
+
+    lit.buzzer_active = True
+    lit.mmwave_state.detection_active = True
+    lit.led_state.intensity = RGB_REST_INTENSITY
+    assert manager.power.current(slots)[1] == pytest.approx(
+        base + model.buzzer + model.mmwave + model.led_channel * LED_COUNT)
+
+
+def test_energy_integration_and_time_to_empty():
+    """测试逐帧积分的电量与时间成正比，摘要给出按平均电流预测的剩余时间"""
+    model = BatteryModel(capacity=5.0)
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock, battery_model=model)
+    device = manager.create_device()
+    current = model.mcu + model.tof + model.led_idle * LED_COUNT
+
+    manager.update_all(0.0)
+    for _ in range(600):
+        clock.advance(0.1)
+        manager.update_all(0.1)
+
+    assert device.charge_used == pytest.approx(current * 60 / 3600)
+    battery = manager.get_battery(device.device_id)
+    # 电压随放电下降，能量介于按满电电压与当前电压计算之间
+    assert device.charge_used * battery['voltage'] < battery['energy_used'] < device.charge_used * 4.2
+    summary = manager.get_summary()
+    assert summary['average_current'] == pytest.approx(current)
+    assert summary['time_to_empty'] == pytest.approx((5.0 - device.charge_used) / current * 3600)
+    assert 0 < summary['battery_min'] < 100
+
+    assert DeviceManager(clock=clock).get_summary()['time_to_empty'] is None
+
+
+def test_rest_brightness_drains_faster():
+    """测试休息动画使用最大亮度，结束后恢复默认亮度"""
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock)
+    device = manager.create_device()
+    manager.run_game_mode(device.device_id, RESTTIMESUP_MODE)
+    assert device.led_state.intensity == RGB_REST_INTENSITY
+
+    clock.advance(0.1)
+    manager.update_all(0.1)
+    rest_current = manager.get_battery(device.device_id)['current']
+
+    clock.advance(1.0)
+    manager.update_all(1.0)
+    assert not device.led_state.is_on
+    assert device.led_state.intensity == RGB_INTENSITY
+    assert manager.get_battery(device.device_id)['current'] < rest_current
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,76 @@
+"""
+Test Ring Buffer
+环形缓冲测试
+"""
+
+import random
+import statistics
+import pytest
+import sys
+from pathlib import Path
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from constants import BASELINE_HISTORY_SIZE, MOVING_AVG_SIZE
+from models import TOFSensorState
+from ring_buffer import RingBuffer
+
+
+def test_running_statistics_match_full_scan():
+    """测试增量维护的统计量与全量计算一致"""
+    rng = random.Random(2)
+    buffer = RingBuffer(BASELINE_HISTORY_SIZE, track_median=True)
+    window = []
+    for _ in range(500):
+        value = rng.randint(100, 6000)
+        evicted = buffer.push(value)
+        window.append(value)
+        if len(window) > BASELINE_HISTORY_SIZE:
+            assert evicted == window.pop(0)
+        else:
+            assert evicted is None
+
+        assert list(buffer) == window
+        assert buffer.total == sum(window)
+        assert buffer.mean == sum(window) // len(window)
+        assert buffer.variance == pytest.approx(statistics.pvariance(window))
+        assert buffer.median == statistics.median(window)
+
+
+def test_empty_and_clear():
+    """测试空缓冲与清空"""
+    buffer = RingBuffer(MOVING_AVG_SIZE)
+    assert len(buffer) == 0 and buffer.mean == 0 and buffer.variance == 0.0
+    with pytest.raises(ValueError):
+        buffer.median
+
+    for value in (3, 6, 9, 12):
+        buffer.push(value)
+    assert buffer.full and list(buffer) == [6, 9, 12]
+
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.total == 0
+    buffer.push(5)
+    assert list(buffer) == [5]
+
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_tof_baseline_and_smoothing():
+    """测试TOF基线取最近30个样本，振幅滑动平均取最近3次读数"""
+    tof = TOFSensorState()
+    for amplitude in range(1, 41):
+        tof.add_baseline_sample(amplitude * 100)
+    assert tof.baseline == sum(range(11, 41)) * 100 // BASELINE_HISTORY_SIZE
+
+    assert tof.smoothed_amplitude == tof.amplitude
+    for amplitude in (1000, 2000, 3000, 4000):
+        tof.add_amplitude_sample(amplitude)
+    assert tof.amplitude == 4000
+    assert tof.smoothed_amplitude == 3000
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,98 @@
+"""
+Test Timer Scheduler
+截止时间调度器测试
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from clock import VirtualClock
+from constants import COLOR_TENNIS, DEFAULT_BLINKBREAK
+from device_manager import DeviceManager
+from scheduler import TimerScheduler
+from simulation_engine import SimulationEngine, SimulationMode
+
+
+def test_pop_due_in_deadline_order():
+    """测试按截止时间顺序弹出"""
+    scheduler = TimerScheduler()
+    scheduler.schedule("b", 2.0)
+    scheduler.schedule("a", 1.0)
+    scheduler.schedule("c", 3.0)
+
+    assert scheduler.pop_due(2.5) == ["a", "b"]
+    assert scheduler.next_deadline() == 3.0
+    assert len(scheduler) == 1
+
+
+def test_reschedule_and_cancel():
+    """测试重新调度覆盖旧截止时间，取消后不再弹出"""
+    scheduler = TimerScheduler()
+    scheduler.schedule(1, 1.0)
+    scheduler.schedule(1, 5.0)
+    scheduler.schedule(2, 1.0)
+    scheduler.cancel(2)
+
+    assert scheduler.pop_due(2.0) == []
+    assert scheduler.get_deadline(1) == 5.0
+    assert scheduler.pop_due(5.0) == [1]
+
+
+def test_idle_devices_not_updated():
+    """测试空闲设备不会被唤醒"""
+    manager = DeviceManager(clock=VirtualClock())
+    devices = [manager.create_device() for _ in range(5)]
+    updated = []
+    for device in devices:
+        controller = manager.get_controller(device.device_id)
+        original = controller.update
+        controller.update = lambda dt, d=device.device_id, f=original: (updated.append(d), f(dt))
+
+    engine = SimulationEngine(manager, mode=SimulationMode.AS_FAST_AS_POSSIBLE)
+    engine.run(1.0)
+    assert updated == []
+
+    manager.send_message_to_device(devices[2].device_id, "5,255,0,0,0,1,1")
+    engine.run(1.0)
+    assert set(updated) == {devices[2].device_id}
+    assert len(manager.scheduler) == 0
+
+
+def test_rest_animation_ends_on_deadline():
+    """测试休息动画在截止时间结束"""
+    manager = DeviceManager(clock=VirtualClock())
+    device = manager.create_device()
+    engine = SimulationEngine(manager, mode=SimulationMode.AS_FAST_AS_POSSIBLE)
+
+    manager.send_message_to_device(device.device_id, "14")
+    engine.run(DEFAULT_BLINKBREAK / 2000)
+    assert device.led_state.is_on
+    assert device.led_state.inner_ring[0] == (0, 0, 0)
+    assert device.led_state.inner_ring[-1] == COLOR_TENNIS
+
+    engine.run(DEFAULT_BLINKBREAK / 1000)
+    assert not device.led_state.is_on
+    assert len(manager.scheduler) == 0
+
+
+def test_config_light_stays_on():
+    """测试配置白光常亮，蜂鸣器结束后不再唤醒"""
+    manager = DeviceManager(clock=VirtualClock())
+    device = manager.create_device()
+    engine = SimulationEngine(manager, mode=SimulationMode.AS_FAST_AS_POSSIBLE)
+
+    manager.send_message_to_device(device.device_id, "config:2")
+    controller = manager.get_controller(device.device_id)
+    assert not controller.animation_running
+
+    engine.run(2.0)
+    assert device.led_state.is_on
+    assert len(manager.scheduler) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,97 @@
+"""
+Test Session Record & Replay
+会话录制与重放测试
+"""
+
+import random
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from clock import VirtualClock
+from constants import CHARACTERISTIC_MSG_UUID, RHYTHM_MODE
+from device_manager import DeviceManager
+from session_log import SessionEvent, read_session
+from session_replay import SessionReplayer
+
+
+def _record_session(path, ticks=600):
+    """录制一段包含各类输入的会话，返回 (管理器, 每帧触发记录)"""
+    rng = random.Random(3)
+    manager = DeviceManager(clock=VirtualClock(), seed=11)
+    manager.start_recording(path)
+    for _ in range(6):
+        device = manager.create_device()
+        manager.update_distance(device.device_id, 100)
+    manager.connect_device(1)
+    manager.start_animation(2, "init")
+
+    fired = []
+    for tick in range(ticks):
+        if tick % 20 == 0:
+            device_id = rng.choice(list(manager.devices))
+            action = rng.randrange(5)
+            if action == 0:
+                manager.send_message_to_device(device_id, rng.choice(["1", "2", "14", "5,10,20,30,0,0,1"]))
+            elif action == 1:
+                manager.update_distance(device_id, rng.choice([100, 1000]))
+            elif action == 2:
+                manager.trigger_device(device_id)
+            elif action == 3:
+                manager.apply_game_mode(device_id, RHYTHM_MODE, {"rgb": (1, 2, 3)})
+            else:
+                manager.simulate_touch(device_id)
+        manager.clock.advance(0.016)
+        fired.append(manager.update_all(0.016))
+
+    manager.stop_recording()
+    return manager, fired
+
+
+def test_replay_reproduces_outputs(tmp_path):
+    """测试重放得到相同的LED状态与逐帧触发结果"""
+    path = tmp_path / "session.rizses"
+    original, fired = _record_session(path)
+
+    replayer = SessionReplayer(path)
+    replayed_fired = []
+    replayer.tick_callback = lambda t, ids: replayed_fired.append(ids)
+    replayed = replayer.replay()
+
+    assert replayed_fired == fired
+    assert any(fired)
+    assert np.array_equal(replayed.fleet.leds, original.fleet.leds)
+    assert replayed.get_summary()['total_triggers'] == original.get_summary()['total_triggers']
+
+
+def test_recording_format(tmp_path):
+    """测试事件编码往返与录制中断时的截断容错"""
+    path = tmp_path / "session.rizses"
+    manager = DeviceManager(clock=VirtualClock(), seed=7)
+    manager.start_recording(path)
+    manager.create_device()
+    manager.send_message_to_device(1, "config:2")
+    manager.apply_game_mode(1, 5, {"rgb": (1, 2, 3)})
+    manager.stop_recording()
+
+    seed, records = read_session(path)
+    assert seed == 7
+    assert [r.kind for r in records] == [SessionEvent.CREATE, SessionEvent.BLE_WRITE, SessionEvent.APPLY_MODE]
+    assert records[1].value == (CHARACTERISTIC_MSG_UUID, b"config:2")
+    assert records[2].value == (5, {"rgb": [1, 2, 3]})
+
+    data = path.read_bytes()
+    path.write_bytes(data[:-3])
+    assert len(read_session(path)[1]) == 2
+
+    with pytest.raises(ValueError):
+        manager.start_recording(tmp_path / "late.rizses")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,177 @@
+"""
+Test Session Store
+SQLite 会话存储的写入、历史查询、组提交吞吐与设备管理器持久化测试
+"""
+
+import sqlite3
+import threading
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from clock import VirtualClock
+from constants import MANUAL_MODE, RHYTHM_MODE
+from device_manager import DeviceManager
+from session_store import SessionStore
+from throughput_benchmark import store_throughput
+
+DAY = 86400.0
+
+
+def _triggers(n: int, device_ids, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    latency = rng.uniform(100, 900, n)
+    latency[::10] = np.nan
+    return {
+        'device_id': rng.choice(device_ids, n).astype(np.int32),
+        'mode': np.full(n, MANUAL_MODE, dtype=np.int32),
+        'color': rng.integers(0, 256, (n, 3)).astype(np.uint8),
+        'light_on_ns': np.arange(n, dtype=np.int64) * 1000,
+        'detect_ns': np.arange(n, dtype=np.int64) * 1000 + 500,
+        'latency': latency,
+        'distance': rng.integers(0, 8000, n).astype(np.int32),
+        'amplitude': rng.integers(0, 1000, n).astype(np.int32),
+        'sensor': np.ones(n, dtype=np.int8),
+    }
+
+
+def test_history_across_sessions(tmp_path):
+    """测试按设备MAC与运动员跨会话查询，时间范围按会话开始时刻过滤，NaN 反应时间存为 NULL"""
+    store = SessionStore(tmp_path / "sessions.db")
+    sessions = []
+    for week in range(3):
+        session_id = store.begin_session(seed=week, athlete="alice" if week < 2 else "bob",
+                                         started_at=week * 7 * DAY)
+        store.add_devices(session_id, [(1, "RIZ-0001", "AA:00"), (2, "RIZ-0002", f"BB:0{week}")])
+        store.add_triggers(session_id, _triggers(100, [1, 2], seed=week))
+        store.add_mode_changes(session_id, np.array([1, 2]), 1.5, np.array([MANUAL_MODE, RHYTHM_MODE]))
+        store.end_session(session_id, ended_at=week * 7 * DAY + 3600)
+        sessions.append(session_id)
+    assert store.flush(timeout=5)
+
+    history = store.device_history("AA:00")
+    expected = sum(np.count_nonzero(_triggers(100, [1, 2], seed=week)['device_id'] == 1) for week in range(3))
+    assert len(history['detect_ns']) == expected
+    assert set(history['session_id'].tolist()) == set(sessions)
+    assert np.all(np.diff(history['started_at']) >= 0)
+    assert np.isnan(history['latency']).any()
+
+    recent = store.device_history("AA:00", since=7 * DAY)
+    assert set(recent['session_id'].tolist()) == set(sessions[1:])
+    alice = store.athlete_history("alice")
+    assert set(alice['session_id'].tolist()) == set(sessions[:2]) and len(alice['detect_ns']) == 200
+    assert len(store.device_history("CC:00")['detect_ns']) == 0
+
+    listed = store.sessions("alice")
+    assert [s['id'] for s in listed] == sessions[:2]
+    assert listed[0]['triggers'] == 100 and listed[0]['ended_at'] == 3600
+    assert store.mode_changes(sessions[0], device_id=2) == [(2, 1.5, RHYTHM_MODE)]
+
+    # 历史查询使用索引，不扫描整张触发表
+    plan = store._reader().execute("EXPLAIN QUERY PLAN SELECT * FROM triggers WHERE session_id = ? "
+                                   "AND device_id = ?", ("x", 1)).fetchall()
+    assert any("idx_triggers_device" in row[-1] for row in plan)
+    store.close()
+
+    # 重新打开后数据仍在，日志为 WAL 模式
+    reopened = SessionStore(tmp_path / "sessions.db")
+    assert len(reopened.sessions()) == 3
+    assert reopened._reader().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    reopened.close()
+    with pytest.raises(ValueError):
+        reopened.begin_session()
+
+
+def test_group_commit(tmp_path):
+    """测试多批触发记录由后台组提交全部写入，flush 后可查询到"""
+    store = SessionStore(tmp_path / "sessions.db", flush_interval=0.05)
+    session_id = store.begin_session()
+    for i in range(20):
+        store.add_triggers(session_id, _triggers(1000, [1, 2, 3], seed=i))
+    assert store.flush(timeout=30)
+
+    assert store.sessions()[0]['triggers'] == 20000
+    assert store.rows_written == 20000 + 1
+    store.close()
+
+
+def test_throughput_benchmark(tmp_path):
+    """测试吞吐基准写入并提交全部行（每秒行数随机器负载变化，不作断言）"""
+    row = store_throughput(batches=3, batch_size=100, path=tmp_path / "bench.db")
+    assert row["items"] == 300 and row["per_second"] > 0
+
+
+def test_close_and_writer_failure(tmp_path):
+    """测试 close 关闭各线程的只读连接；写线程异常退出后 flush 不再阻塞，写入与 flush 抛出该异常"""
+    store = SessionStore(tmp_path / "sessions.db")
+    store.begin_session()
+    assert store.flush(timeout=5)
+    readers = [store._reader()]
+    thread = threading.Thread(target=lambda: readers.append(store._reader()))
+    thread.start()
+    thread.join()
+    assert readers[0] is not readers[1]
+    store.close()
+    for reader in readers:
+        with pytest.raises(sqlite3.ProgrammingError):
+            reader.execute("SELECT 1")
+    with pytest.raises(ValueError):
+        store.sessions()
+
+    failing = SessionStore(tmp_path / "failing.db")
+
+    def fail(connection, batches):
+        raise RuntimeError("磁盘故障")
+
+    failing._commit = fail
+    session_id = failing.begin_session()
+    with pytest.raises(RuntimeError):
+        failing.flush()
+    with pytest.raises(RuntimeError):
+        failing.flush()
+    with pytest.raises(RuntimeError):
+        failing.end_session(session_id)
+    failing.close()
+
+
+def test_manager_persists_session(tmp_path):
+    """测试设备管理器每帧写入新的触发记录与模式切换，结束会话后写入剩余记录"""
+    store = SessionStore(tmp_path / "sessions.db")
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock)
+    early = manager.create_device()
+    manager.apply_game_mode(early.device_id, MANUAL_MODE)
+    manager.trigger_device(early.device_id)  # 开始持久化前的记录不写入
+
+    session_id = manager.start_persistence(store, athlete="alice")
+    late = manager.create_device()
+    for device in (early, late):
+        clock.advance(5.0)
+        manager.update_all(5.0)
+        manager.apply_game_mode(device.device_id, MANUAL_MODE)
+        clock.advance(0.3)
+        manager.trigger_device(device.device_id)
+        manager.update_all(0.0)
+    manager.stop_persistence()
+    assert manager.store is None and manager.fsm.on_enter is None
+    assert store.flush(timeout=5)
+
+    history = store.athlete_history("alice")
+    assert history['device_id'].tolist() == [early.device_id, late.device_id]
+    assert history['latency'] == pytest.approx([300, 300])
+    assert history['mac'].tolist() == [early.mac_address, late.mac_address]
+    changes = store.mode_changes(session_id)
+    assert [(device_id, mode) for device_id, _, mode in changes] == [(early.device_id, MANUAL_MODE),
+                                                                    (late.device_id, MANUAL_MODE)]
+    assert [at for _, at, _ in changes] == pytest.approx([5.0, 10.3])
+    assert store.sessions()[0]['ended_at'] is not None
+    store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,60 @@
+"""
+Test Sharded Simulation
+多进程分片仿真测试
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from constants import COLOR_NEON_GREEN
+from fleet_state import FleetState, column_layout, columns_from_buffer
+from sharded_simulation import ShardedSimulation
+
+
+def test_fleet_on_external_buffer():
+    """测试FleetState使用外部缓冲区且容量固定"""
+    _, nbytes = column_layout(4)
+    buffer = bytearray(nbytes)
+    fleet = FleetState(4, columns=columns_from_buffer(buffer, 4))
+    for i in range(4):
+        fleet.allocate(i)
+    fleet.fill_leds([1], (1, 2, 3))
+
+    reader = columns_from_buffer(buffer, 4)
+    assert tuple(reader['leds'][1, 0]) == (1, 2, 3)
+    assert reader['in_use'].all()
+    with pytest.raises(ValueError):
+        fleet.allocate(4)
+
+
+def test_sharded_fleet():
+    """测试分片推进、命令广播与共享内存读取"""
+    with ShardedSimulation(7, shard_count=2, seed=1) as sim:
+        assert [shard.device_count for shard in sim.shards] == [4, 3]
+
+        sim.connect()
+        sim.run(2.0)
+        assert sim.summary()['connected'] == 7
+        assert sim.summary()['active_devices'] == 0
+
+        sim.broadcast("2")
+        sim.run(0.2)
+        assert sim.summary()['active_devices'] == 7
+        assert tuple(sim.device_leds(6)[0]) == COLOR_NEON_GREEN
+        assert not sim.device_leds(6).flags.writeable
+
+        sim.set_distance(6, 100)
+        fired = [device_id for _ in range(5) for device_id in sim.step()]
+        assert fired == [6]
+        assert sim.summary()['active_devices'] == 6
+        assert not np.any(sim.device_leds(6))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
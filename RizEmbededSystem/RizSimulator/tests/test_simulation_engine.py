@@ -0,0 +1,140 @@
+"""
+Test Simulation Engine
+仿真引擎测试
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from clock import VirtualClock, ScaledClock
+from constants import COOLDOWN_DURATION, DEFAULT_BUZZERTIME
+from device_manager import DeviceManager
+from simulation_engine import SimulationEngine, SimulationMode
+
+
+def test_fixed_step_advances_sim_time():
+    """测试固定步长推进"""
+    engine = SimulationEngine(DeviceManager(clock=VirtualClock()), step_size=0.01)
+
+    engine.step()
+    engine.step()
+
+    assert engine.tick_count == 2
+    assert engine.sim_time == pytest.approx(0.02)
+
+
+def test_tick_listener_called():
+    """测试每帧回调"""
+    engine = SimulationEngine(DeviceManager(clock=VirtualClock()), step_size=0.01)
+    deltas = []
+    engine.add_tick_listener(deltas.append)
+
+    engine.step()
+    engine.step(0.05)
+    engine.remove_tick_listener(deltas.append)
+    engine.step()
+
+    assert deltas == [0.01, 0.05]
+
+
+def test_as_fast_as_possible_run():
+    """测试最快速度运行多设备"""
+    manager = DeviceManager(max_devices=200, clock=VirtualClock())
+    for _ in range(200):
+        manager.create_device()
+
+    engine = SimulationEngine(manager, mode=SimulationMode.AS_FAST_AS_POSSIBLE, step_size=0.1)
+    summary = engine.run(10.0)
+
+    assert summary['ticks'] == 100
+    assert engine.sim_time == pytest.approx(10.0)
+
+
+def test_stop_from_listener():
+    """测试在回调中停止运行"""
+    engine = SimulationEngine(DeviceManager(clock=VirtualClock()), mode=SimulationMode.AS_FAST_AS_POSSIBLE)
+    engine.add_tick_listener(lambda dt: engine.tick_count >= 5 and engine.stop())
+
+    summary = engine.run(100.0)
+
+    assert summary['ticks'] == 5
+
+
+def test_invalid_step_size():
+    """测试非法步长"""
+    with pytest.raises(ValueError):
+        SimulationEngine(DeviceManager(clock=VirtualClock()), step_size=0)
+
+
+def test_default_manager_uses_virtual_clock():
+    """测试未传入设备管理器时非实时模式使用虚拟时钟，蜂鸣器按仿真时间结束；传入墙钟设备管理器时拒绝"""
+    engine = SimulationEngine(mode=SimulationMode.AS_FAST_AS_POSSIBLE)
+    manager = engine.device_manager
+    assert isinstance(manager.clock, VirtualClock)
+
+    device = manager.create_device()
+    manager.send_message_to_device(device.device_id, "1")
+    assert device.buzzer_active
+    engine.run(3.0)
+    assert manager.clock.now() == pytest.approx(3.0)
+    assert not device.buzzer_active
+
+    assert not isinstance(SimulationEngine(mode=SimulationMode.REAL_TIME).device_manager.clock, VirtualClock)
+    for mode in (SimulationMode.FIXED_STEP, SimulationMode.AS_FAST_AS_POSSIBLE):
+        with pytest.raises(ValueError):
+            SimulationEngine(DeviceManager(), mode=mode)
+    SimulationEngine(DeviceManager(), mode=SimulationMode.REAL_TIME)
+
+
+def test_virtual_clock():
+    """测试虚拟时钟"""
+    clock = VirtualClock()
+    clock.advance(1.5)
+    assert clock.now() == 1.5
+
+    with pytest.raises(ValueError):
+        clock.advance(-1)
+    with pytest.raises(ValueError):
+        clock.set(1.0)
+
+
+def test_scaled_clock():
+    """测试缩放时钟"""
+    base = VirtualClock()
+    clock = ScaledClock(scale=100.0, base=base)
+
+    base.advance(0.5)
+    assert clock.now() == pytest.approx(50.0)
+
+    clock.set_scale(2.0)
+    base.advance(1.0)
+    assert clock.now() == pytest.approx(52.0)
+
+
+def test_engine_drives_virtual_clock_timers():
+    """测试引擎推进虚拟时钟驱动蜂鸣器和TOF冷却"""
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock)
+    device = manager.create_device()
+    engine = SimulationEngine(manager, mode=SimulationMode.AS_FAST_AS_POSSIBLE, step_size=0.01)
+
+    manager.send_message_to_device(device.device_id, "5,255,0,0,0,1,1")
+    assert device.buzzer_active
+
+    engine.run(DEFAULT_BUZZERTIME / 1000 + 0.02)
+    assert not device.buzzer_active
+
+    manager.get_tof_controller(device.device_id).simulate_touch()
+    assert device.tof_state.is_cooldown
+    assert device.stats.trigger_count == 1
+
+    engine.run(COOLDOWN_DURATION / 1000 + 0.02)
+    assert not device.tof_state.is_cooldown
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
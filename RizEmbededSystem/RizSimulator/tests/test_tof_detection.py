@@ -0,0 +1,93 @@
+"""
+Test TOF Batch Detection
+TOF批量检测测试
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from clock import VirtualClock
+from constants import CONSECUTIVE_READINGS, COOLDOWN_DURATION, AMPLITUDE_THRESHOLD
+from device_manager import DeviceManager
+from fleet_state import FleetState
+from tof_detection import detect_batch
+
+
+def _armed_fleet(count: int) -> FleetState:
+    fleet = FleetState(capacity=count)
+    for i in range(count):
+        slot = fleet.allocate(i + 1)
+        fleet.detection_active[slot] = True
+    return fleet
+
+
+def test_consecutive_readings_required():
+    """测试连续读数达到阈值才触发"""
+    fleet = _armed_fleet(3)
+    fleet.amplitude[:3] = [AMPLITUDE_THRESHOLD + 1, AMPLITUDE_THRESHOLD + 1, 0]
+
+    for _ in range(CONSECUTIVE_READINGS - 1):
+        assert len(detect_batch(fleet, 0.0)) == 0
+
+    assert list(detect_batch(fleet, 0.0)) == [0, 1]
+    assert fleet.consecutive[2] == 0
+
+
+def test_threshold_follows_baseline():
+    """测试阈值随基线更新"""
+    fleet = _armed_fleet(1)
+    fleet.set_baseline(0, 10000)
+    fleet.amplitude[0] = 10300
+
+    for _ in range(CONSECUTIVE_READINGS):
+        fired = detect_batch(fleet, 0.0)
+    assert len(fired) == 0
+
+    fleet.amplitude[0] = 10500
+    for _ in range(CONSECUTIVE_READINGS):
+        fired = detect_batch(fleet, 0.0)
+    assert list(fired) == [0]
+
+
+def test_cooldown_blocks_then_expires():
+    """测试冷却期内不检测，到期后恢复"""
+    fleet = _armed_fleet(1)
+    fleet.amplitude[0] = AMPLITUDE_THRESHOLD + 1
+    fleet.is_cooldown[0] = True
+    fleet.cooldown_until[0] = 1.0
+    fleet.consecutive[0] = 2
+
+    assert len(detect_batch(fleet, 0.5)) == 0
+    assert fleet.consecutive[0] == 2
+
+    detect_batch(fleet, 1.0)
+    assert not fleet.is_cooldown[0]
+    assert fleet.consecutive[0] == 1
+
+
+def test_manager_dispatches_only_fired_devices():
+    """测试管理器只对触发设备关灯并进入冷却"""
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock)
+    devices = [manager.create_device() for _ in range(3)]
+
+    for device in devices:
+        manager.send_message_to_device(device.device_id, "5,0,255,0,0,0,1")
+    devices[1].tof_state.amplitude = AMPLITUDE_THRESHOLD + 500
+
+    for _ in range(CONSECUTIVE_READINGS):
+        manager.update_all(0.016)
+
+    assert not devices[1].led_state.is_on
+    assert devices[1].tof_state.is_cooldown
+    assert devices[1].tof_state.cooldown_until == pytest.approx(COOLDOWN_DURATION / 1000)
+    assert devices[1].stats.trigger_count == 1
+    assert devices[0].led_state.is_on and devices[2].led_state.is_on
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
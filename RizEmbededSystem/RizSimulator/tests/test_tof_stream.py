@@ -0,0 +1,153 @@
+"""
+Test TOF Signal Stream
+TF-Luna 信号流与固件动态基线检测器测试
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from clock import VirtualClock
+from constants import BASELINE_HISTORY_SIZE, COOLDOWN_DURATION, MOVING_AVG_SIZE
+from device_manager import DeviceManager
+from fleet_state import FleetState
+from session_replay import SessionReplayer
+from tof_stream import SignalModel, TOFStream
+
+# 无噪声、无漂移、振幅立即跟随距离，便于逐帧验证
+EXACT = SignalModel(sample_rate=250, ambient=1000, ambient_spread=0, ambient_drift=0,
+                    noise=0, approach_time=1e-6)
+PERIOD = 1 / 250
+
+
+def _stream(count: int = 1, model: SignalModel = EXACT):
+    fleet = FleetState(capacity=count)
+    for i in range(count):
+        slot = fleet.allocate(i + 1)
+        fleet.detection_active[slot] = True
+    return fleet, TOFStream(fleet, model, np.random.default_rng(0))
+
+
+def test_crossing_confirmed_on_next_frame():
+    """测试越过阈值的下一帧才触发，冷却从越过阈值的帧开始计时"""
+    fleet, stream = _stream(2)
+    stream.step(0.0)
+    assert fleet.baseline[0] == 1000 and fleet.threshold[0] == 1090
+
+    assert len(stream.step(0.1)) == 0
+    fleet.distance[0] = 400  # 振幅 1200, +20%
+    crossing = 0.1 + PERIOD
+    assert len(stream.step(crossing)) == 0
+    assert fleet.tof_pending[0]
+    assert fleet.cooldown_until[0] == pytest.approx(crossing + COOLDOWN_DURATION / 1000)
+
+    assert list(stream.step(crossing + PERIOD)) == [0]
+    assert not fleet.tof_armed[0] and not fleet.tof_pending[0]
+
+
+def test_small_change_does_not_trigger():
+    """测试偏离不超过9%时不触发"""
+    fleet, stream = _stream()
+    stream.step(0.0)
+    fleet.distance[0] = 460  # 振幅 1080, +8%
+    assert len(stream.step(1.0)) == 0
+
+
+def test_baseline_waits_for_fresh_frames_after_cooldown():
+    """测试冷却结束后攒够新帧才重算动态基线"""
+    fleet, stream = _stream()
+    fleet.cooldown_until[0] = 0.2 - PERIOD / 2
+    stream.step(0.0)
+    fleet.distance[0] = 475  # 振幅 1050，作为新的环境振幅
+    stream.step(0.2 - PERIOD)
+    assert fleet.history_index[0] == 0  # 冷却期内不写入缓冲
+    assert fleet.baseline[0] == 1000
+
+    # 冷却结束后第30帧才满足新帧条件（framesProcessed 已超过30）
+    stream.step(0.2 + (BASELINE_HISTORY_SIZE - 2) * PERIOD)
+    assert fleet.baseline[0] == 1000
+    stream.step(0.2 + (BASELINE_HISTORY_SIZE - 1) * PERIOD)
+    assert fleet.baseline[0] == 1050
+
+
+def test_ring_buffer_running_sum():
+    """测试环形缓冲累加和与滑动平均，范围外振幅不进入缓冲"""
+    model = SignalModel(ambient=1000, ambient_spread=0, ambient_drift=0, noise=0.02)
+    fleet, stream = _stream(3, model)
+    fleet.tof_ambient[2] = 50  # 低于有效振幅下限
+    fleet.tof_level[2] = 50
+    stream.step(0.0)
+    stream.step(0.5)
+
+    assert fleet.history_filled[0]
+    assert fleet.history_sum[0] == fleet.amp_history[0].sum()
+    assert fleet.history_sum[1] == fleet.amp_history[1].sum()
+    assert fleet.history_index[2] == 0 and fleet.history_sum[2] == 0
+
+    _, amplitude = stream.moving_average([0])
+    assert amplitude[0] == fleet.amp_window[0].sum() // MOVING_AVG_SIZE
+
+
+def test_noise_does_not_false_trigger():
+    """测试带噪声与环境漂移时长时间无误触发，手部靠近后及时触发"""
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock, seed=5, signal_model=SignalModel(sample_rate=100))
+    devices = [manager.create_device() for _ in range(20)]
+    for device in devices:
+        manager.send_message_to_device(device.device_id, "5,0,255,0,0,0,1")
+
+    for _ in range(600):
+        clock.advance(0.05)
+        assert manager.update_all(0.05) == []
+
+    manager.update_distance(devices[3].device_id, 100)
+    clock.advance(0.05)
+    assert manager.update_all(0.05) == [devices[3].device_id]
+    assert not devices[3].led_state.is_on
+    assert devices[3].stats.trigger_count == 1
+
+
+def test_replay_with_signal_model(tmp_path):
+    """测试信号流随会话录制，重放结果一致"""
+    path = tmp_path / "stream.rizses"
+    manager = DeviceManager(clock=VirtualClock(), seed=3, signal_model=SignalModel())
+    manager.start_recording(path)
+    for _ in range(4):
+        device = manager.create_device()
+        manager.send_message_to_device(device.device_id, "5,0,255,0,0,0,1")
+
+    fired = []
+    for tick in range(300):
+        if tick % 50 == 25:
+            manager.update_distance(tick // 50 % 4 + 1, 150)
+        if tick % 50 == 45:
+            manager.send_message_to_device(tick // 50 % 4 + 1, "5,0,255,0,0,0,1")
+        manager.clock.advance(0.016)
+        fired.append(manager.update_all(0.016))
+    manager.stop_recording()
+
+    replayer = SessionReplayer(path)
+    replayed_fired = []
+    replayer.tick_callback = lambda t, ids: replayed_fired.append(ids)
+    replayed = replayer.replay()
+
+    assert any(fired)
+    assert replayed_fired == fired
+    assert np.array_equal(replayed.fleet.amplitude, manager.fleet.amplitude)
+
+
+def test_signal_model_validation():
+    """测试信号模型参数校验"""
+    with pytest.raises(ValueError):
+        SignalModel(sample_rate=0)
+    with pytest.raises(ValueError):
+        SignalModel(ambient=-1)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,146 @@
+"""
+Test TF-Luna UART Capture
+TF-Luna 串口抓包解析与回放测试
+"""
+
+import random
+import struct
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from clock import VirtualClock
+from device_manager import DeviceManager
+from tof_stream import SignalModel
+from tof_uart import FRAME_SIZE, CaptureReplay, parse_frames, read_capture
+
+
+def _frame(distance: int, amplitude: int, temperature: float = 25.0) -> bytes:
+    body = struct.pack("<BBHHH", 0x59, 0x59, distance, amplitude, int((temperature + 256) * 8))
+    return body + bytes([sum(body) & 0xFF])
+
+
+def _capture(count: int, seed: int = 0):
+    """带噪声的抓包: 帧之间插入随机垃圾字节，部分帧损坏，返回 (数据, 有效帧的 (偏移, 距离, 振幅))"""
+    rng = random.Random(seed)
+    data = bytearray()
+    expected = []
+    for i in range(count):
+        if rng.random() < 0.1:
+            data += bytes(rng.randrange(256) for _ in range(rng.randrange(1, 12)))
+        frame = _frame(rng.randrange(1, 800), rng.randrange(100, 6000))
+        if rng.random() < 0.05:
+            frame = frame[:8] + bytes([(frame[8] + 1) & 0xFF])
+        else:
+            expected.append((len(data),) + struct.unpack_from("<HH", frame, 2))
+        data += frame
+    return bytes(data), expected
+
+
+def test_parse_clean_stream():
+    """测试连续有效帧: 距离/振幅/温度与固件 parseFrame 一致，末尾不完整的帧被忽略"""
+    data = b"".join(_frame(d, 1000 + d, 30.0) for d in range(100)) + _frame(5, 5)[:5]
+    frames = parse_frames(memoryview(data))
+
+    assert len(frames) == 100
+    assert frames.offset.tolist() == list(range(0, 100 * FRAME_SIZE, FRAME_SIZE))
+    assert frames.distance.tolist() == list(range(100))
+    assert frames.amplitude.tolist() == [1000 + d for d in range(100)]
+    assert (frames.temperature == 30).all()
+    assert frames.checksum_errors == 0
+
+
+def test_resync_and_checksum():
+    """测试在垃圾字节后重新同步帧头，校验失败的帧被丢弃并计数"""
+    data, expected = _capture(2000)
+    frames = parse_frames(data)
+
+    assert list(zip(frames.offset.tolist(), frames.distance.tolist(), frames.amplitude.tolist())) == expected
+    assert frames.checksum_errors >= 2000 - len(expected) - 5
+
+
+def test_chunk_boundaries():
+    """测试分块扫描与整段扫描结果一致（帧跨块边界）"""
+    data, _ = _capture(500, seed=1)
+    whole = parse_frames(data)
+    for chunk_size in (FRAME_SIZE, 31, 1000):
+        chunked = parse_frames(data, chunk_size=chunk_size)
+        assert np.array_equal(chunked.offset, whole.offset)
+        assert np.array_equal(chunked.amplitude, whole.amplitude)
+        assert chunked.checksum_errors == whole.checksum_errors
+
+
+def test_payload_header_not_counted():
+    """测试有效帧载荷中的 0x59 0x59 不被当作帧或错误"""
+    data = _frame(0x5959, 0x5959) * 3
+    frames = parse_frames(data)
+    assert len(frames) == 3 and frames.checksum_errors == 0
+
+
+def test_read_capture_file(tmp_path):
+    """测试 mmap 读取抓包文件"""
+    data, expected = _capture(300, seed=2)
+    path = tmp_path / "tof.bin"
+    path.write_bytes(data)
+    assert len(read_capture(path)) == len(expected)
+
+    empty = tmp_path / "empty.bin"
+    empty.write_bytes(b"")
+    assert len(read_capture(empty)) == 0
+
+
+def test_replay_into_controller():
+    """测试抓包按帧率回放到TOF控制器，结束后停止"""
+    frames = parse_frames(b"".join(_frame(10 + i, 1000 + i) for i in range(50)))
+    replay = CaptureReplay(frames, start_time=1.0, sample_rate=100)
+    assert replay.index_at(0.5) == 0 and replay.index_at(1.105) == 10
+    assert replay.end_time == pytest.approx(1.49)
+
+    clock = VirtualClock(1.0)
+    manager = DeviceManager(clock=clock)
+    device = manager.create_device()
+    manager.start_capture_replay(device.device_id, frames, sample_rate=100)
+
+    clock.advance(0.1)
+    manager.update_all(0.1)
+    assert device.tof_state.distance == 200
+    assert device.tof_state.amplitude == 1010
+    assert device.tof_state.smoothed_amplitude == 1009
+
+    clock.advance(1.0)
+    manager.update_all(1.0)
+    assert device.tof_state.amplitude == 1049
+    assert manager.get_tof_controller(device.device_id).replay is None
+
+
+def test_replay_through_firmware_detector():
+    """测试信号流模式下抓包振幅逐帧送入固件检测器"""
+    quiet = [_frame(100, 1000)] * 100
+    hand = [_frame(20, 1500)] * 20
+    frames = parse_frames(b"".join(quiet + hand))
+
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock, seed=1, signal_model=SignalModel())
+    device = manager.create_device()
+    manager.start_capture_replay(device.device_id, frames, sample_rate=250)
+    manager.send_message_to_device(device.device_id, "5,0,255,0,0,0,1")
+
+    fired_at = None
+    for tick in range(40):
+        clock.advance(0.016)
+        if manager.update_all(0.016):
+            fired_at = clock.now()
+            break
+
+    # 第100帧 (0.4s) 越过阈值，下一帧确认
+    assert fired_at == pytest.approx(0.416)
+    assert device.tof_state.baseline == 1000
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,129 @@
+"""
+Test Trigger Log
+列式触发日志的记录、分组统计与导出测试
+"""
+
+import csv
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from clock import VirtualClock
+from constants import COLOR_PALE_BLUE, MANUAL_MODE, MOVEMENT_MODE
+from device_manager import DeviceManager
+from mmwave import TargetModel
+from trigger_log import PYARROW_AVAILABLE, SENSOR_MMWAVE, SENSOR_TOF, TriggerLog
+
+
+def _random_log(n: int, seed: int = 0) -> TriggerLog:
+    rng = np.random.default_rng(seed)
+    latency = rng.uniform(100, 900, n)
+    latency[rng.random(n) < 0.1] = np.nan
+    log = TriggerLog(capacity=16)
+    log.extend({
+        'device_id': rng.integers(1, 50, n),
+        'mode': rng.choice([1, 2, 5, 7], n),
+        'detect_ns': np.sort(rng.integers(0, 60 * 10 ** 9, n)),
+        'latency': latency,
+        'sensor': rng.choice([SENSOR_TOF, SENSOR_MMWAVE], n),
+    })
+    return log
+
+
+def test_detections_are_logged():
+    """测试TOF与雷达触发各追加一行: 设备、点亮时的模式与颜色、时间戳与反应时间"""
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock, seed=3)
+    manager.set_target_model(TargetModel(reaction_time=1.0, reaction_spread=0.0, noise=0.0))
+    touch, radar = manager.create_device(), manager.create_device()
+
+    touch.config.process = 60
+    manager.apply_game_mode(touch.device_id, MANUAL_MODE)
+    manager.apply_game_mode(radar.device_id, MOVEMENT_MODE, {"rgb": (10, 20, 30)})
+    clock.advance(0.4)
+    manager.trigger_device(touch.device_id)
+    for _ in range(10):
+        clock.advance(0.25)
+        manager.update_all(0.25)
+
+    # 灯灭后强制触发，没有反应时间
+    clock.advance(5.0)
+    manager.update_all(5.0)
+    touch.tof_state.detection_active = True
+    manager.get_tof_controller(touch.device_id).simulate_touch()
+
+    log = manager.trigger_log
+    assert len(log) == 3
+    assert log.column('device_id').tolist() == [touch.device_id, radar.device_id, touch.device_id]
+    assert log.column('mode').tolist() == [MANUAL_MODE, MOVEMENT_MODE, MANUAL_MODE]
+    assert log.column('sensor').tolist() == [SENSOR_TOF, SENSOR_MMWAVE, SENSOR_TOF]
+    assert log.column('color')[:2].tolist() == [list(COLOR_PALE_BLUE), [10, 20, 30]]
+    assert log.column('latency')[0] == pytest.approx(400)
+    assert log.column('latency')[1] == pytest.approx(radar.stats.reactions.total)
+    assert log.column('detect_ns')[1] == round(radar.tof_state.last_detection_time * 1e9)
+    assert np.isnan(log.column('latency')[2]) and log.column('light_on_ns')[2] == -1
+
+
+def test_group_by_matches_brute_force():
+    """测试按设备/模式/时间分桶的向量化分组与逐行统计一致"""
+    log = _random_log(20000)
+    columns = log.columns()
+
+    for by, bucket in [('device_id', None), ('mode', None), ('time', 5.0)]:
+        result = log.group_by(by, bucket)
+        keys = columns['detect_ns'] // (5 * 10 ** 9) if by == 'time' else columns[by]
+        expected_keys = np.unique(keys)
+        assert result['key'].tolist() == (expected_keys * 5.0 if by == 'time' else expected_keys).tolist()
+        for i, key in enumerate(expected_keys.tolist()):
+            rows = columns['latency'][keys == key]
+            valid = rows[~np.isnan(rows)]
+            assert result['count'][i] == len(rows)
+            assert result['reactions'][i] == len(valid)
+            assert result['mean'][i] == pytest.approx(valid.mean())
+            assert (result['min'][i], result['max'][i]) == (valid.min(), valid.max())
+
+    tof = log.group_by('mode', where=columns['sensor'] == SENSOR_TOF)
+    assert tof['count'].sum() == np.count_nonzero(columns['sensor'] == SENSOR_TOF)
+
+    empty = TriggerLog().group_by('device_id')
+    assert len(empty['key']) == 0 and len(empty['mean']) == 0
+    with pytest.raises(ValueError):
+        log.group_by('latency')
+    for bucket in (None, 0, -1.0, 4e-10, float('nan'), float('inf')):
+        with pytest.raises(ValueError):
+            log.group_by('time', bucket)
+    assert log.group_by('time', 1e-9)['count'].sum() == len(log)
+
+
+def test_export_roundtrip(tmp_path):
+    """测试NPZ导出可完整读回，CSV每行一条记录且颜色拆为三列"""
+    log = _random_log(500)
+    log.export(tmp_path / "triggers.npz")
+    loaded = TriggerLog.load_npz(tmp_path / "triggers.npz")
+    for name, column in log.columns().items():
+        np.testing.assert_array_equal(loaded.column(name), column)
+
+    log.export(tmp_path / "triggers.csv")
+    with open(tmp_path / "triggers.csv", newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 500
+    assert int(rows[7]['detect_ns']) == log.column('detect_ns')[7]
+    assert {'color_r', 'color_g', 'color_b'} <= set(rows[0])
+
+    with pytest.raises(ValueError):
+        log.export(tmp_path / "triggers.xlsx")
+    if PYARROW_AVAILABLE:
+        log.export(tmp_path / "triggers.parquet")
+        assert (tmp_path / "triggers.parquet").exists()
+    else:
+        with pytest.raises(RuntimeError):
+            log.export(tmp_path / "triggers.parquet")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
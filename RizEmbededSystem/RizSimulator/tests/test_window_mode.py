@@ -0,0 +1,133 @@
+"""
+Test Window Mode
+窗口模式倒计时帧表、命中/过早/超时判定与亚帧时间戳测试
+"""
+
+import math
+import pytest
+import sys
+from pathlib import Path
+
+# 添加src到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from animation import compile_animation
+from ble.ble_server import BLEMessageParser
+from clock import VirtualClock
+from constants import (
+    COLOR_WINDOW_GOOD, COLOR_WINDOW_WAIT, INNER_RING_COUNT, MOVEMENT_MODE, WINDOW_MODE
+)
+from device_manager import DeviceManager
+from game_fsm import STATE_IDLE
+from mmwave import TargetModel
+from window_mode import WINDOW_EARLY, WINDOW_HIT, WINDOW_LATE, classify, validate_window
+
+
+def test_countdown_frames_per_pixel():
+    """测试倒计时帧表: 内圈从0、外圈从47逐颗熄灭，等待区橙色，进入最佳窗口瞬间变绿"""
+    table = compile_animation("window", 5000, 3000)
+    assert 2.0 in table.times.tolist()
+    assert math.isinf(table.duration)
+
+    for elapsed, step, color in [(0.0, 0, COLOR_WINDOW_WAIT), (1.999, 9, COLOR_WINDOW_WAIT),
+                                 (2.0, 9, COLOR_WINDOW_GOOD), (3.5, 16, COLOR_WINDOW_GOOD)]:
+        frame = table.frames[table.frame_index(elapsed)]
+        lit = frame.any(axis=1)
+        assert not lit[:step].any() and lit[step:INNER_RING_COUNT].all()
+        assert lit[INNER_RING_COUNT:].tolist() == lit[:INNER_RING_COUNT][::-1].tolist()
+        assert (frame[lit] == color).all()
+
+    assert not table.led_on[table.frame_index(5.0)]
+
+
+def test_validation_and_classification():
+    """测试参数验证与边界判定: 窗口开始与结束时刻都计为命中，亚毫秒差异可区分"""
+    validate_window(2000, 1000)
+    validate_window(5000, 4999)
+    for total, good in [(5000, 5000), (3000, 5000), (1000, 500), (5000, 900)]:
+        with pytest.raises(ValueError):
+            validate_window(total, good)
+
+    result = classify([0.5, 1.9999, 2.0, 5.0, 5.0001], 2.0, 5.0)
+    assert result.tolist() == [WINDOW_EARLY, WINDOW_EARLY, WINDOW_HIT, WINDOW_HIT, WINDOW_LATE]
+
+    assert BLEMessageParser.parse_message("7,3000,5000,1,500,1,0,100")["mode"] is None
+    assert BLEMessageParser.parse_message(BLEMessageParser.create_message(WINDOW_MODE, total=3000, good=1000)) == {
+        "mode": WINDOW_MODE, "window_total": 3000, "window_good": 1000,
+        "buzzer": 1, "buzzer_time": 500, "sensor_mode": 1,
+    }
+
+
+def test_hit_early_timeout_flow():
+    """测试过早触发后继续倒计时，命中熄灭并计入统计，未触发时超时"""
+    clock = VirtualClock()
+    manager = DeviceManager(clock=clock)
+    device = manager.create_device()
+    controller = manager.get_controller(device.device_id)
+    notifications = []
+    controller.notification_callback = notifications.append
+
+    manager.send_message_to_device(device.device_id, "7,5000,3000,1,500,1,0,100")
+    assert device.led_state.inner_ring[0] == COLOR_WINDOW_WAIT
+    assert device.tof_state.detection_active
+
+    clock.advance(0.5)
+    manager.update_all(0.5)
+    manager.trigger_device(device.device_id)
+    assert notifications == ["window_miss"]
+    assert device.led_state.is_on and device.tof_state.detection_active
+
+    clock.advance(2.25)
+    manager.update_all(2.25)
+    assert device.led_state.outer_ring[0] == COLOR_WINDOW_GOOD
+    manager.trigger_device(device.device_id)
+    assert notifications[-1] == "window"
+    assert not device.led_state.is_on
+    assert device.stats.window_average_reaction == pytest.approx(750)
+
+    # 新一轮不触发: 倒计时结束后超时
+    manager.apply_game_mode(device.device_id, WINDOW_MODE)
+    for _ in range(320):
+        clock.advance(0.016)
+        manager.update_all(0.016)
+    assert notifications[-1] == "window_timeout"
+    assert not device.led_state.is_on and not device.tof_state.detection_active
+    assert (device.stats.window_hits, device.stats.window_early, device.stats.window_late) == (1, 1, 1)
+    assert device.stats.window_hit_rate == pytest.approx(1 / 3)
+    assert manager.fsm.count(STATE_IDLE) == 1
+
+
+def test_radar_frame_time_not_quantized_by_tick():
+    """测试雷达帧在两次仿真步之间触发时按帧时间判定: 同一步内越过结束时刻也不影响命中"""
+    model = TargetModel(reaction_time=1.0, reaction_spread=0.0, noise=0.0)
+    tick = 0.2503
+
+    def run(mode, total=None):
+        clock = VirtualClock()
+        manager = DeviceManager(clock=clock, seed=3)
+        manager.set_target_model(model)
+        device = manager.create_device()
+        params = {"sensor_mode": 2}
+        if total is not None:
+            params["window"] = (total, 1000)
+        manager.apply_game_mode(device.device_id, mode, params)
+        for _ in range(40):
+            clock.advance(tick)
+            manager.update_all(tick)
+        return device
+
+    detect_time = run(MOVEMENT_MODE).tof_state.last_detection_time
+    assert detect_time % tick != pytest.approx(0)
+    assert detect_time * 1000 % 1 != pytest.approx(0)
+
+    hit = run(WINDOW_MODE, math.ceil(detect_time * 1000))
+    assert (hit.stats.window_hits, hit.stats.window_late) == (1, 0)
+    expected = (detect_time - (math.ceil(detect_time * 1000) - 1000) / 1000) * 1000
+    assert hit.stats.window_average_reaction == pytest.approx(expected)
+
+    late = run(WINDOW_MODE, math.floor(detect_time * 1000))
+    assert (late.stats.window_hits, late.stats.window_late) == (0, 1)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])